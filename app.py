@@ -1,45 +1,85 @@
+import asyncio
 import os
-import csv
-import copy
-from datetime import datetime
+import secrets
+from functools import lru_cache
 from pathlib import Path
-import pandas as pd
-import plotly.express as px
 from shiny import App, Inputs, Outputs, Session, reactive, render, ui, req
 from shinywidgets import output_widget, render_widget
+import engine
+import montecarlo
+import outcome_table
+import assets
+import charts
+import downloads
+import fragments
+import leaderboard
+import metrics
+import results_store
+import rooms
+from write_pipeline import WritePipeline, PipelineFull
+import game_state
+from game_state import GameState, HORIZON
+from reactive_state import ReactiveGameState, debounce
+from engine import ASSET_KEYS, EVENT_CARDS, INITIAL_CAPITAL
+from fragments import ASSET_NAMES
 
 # ==========================================
 # ⚙️ 全域設定 (常數)
 # ==========================================
-BASE_RATES = {
-    'Dividend': 0.06, 'USBond': 0.03, 'TWStock': 0.07, 'Cash': 0.0, 'Crypto': 0.1
-}
-
-ASSET_KEYS = ['Dividend', 'USBond', 'TWStock', 'Cash', 'Crypto']
-ASSET_NAMES = {'Dividend': '分紅收益', 'USBond': '美債', 'TWStock': '台股', 'Cash': '現金', 'Crypto': '加密幣'}
-FINANCE_COLORS = {'分紅收益': '#F59E0B', '美債': '#3B82F6', '台股': '#EF4444', '現金': '#9CA3AF', '加密幣': '#8B5CF6'}
-
-# 注意：這裡的 key 是小寫，對應卡片資料結構
-KEY_MAPPING = {'Dividend': 'dividend', 'USBond': 'bond', 'TWStock': 'stock', 'Cash': 'cash', 'Crypto': 'crypto'}
-
-EVENT_CARDS = {
-    "101": {"name": "US FED降息3%",      "dividend": 7,  "bond": 2,  "stock": 20,   "cash": 0,  "crypto": 100,   "desc": "💸 資金大放水！市場流動性暴增，風險資產狂噴。"},
-    "102": {"name": "AI晶片大戰",        "dividend": 6,  "bond": 5,  "stock": -30,  "cash": -1, "crypto": -80,   "desc": "🤖 科技霸權爭奪，供應鏈大亂，科技股與幣圈重挫。"},
-    "103": {"name": "美債信心危機",      "dividend": 5,  "bond": -6, "stock": -20,  "cash": 1,  "crypto": -70,   "desc": "📉 公債遭拋售，避險資產失靈，市場信心動搖。"},
-    "104": {"name": "關稅戰全面升級",    "dividend": 6,  "bond": 7,  "stock": -45,  "cash": -3, "crypto": -70,   "desc": "🚧 全球貿易壁壘升高，企業獲利受損，股市大跌。"},
-    "105": {"name": "AI/半導體世代級突破","dividend": 6,  "bond": -2, "stock": 30,   "cash": -3, "crypto": 50,    "desc": "🚀 生產力大爆發！科技股領漲，帶動加密貨幣回升。"},
-    "106": {"name": "能源通膨衝擊",      "dividend": 7,  "bond": -6, "stock": -60,  "cash": -8, "crypto": -85,   "desc": "🛢️ 油價飆升，萬物齊漲，停滯性通膨重創所有資產。"},
-    "107": {"name": "科技股估值回歸",    "dividend": 6,  "bond": 9,  "stock": -40,  "cash": 1,  "crypto": -65,   "desc": "📉 泡沫破裂，資金回流防禦性資產與債券。"},
-    "108": {"name": "關鍵航道被封鎖",    "dividend": 6,  "bond": 6,  "stock": -35,  "cash": -2, "crypto": -65,   "desc": "🚢 供應鏈斷鏈，運輸成本暴增，全球經濟受阻。"},
-    "109": {"name": "加密貨幣監管核爆",  "dividend": 6,  "bond": 4,  "stock": -15,  "cash": 1,  "crypto": -88,   "desc": "👮‍♂️ 各國聯手監管，交易所倒閉，幣圈血流成河。"},
-    "110": {"name": "資產估值錯配",      "dividend": 6,  "bond": -8, "stock": -55,  "cash": -2, "crypto": -80,   "desc": "⚠️ 市場定價機制失靈，引發全面性拋售潮。"},
-    "111": {"name": "全球疫情快速升溫",  "dividend": 6,  "bond": 7,  "stock": -25,  "cash": 0,  "crypto": -55,   "desc": "😷 封城再現，經濟活動停擺，資金湧入債券避險。"},
-    "112": {"name": "金融去槓桿崩盤",    "dividend": 6,  "bond": 7,  "stock": -35,  "cash": -4, "crypto": -70,   "desc": "💥 流動性枯竭，機構被迫平倉，多殺多局面出現。"},
-}
-
-CSV_FILE = 'game_data_records.csv'
+# 成績儲存位置，預設 SQLite (data/results.sqlite3)；第一次啟動會匯入舊的 CSV 紀錄
+RESULTS = results_store.open_store()
+# 結束頁排行榜：啟動時讀入全部成績，之後只併入新紀錄
+LEADERBOARD = leaderboard.Leaderboard(RESULTS)
+LEADERBOARD.refresh()
+
+
+def _write_results(rows):
+    RESULTS.write_batch(rows)
+    LEADERBOARD.refresh()
+
+
+# save_finish 只把資料放進有上限的佇列，由背景執行緒批次寫入；程式結束時會先寫完再離開。
+# 佇列內容同時記在資料目錄的 spool 檔，worker 當掉時由下一個啟動的 worker 接手重寫
+SAVE_QUEUE = WritePipeline(_write_results, maxsize=int(os.environ.get("MONEY_GAME_SAVE_QUEUE", "10000")),
+                           name="results", spool_dir=results_store.DATA_DIR / "spool")
+# 卡片圖片的 WebP / AVIF 多尺寸版本 (www/build)；沒有 Pillow 時使用原始 PNG
+IMAGES = assets.load_manifest()
+# 主持人廣播：房間事件在資料目錄的 SQLite，每個 worker 一個輪詢工作
+ROOMS = rooms.RoomHub()
+# 卡片代碼輸入停止多久 (秒) 後才查卡，避免每個按鍵都重畫
+EVENT_CODE_DEBOUNCE_SECS = float(os.environ.get("MONEY_GAME_CODE_DEBOUNCE", "0.3"))
 ADMIN_PASSWORD = "tsts"
 
+
+def _stochastic_returns():
+    """
+    隨機報酬模式 (預設關閉)：
+    MONEY_GAME_STOCHASTIC=1 啟用；MONEY_GAME_VOLATILITY=0.01,0.03,0.06,0,0.12 覆寫各資產波動度；
+    MONEY_GAME_CORRELATED=1 使用 engine.DEFAULT_CORRELATION 的相關抽樣
+    """
+    if os.environ.get("MONEY_GAME_STOCHASTIC", "0") in ("", "0", "false"):
+        return None
+    vol = os.environ.get("MONEY_GAME_VOLATILITY")
+    vol = tuple(float(x) for x in vol.split(",")) if vol else engine.DEFAULT_VOLATILITY
+    corr = engine.DEFAULT_CORRELATION if os.environ.get("MONEY_GAME_CORRELATED", "0") not in ("", "0", "false") else None
+    return engine.StochasticReturns(vol, corr)
+
+
+RETURNS = _stochastic_returns()
+
+@lru_cache(maxsize=None)
+def card_picture(code):
+    # 卡片大圖的 <picture> 每張卡只組一次，同一個 worker 的所有玩家 (整個房間) 共用
+    if code is None:
+        return ui.HTML(str(assets.picture(IMAGES, "homepage", alt="", style="width: 100%; height: auto; opacity: 0.5;")))
+    return ui.HTML(str(assets.picture(IMAGES, code, alt=EVENT_CARDS[code]['name'], style="width: 100%; height: auto; border-radius: 8px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);")))
+
+
+@lru_cache(maxsize=None)
+def get_outcome_table():
+    # 第一次使用時以 mmap 載入 (不存在就先建立)，之後整個 worker 共用
+    return outcome_table.load()
+
 # CSS 樣式
 custom_css = """
 :root { --primary: #2563EB; --primary-dark: #1E40AF; --secondary: #F59E0B; --bg-main: #F3F4F6; }
@@ -83,7 +123,20 @@ app_ui = ui.page_fluid(
                 ui.input_action_button("admin_reset_game", "🔥 清空當前遊戲狀態"),
                 ui.input_action_button("admin_clear_csv", "🧹 清空歷史 CSV"),
                 ui.hr(),
-                ui.download_button("admin_download_csv", "📥 下載 CSV"),
+                ui.output_ui("admin_download_link"),
+                ui.output_ui("admin_save_status"),
+                ui.hr(),
+                ui.h5("📣 主持人公布卡片"),
+                ui.input_text("admin_room", "房間代碼"),
+                ui.input_select("admin_room_year", "年份", {str(y): f"第 {y} 年" for y in range(engine.DECADE, HORIZON + 1, engine.DECADE)}),
+                ui.input_select("admin_room_card", "卡片", {c: f"[{c}] {card['name']}" for c, card in EVENT_CARDS.items()}),
+                ui.input_action_button("admin_broadcast", "📣 公布給房間內所有玩家"),
+                ui.hr(),
+                ui.input_action_button("admin_run_mc", "🎲 模擬目前配置的結果分佈"),
+                ui.output_ui("admin_mc_summary"),
+                ui.hr(),
+                ui.input_action_button("admin_show_metrics", "📊 效能數據 (各輸出耗時)"),
+                ui.output_ui("admin_metrics"),
             ),
             bg="#FFFFFF", open="closed"
         ),
@@ -96,11 +149,12 @@ app_ui = ui.page_fluid(
                     ui.div(), # spacer
                     ui.div(
                         ui.div(
-                            ui.img(src="images/homepage.png", style="max-width: 100%; border-radius: 12px;"),
+                            assets.picture(IMAGES, "homepage", sizes="(max-width: 576px) 100vw, 50vw", alt="", style="max-width: 100%; height: auto; border-radius: 12px;"),
                             style="text-align: center; margin-bottom: 20px;"
                         ),
                         ui.div("扭轉命運的機會就在眼前，準備好了嗎？", style="text-align: center; color: #6B7280; margin-bottom: 20px;"),
                         ui.input_text("user_name", "請輸入玩家暱稱", placeholder="例如: 小明"),
+                        ui.input_text("room_code", "房間代碼 (主持人帶領時填寫，可留空)", placeholder="例如: A1"),
                         ui.input_action_button("start_game", "▶ 開始挑戰", class_="btn-primary", style="width: 100%; margin-top: 10px;"),
                         class_="card"
                     ),
@@ -156,6 +210,8 @@ app_ui = ui.page_fluid(
 
                 # Dynamic Interaction Area
                 ui.output_ui("game_interaction_area"),
+                # 放在互動區外面：推進到事件輸入時預載不會因為 DOM 被替換而中斷
+                ui.output_ui("card_prefetch"),
                 
                 ui.br(),
                 ui.layout_columns(
@@ -193,6 +249,10 @@ app_ui = ui.page_fluid(
                     ui.hr(),
                     ui.h4("🎴 命運歷程"),
                     ui.output_ui("history_cards_list"),
+                    ui.output_ui("benchmark_compare"),
+                    ui.hr(),
+                    ui.h4("🏅 排行榜"),
+                    ui.output_ui("leaderboard_table"),
                     ui.hr(),
                     ui.input_text_area("feedback", "請留下您的心得", width="100%"),
                     ui.input_action_button("save_finish", "💾 儲存並結束", class_="btn-primary"),
@@ -213,40 +273,51 @@ app_ui = ui.page_fluid(
 def server(input: Inputs, output: Outputs, session: Session):
     
     # --- Reactive State ---
-    game_state = reactive.Value({
-        "year": 0,
-        "assets": {k: 0 for k in ASSET_KEYS},
-        "history": [],
-        "config_history": {},
-        "drawn_cards": [],
-        "sub_stage": "wait_jump", 
-        "dynamic_rates": BASE_RATES.copy(),
-        "user_name": ""
-    })
+    # 每個欄位獨立的 reactive 值，輸出只在自己讀到的欄位改變時重算
+    state = ReactiveGameState(GameState(returns=RETURNS))
     
+    # --- 房間 (主持人廣播) ---
+    # 有填房間代碼的玩家不用自己輸入卡片：主持人公布的 {年份: 代碼} 由 RoomHub 推送到 room_cards
+    room = metrics.label(reactive.Value(""), "room.name")
+    room_cards = metrics.label(reactive.Value({}), "room.cards")
+    leave_room = None
+
+    def join_room(name):
+        nonlocal leave_room
+        if name == room.get():
+            return
+        if leave_room:
+            leave_room()
+            leave_room = None
+        room_cards.set({})
+        room.set(name)
+        if name:
+            leave_room = ROOMS.subscribe(name, room_cards.set)
+
+    session.on_ended(lambda: leave_room and leave_room())
+
     # --- 1. Login ---
     @reactive.Effect
+    @metrics.timed("start_game")
     @reactive.event(input.start_game)
     def _():
         name = input.user_name().strip()
         if name:
-            gs = copy.deepcopy(game_state.get())
-            gs["user_name"] = name
-            game_state.set(gs)
+            join_room(rooms.normalize(input.room_code()))
+            state.set(state.get().start(name))
             ui.update_navs("wizard", selected="setup")
         else:
             ui.notification_show("請輸入暱稱！", type="error")
 
     # --- 2. Setup ---
     @render.ui
+    @metrics.timed
     def setup_rates_table():
-        rows = ""
-        risk_map = {'Dividend': '低', 'USBond': '極低', 'TWStock': '中高', 'Cash': '無', 'Crypto': '極高'}
-        for k in ASSET_KEYS:
-            rows += f"<tr><td>{ASSET_NAMES[k]}</td><td>{int(BASE_RATES[k]*100)}%</td><td>{risk_map[k]}</td></tr>"
-        return ui.HTML(f"<table class='table table-striped'><thead><tr><th>資產</th><th>年化</th><th>風險</th></tr></thead><tbody>{rows}</tbody></table>")
+        # 利率表不會變，import 時就組好
+        return fragments.RATES_TABLE
 
     @render.ui
+    @metrics.timed
     def setup_status():
         try:
             v1, v2, v3, v4, v5 = input.p_div(), input.p_bond(), input.p_stock(), input.p_cash(), input.p_crypto()
@@ -260,6 +331,7 @@ def server(input: Inputs, output: Outputs, session: Session):
             return ui.div()
 
     @reactive.Effect
+    @metrics.timed("confirm_setup")
     @reactive.event(input.confirm_setup)
     def _():
         try:
@@ -271,81 +343,47 @@ def server(input: Inputs, output: Outputs, session: Session):
             ui.notification_show("比例總和必須為 100%！", type="error")
             return
 
-        initial = 1000000
         props = [input.p_div(), input.p_bond(), input.p_stock(), input.p_cash(), input.p_crypto()]
-        gs = copy.deepcopy(game_state.get())
-        
-        new_assets = {}
-        for i, k in enumerate(ASSET_KEYS):
-            new_assets[k] = initial * (props[i] / 100)
-            
-        gs["assets"] = new_assets
-        gs["history"] = [{'Year': 0, 'Total': initial, **new_assets}]
-        gs["config_history"]['Year 0'] = {k: v for k, v in zip(ASSET_KEYS, props)}
-        gs["year"] = 0
-        gs["sub_stage"] = "wait_jump"
-        game_state.set(gs)
+        # 隨機報酬模式每局一個新種子，隨成績存檔，之後可以重播
+        seed = secrets.randbits(32) if RETURNS is not None else None
+        state.set(state.get().setup(props, INITIAL_CAPITAL, seed=seed))
         ui.update_navs("wizard", selected="playing")
 
     # --- 3. Playing Core Logic ---
     @render.text 
-    def ui_year(): return f"第 {game_state.get()['year']} 年"
+    @metrics.timed
+    def ui_year(): return f"第 {state.year()} 年"
     
     @render.text 
-    def ui_wealth(): return f"${int(sum(game_state.get()['assets'].values())):,}"
+    @metrics.timed
+    def ui_wealth(): return f"${int(state.assets().sum()):,}"
     
     @render.text 
+    @metrics.timed
     def ui_roi(): 
-        hist = game_state.get()['history']
-        if not hist: return "0%"
-        start = hist[0]['Total']
-        curr = sum(game_state.get()['assets'].values())
-        return f"{(curr - start) / start * 100:.1f}%"
+        start = state.initial_total()
+        if not start: return "0%"
+        return f"{game_state.roi(state.assets().sum(), start):.1f}%"
 
     @render.ui
+    @metrics.timed
     def ui_progress_bar():
-        y = game_state.get()['year']
-        pct = (y / 30) * 100
+        y = state.year()
+        pct = (y / HORIZON) * 100
         return ui.HTML(f'<div style="width:100%; background:#E5E7EB; height:8px; border-radius:4px;"><div style="width:{pct}%; background:var(--primary); height:100%; border-radius:4px;"></div></div>')
 
     # 🔥 新增功能 1: 顯示當前資產詳細金額表格
     @render.ui
+    @metrics.timed
     def ui_current_assets_detail():
-        assets = game_state.get()['assets']
-        total = sum(assets.values())
-        
-        rows = ""
-        for k in ASSET_KEYS:
-            val = assets[k]
-            pct = (val / total * 100) if total > 0 else 0
-            rows += f"""
-            <tr>
-                <td style="color:{FINANCE_COLORS[ASSET_NAMES[k]]}; font-weight:bold;">{ASSET_NAMES[k]}</td>
-                <td>${int(val):,}</td>
-                <td>{pct:.1f}%</td>
-            </tr>
-            """
-        
-        return ui.HTML(f"""
-        <table class="asset-table">
-            <thead>
-                <tr>
-                    <th>項目</th>
-                    <th>金額 ($)</th>
-                    <th>佔比</th>
-                </tr>
-            </thead>
-            <tbody>
-                {rows}
-            </tbody>
-        </table>
-        """)
+        assets = state.assets()
+        return fragments.assets_detail(assets.tolist(), engine.weights_pct(assets).tolist())
 
     @render.ui
+    @metrics.timed
     def game_interaction_area():
-        gs = game_state.get()
-        sub = gs["sub_stage"]
-        year = gs["year"]
+        sub = state.sub_stage()
+        year = state.year()
         
         if sub == "wait_jump":
             btn_txt = f"🚀 啟動時光機 (前往第 {year+10} 年)" if year == 0 else f"🚀 前往下一個十年 (Year {year+10})"
@@ -356,11 +394,14 @@ def server(input: Inputs, output: Outputs, session: Session):
             )
 
         elif sub == "event_input":
+            # 房間模式由主持人公布卡片，不顯示輸入框
+            code_input = (ui.div(f"🎤 等待主持人公布卡片 (房間 {room()})", style="color: #6B7280; margin-bottom: 10px;") if room()
+                          else ui.input_text("event_code_input", "請輸入卡片代碼 (3碼)", placeholder="例如: 101"))
             return ui.div(
                 ui.h2(f"⚡ 重大財經事件發生 (Year {year})", style="color: #EF4444; text-align: center;"),
                 ui.layout_columns(
                     ui.div(
-                        ui.input_text("event_code_input", "請輸入卡片代碼 (3碼)", placeholder="例如: 101"),
+                        code_input,
                         ui.output_ui("event_card_display"),
                         # 🔥 新增功能 2: 顯示衝擊預覽
                         ui.output_ui("event_impact_preview"),
@@ -370,6 +411,7 @@ def server(input: Inputs, output: Outputs, session: Session):
                         ui.output_ui("event_card_image") 
                     )
                 ),
+                ui.output_ui("risk_radar"),
                 class_="card"
             )
 
@@ -380,166 +422,101 @@ def server(input: Inputs, output: Outputs, session: Session):
                 ui.p("衝擊已發生，請調整您的投資組合。"),
                 ui.layout_columns(*inputs),
                 ui.output_ui("rebalance_status"), 
+                ui.output_ui("rebalance_whatif"),
                 ui.input_action_button("btn_confirm_rebalance", "執行配置 ✅", class_="btn-primary"),
                 class_="card", style="background: #ECFDF5; border-left: 5px solid #10B981;"
             )
         return ui.div()
 
+    # 進入遊戲 (等待推進) 時就在背景預載還沒抽過的卡片圖，揭曉時直接從瀏覽器快取顯示
+    @render.ui
+    @metrics.timed
+    def card_prefetch():
+        drawn = set(game_state.card_codes(state.cards()))
+        return assets.prefetch(IMAGES, [c for c in EVENT_CARDS if c not in drawn])
+
     # --- Jump Logic ---
     @reactive.Effect
+    @metrics.timed("btn_jump_time")
     @reactive.event(input.btn_jump_time)
     def _():
-        gs = copy.deepcopy(game_state.get())
-        current_year = gs["year"]
-        rates = gs["dynamic_rates"]
-        
-        for _ in range(10):
-            for k in ASSET_KEYS:
-                gs["assets"][k] *= (1 + rates[k])
-            current_year += 1
-            rec = {'Year': current_year, 'Total': sum(gs["assets"].values()), **gs["assets"]}
-            gs["history"].append(rec)
-            
-        gs["year"] = current_year
-        gs["sub_stage"] = "event_input"
-        game_state.set(gs)
+        # 一次算出 10 年的資產路徑並附加到歷史陣列
+        state.set(state.get().jump(engine.DECADE))
 
     # --- Event Logic ---
-    @render.ui
-    def event_card_image():
+    # 所有事件相關輸出共用同一個 (防抖後的) 查卡結果：有效代碼 -> code，否則 None
+    @debounce(EVENT_CODE_DEBOUNCE_SECS)
+    def typed_code():
         try:
             code = input.event_code_input().strip()
         except:
-            code = ""
-            
-        if code in EVENT_CARDS:
-             return ui.img(src=f"images/{code}.png", style="width: 100%; border-radius: 8px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);")
-        else:
-             return ui.img(src="images/homepage.png", style="width: 100%; opacity: 0.5;")
+            return None
+        return code if code in EVENT_CARDS else None
+
+    @reactive.Calc
+    def selected_code():
+        # 房間模式用主持人公布的這一年的卡，否則用玩家自己輸入的代碼
+        if room():
+            return room_cards().get(state.year())
+        return typed_code()
 
     @render.ui
+    @metrics.timed
+    def event_card_image():
+        return card_picture(selected_code())
+
+    @render.ui
+    @metrics.timed
     def event_card_display():
-        try:
-            code = input.event_code_input().strip()
-        except:
-            return ui.div()
-            
-        if code in EVENT_CARDS:
-            card = EVENT_CARDS[code]
-            return ui.div(
-                ui.h3(card['name'], style="color: #1E40AF;"),
-                ui.p(card['desc'], style="font-size: 1.1rem;"),
-                style="background: #EFF6FF; padding: 15px; border-radius: 8px; margin-top: 10px;"
-            )
-        return ui.div()
+        code = selected_code()
+        return fragments.card_display(code) if code else fragments.EMPTY
 
-    # 🔥 實作功能 2: 計算並顯示衝擊影響金額
+    # 🔥 實作功能 2: 計算並顯示衝擊影響金額 (卡片部分已快取，只填入金額)
     @render.ui
+    @metrics.timed
     def event_impact_preview():
-        try:
-            code = input.event_code_input().strip()
-        except:
-            return ui.div()
-            
-        if code in EVENT_CARDS:
-            card = EVENT_CARDS[code]
-            assets = game_state.get()['assets']
-            
-            impact_html = ""
-            for k in ASSET_KEYS:
-                card_key = KEY_MAPPING[k]
-                pct_change = card[card_key]
-                
-                # 計算實際影響金額
-                current_val = assets[k]
-                impact_val = current_val * (pct_change / 100)
-                
-                # 決定顏色 (正為綠，負為紅)
-                if pct_change < 0:
-                    bg_color = "#FEF2F2"
-                    text_color = "#EF4444"
-                    sign = "-"
-                    arrow = "▼"
-                elif pct_change > 0:
-                    bg_color = "#ECFDF5"
-                    text_color = "#10B981"
-                    sign = "+"
-                    arrow = "▲"
-                else:
-                    bg_color = "#F3F4F6"
-                    text_color = "#6B7280"
-                    sign = ""
-                    arrow = "-"
-
-                impact_html += f"""
-                <div style="flex: 1; background: {bg_color}; padding: 8px; border-radius: 8px; margin: 0 4px; text-align: center; border: 1px solid {text_color}33;">
-                    <div style="font-size: 11px; color: #6B7280;">{ASSET_NAMES[k]}</div>
-                    <div style="font-size: 16px; font-weight: bold; color: {text_color};">{arrow} {abs(pct_change)}%</div>
-                    <div style="font-size: 12px; font-weight: 600; color: {text_color}; margin-top: 4px;">
-                        {sign}${int(abs(impact_val)):,}
-                    </div>
-                </div>
-                """
-
-            return ui.HTML(f"""
-                <div style="margin-top: 15px;">
-                    <h5 style="color: #4B5563; font-size: 0.9rem;">📉 資產衝擊預覽 (預估損益)</h5>
-                    <div style="display: flex; justify-content: space-between; gap: 4px;">
-                        {impact_html}
-                    </div>
-                </div>
-            """)
-        return ui.div()
+        code = selected_code()
+        if code:
+            return fragments.impact_preview(code, state.assets().tolist())
+        return fragments.EMPTY
 
+    # 風險雷達：12 張卡對目前資產的衝擊，一次矩陣運算
     @render.ui
+    @metrics.timed
+    def risk_radar():
+        per_asset, totals = engine.impact_matrix(state.assets())
+        return fragments.risk_radar(engine.CARD_CODES, per_asset, totals)
+
+    @render.ui
+    @metrics.timed
     def event_apply_btn_area():
-        try:
-            code = input.event_code_input().strip()
-        except:
-            return ui.div()
-            
-        if code in EVENT_CARDS:
+        if selected_code():
             return ui.input_action_button("btn_apply_event", "迎接命運衝擊 📉", class_="btn-primary", style="margin-top: 15px; width: 100%;")
         return ui.div()
 
     @reactive.Effect
+    @metrics.timed("btn_apply_event")
     @reactive.event(input.btn_apply_event)
     def _():
-        try:
-            code = input.event_code_input().strip()
-        except: return
-
-        if code not in EVENT_CARDS: return
-        
-        card = EVENT_CARDS[code]
-        gs = copy.deepcopy(game_state.get())
+        code = selected_code()
+        if not code: return
         
-        for k in ASSET_KEYS:
-            card_key = KEY_MAPPING[k]
-            pct = card[card_key]
-            gs["assets"][k] = gs["assets"][k] * (1 + pct/100)
-
-        gs["drawn_cards"].append(f"第 {gs['year']} 年: [{code}] {card['name']}")
-        rec = gs["history"][-1]
-        rec.update(gs["assets"])
-        rec['Total'] = sum(gs["assets"].values())
+        gs = state.get().apply_event(code)
         
-        if gs["year"] >= 30:
+        if gs.finished:
             ui.update_navs("wizard", selected="finished")
         else:
-            gs["sub_stage"] = "rebalance"
-            total = sum(gs["assets"].values())
-            for k in ASSET_KEYS:
-                pct = (gs["assets"][k] / total * 100) if total > 0 else 0
+            for k, pct in zip(ASSET_KEYS, engine.weights_pct(gs.assets).tolist()):
                 ui.update_numeric(f"rb_{k}", value=round(pct, 1))
                 
-        game_state.set(gs)
+        state.set(gs)
         ui.update_text("event_code_input", value="")
 
     # --- Rebalance Logic ---
     @render.ui
+    @metrics.timed
     def rebalance_status():
-        if game_state.get()["sub_stage"] != "rebalance":
+        if state.sub_stage() != "rebalance":
             return ui.div()
             
         try:
@@ -555,7 +532,24 @@ def server(input: Inputs, output: Outputs, session: Session):
         except KeyError:
             return ui.div()
 
+    # 即時試算：輸入中的配置經過下一個十年與下一張卡的結果 (依配置快取)
+    @render.ui
+    @metrics.timed
+    def rebalance_whatif():
+        if state.sub_stage() != "rebalance":
+            return fragments.EMPTY
+        try:
+            values = [input[f"rb_{k}"]() for k in ASSET_KEYS]
+        except KeyError:
+            return fragments.EMPTY
+        if any(v is None for v in values) or abs(sum(values) - 100) > 0.1:
+            return fragments.EMPTY
+        total = float(state.assets().sum())
+        no_card, per_card = engine.decade_outlook(values, total, state.get().rates)
+        return fragments.rebalance_whatif(total, no_card, per_card, engine.CARD_CODES, state.year() + engine.DECADE)
+
     @reactive.Effect
+    @metrics.timed("btn_confirm_rebalance")
     @reactive.event(input.btn_confirm_rebalance)
     def _():
         try:
@@ -567,137 +561,238 @@ def server(input: Inputs, output: Outputs, session: Session):
                 ui.notification_show("比例總和必須為 100%！", type="error")
                 return
                 
-            gs = copy.deepcopy(game_state.get())
-            current_total = sum(gs["assets"].values())
-            
-            for i, k in enumerate(ASSET_KEYS):
-                gs["assets"][k] = current_total * (values[i] / 100)
-                
-            gs["config_history"][f"Year {gs['year']}"] = {k: v for k, v in zip(ASSET_KEYS, values)}
-            gs["history"][-1].update(gs["assets"])
-            gs["sub_stage"] = "wait_jump"
-            game_state.set(gs)
+            state.set(state.get().rebalance(values))
         except KeyError:
             pass
 
     # --- Charts ---
+    # 圖表只在 session 中建立一次 FigureWidget，之後由 effect 就地更新資料 (只送差異)
     @render_widget
+    @metrics.timed
     def chart_assets_now():
-        assets = game_state.get()['assets']
-        df = pd.DataFrame({'Asset': [ASSET_NAMES[k] for k in ASSET_KEYS], 'Value': list(assets.values())})
-        fig = px.pie(df, values='Value', names='Asset', color='Asset', color_discrete_map=FINANCE_COLORS, hole=0.5)
-        fig.update_layout(margin=dict(t=0, b=0, l=0, r=0), height=250)
-        return fig
+        with reactive.isolate():
+            return charts.assets_pie(state.assets().tolist())
+
+    @reactive.Effect
+    @metrics.timed("update_assets_pie")
+    def _():
+        charts.update_assets_pie(chart_assets_now.widget, state.assets().tolist())
 
     # --- Finished Logic ---
+    # 結束頁的輸出 (圖表、分享卡、卡片紀錄) 到 wizard 切到 finished 才計算 / 建立
+    @reactive.Calc
+    def on_finish_page():
+        return input.wizard() == "finished"
+
     @render.text
+    @metrics.timed
     def final_wealth_text():
-        return f"${int(sum(game_state.get()['assets'].values())):,}"
+        req(on_finish_page())
+        return f"${int(state.assets().sum()):,}"
         
     @render.text
+    @metrics.timed
     def final_roi_text():
-        hist = game_state.get()['history']
-        if not hist: return "0%"
-        start = hist[0]['Total']
-        curr = sum(game_state.get()['assets'].values())
-        return f"{(curr - start) / start * 100:+.1f}%"
+        req(on_finish_page())
+        start = state.initial_total()
+        if not start: return "0%"
+        return f"{game_state.roi(state.assets().sum(), start):+.1f}%"
 
     @render.ui
+    @metrics.timed
     def ig_share_card():
-        hist = game_state.get()['history']
-        if not hist: return ui.div()
-        final_w = sum(game_state.get()['assets'].values())
-        roi = (final_w - hist[0]['Total']) / hist[0]['Total'] * 100
-        
-        if roi < 0:
-            title, desc, bg = "💸 破產俱樂部", "黑天鵝來襲！波動性吃掉了你的本金...", "linear-gradient(135deg, #7f1d1d, #ef4444)"
-        elif roi < 200:
-            title, desc, bg = "🐢 佛系定存族", "這30年你只贏了帳面，卻輸給了真實通膨。", "linear-gradient(135deg, #4b5563, #9ca3af)"
-        elif roi < 600:
-            title, desc, bg = "💼 理財老手", "表現穩健！這是大多數普通人退休目標。", "linear-gradient(135deg, #059669, #34d399)"
-        elif roi < 1200:
-            title, desc, bg = "🚀 自由財富號", "眼光精準！你的資產成長速度驚人。", "linear-gradient(135deg, #7c3aed, #a78bfa)"
-        else:
-            title, desc, bg = "👑 投資界的神", "30年資產翻了10倍以上，巴菲特都要叫你老師！", "linear-gradient(135deg, #b45309, #fbbf24)"
-
-        return ui.HTML(f"""
-        <div style="width: 100%; max-width: 380px; margin: 0 auto; background: {bg}; border-radius: 20px; padding: 30px 20px; color: white; box-shadow: 0 10px 25px rgba(0,0,0,0.3); text-align: center; border: 4px solid rgba(255,255,255,0.2);">
-            <div style="font-size: 40px; margin-bottom: 10px;">{title.split(' ')[0]}</div>
-            <div style="font-size: 28px; font-weight: 800;">{title.split(' ')[1]}</div>
-            <div style="font-style: italic; opacity: 0.9; margin: 10px 0;">“{desc}”</div>
-            <div style="background: rgba(255,255,255,0.9); color: #1F2937; border-radius: 12px; padding: 10px; margin: 15px 0;">
-                <div style="font-size: 12px;">最終資產</div>
-                <div style="font-size: 32px; font-weight: 800;">${int(final_w):,}</div>
-            </div>
-            <div style="font-size: 12px; opacity: 0.8;">玩家: {game_state.get()['user_name']} | ROI: {roi:+.1f}%</div>
-        </div>
-        """)
+        req(on_finish_page())
+        start = state.initial_total()
+        if not start: return ui.div()
+        final_w = float(state.assets().sum())
+        roi = game_state.roi(final_w, start)
+        # 五種等級的卡面各自快取，只填入資產、玩家與 ROI
+        return fragments.share_card(final_w, roi, state.user_name())
 
     @render_widget
+    @metrics.timed
     def chart_history_area():
-        df = pd.DataFrame(game_state.get()['history'])
-        if df.empty: return None
-        df_melt = df.melt(id_vars=['Year', 'Total'], value_vars=ASSET_KEYS, var_name='Asset_Type', value_name='Value')
-        df_melt['Asset_Name'] = df_melt['Asset_Type'].map(ASSET_NAMES)
-        fig = px.area(df_melt, x="Year", y="Value", color="Asset_Name", color_discrete_map=FINANCE_COLORS)
-        return fig
+        req(on_finish_page())
+        return charts.history_area()
+
+    @reactive.Effect
+    @metrics.timed("update_history_area")
+    def _():
+        req(on_finish_page())
+        charts.update_history_area(chart_history_area.widget, state.history())
 
     @render_widget
+    @metrics.timed
     def chart_config_history():
-        cfg = game_state.get()['config_history']
-        if not cfg: return None
-        df_c = pd.DataFrame(cfg).T.rename(columns=ASSET_NAMES).reset_index().melt(id_vars='index', var_name='Asset', value_name='Pct')
-        fig = px.bar(df_c, x='index', y='Pct', color='Asset', color_discrete_map=FINANCE_COLORS)
-        return fig
+        req(on_finish_page())
+        return charts.config_bar()
+
+    @reactive.Effect
+    @metrics.timed("update_config_bar")
+    def _():
+        req(on_finish_page())
+        charts.update_config_bar(chart_config_history.widget, state.config())
 
     @render.ui
+    @metrics.timed
     def history_cards_list():
-        cards = game_state.get()['drawn_cards']
+        req(on_finish_page())
+        cards = game_state.drawn_cards(state.cards())
         if not cards: return ui.p("無事件發生")
         items = [ui.div(c, style="background: #FFF7ED; padding: 10px; border-left: 4px solid #F59E0B; margin-bottom: 5px;") for c in cards]
         return ui.div(*items)
 
+    # 同一組卡片下「靜態 20% 均分」與「最佳配置」的結果 (查預先計算表，不重新模擬)
+    @render.ui
+    @metrics.timed
+    def benchmark_compare():
+        req(on_finish_page())
+        codes = game_state.card_codes(state.cards())
+        if len(codes) != outcome_table.N_DECADES: return ui.div()
+        table = get_outcome_table()
+        even_w = table.final_wealth([20] * len(ASSET_KEYS), codes)
+        best_alloc, best_w = table.best_for_deck(codes)
+        best_txt = " / ".join(f"{ASSET_NAMES[k]} {v}%" for k, v in best_alloc.items() if v)
+        return ui.div(
+            ui.div(f"📏 同樣的卡片，20% 均分且不調整：${int(even_w):,}"),
+            ui.div(f"🏅 這副牌的最佳開局 ({best_txt})：${int(best_w):,}"),
+            style="background: #F9FAFB; padding: 10px; border-radius: 8px; margin-top: 10px; color: #4B5563;"
+        )
+
+    # 排行榜：停在結束頁時定期看 worker 的排行榜有沒有新成績 (版本號沒變就不重畫)
+    board_version = metrics.label(reactive.Value(0), "leaderboard.version")
+
     @reactive.Effect
-    @reactive.event(input.save_finish)
+    @metrics.timed("poll_leaderboard")
     def _():
-        gs = game_state.get()
-        roi = (sum(gs['assets'].values()) - 1000000) / 1000000 * 100
-        
-        file_exists = os.path.isfile(CSV_FILE)
-        data = {
-            '時間': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            '姓名': gs['user_name'],
-            '最終資產': int(sum(gs['assets'].values())),
-            '報酬率(%)': round(roi, 1),
-            '抽卡歷程': " | ".join(gs['drawn_cards']),
-            '配置_Year0': str(gs['config_history'].get('Year 0', '')),
-            '玩家反饋': input.feedback()
-        }
-        with open(CSV_FILE, mode='a', newline='', encoding='utf-8-sig') as f:
-            writer = csv.DictWriter(f, fieldnames=data.keys())
-            if not file_exists: writer.writeheader()
-            writer.writerow(data)
+        req(on_finish_page())
+        reactive.invalidate_later(leaderboard.POLL_SECS)
+        board_version.set(LEADERBOARD.poll())
+
+    @render.ui
+    @metrics.timed
+    def leaderboard_table():
+        req(on_finish_page())
+        board_version()
+        final_w = float(state.assets().sum())
+        return fragments.leaderboard(LEADERBOARD.top(), LEADERBOARD.rank(final_w), len(LEADERBOARD),
+                                     LEADERBOARD.percentile(final_w))
+
+    @reactive.Effect
+    @metrics.timed("save_finish")
+    @reactive.event(input.save_finish)
+    async def _():
+        gs = state.get()
+        data = game_state.save_record(gs, input.feedback())
+        try:
+            await SAVE_QUEUE.submit_async(data)
+        except PipelineFull:
+            ui.notification_show("⚠️ 系統忙碌中，請稍後再按一次儲存", type="error")
+            return
         
         ui.notification_show("✅ 數據已儲存！", type="message")
 
     @reactive.Effect
+    @metrics.timed("restart_game")
     @reactive.event(input.restart_game, input.admin_reset_game)
     def _():
-        game_state.set({
-            "year": 0, "assets": {k: 0 for k in ASSET_KEYS}, "history": [],
-            "config_history": {}, "drawn_cards": [], "sub_stage": "wait_jump",
-            "dynamic_rates": BASE_RATES.copy(), "user_name": ""
-        })
+        state.set(GameState(returns=RETURNS))
         ui.update_navs("wizard", selected="login")
 
-    @render.download(filename="game_data_records.csv")
-    def admin_download_csv():
-        if os.path.exists(CSV_FILE):
-            return CSV_FILE
+    # --- Admin: 蒙地卡羅分佈 (以設定頁目前輸入的第 0 年配置) ---
+    @render.ui
+    @metrics.timed
+    @reactive.event(input.admin_run_mc)
+    async def admin_mc_summary():
+        req(input.admin_pwd() == ADMIN_PASSWORD)
+        props = [input.p_div(), input.p_bond(), input.p_stock(), input.p_cash(), input.p_crypto()]
+        if any(p is None for p in props) or abs(sum(props) - 100) > 0.1:
+            return ui.div("請先在設定頁輸入總和 100% 的配置", style="color: red;")
+
+        # 20 萬條路徑要跑一陣子，放到執行緒裡，不卡住同一個 worker 上的玩家
+        res = await asyncio.to_thread(montecarlo.run, props, n_paths=200000, returns=RETURNS)
+        rows = "".join(
+            f"<tr><td>P{p}</td><td>${int(v):,}</td></tr>" for p, v in zip(res["percentiles"], res["wealth"][0])
+        )
+        return ui.HTML(
+            f"<table class='asset-table'><tbody>{rows}"
+            f"<tr><td>平均</td><td>${int(res['mean'][0]):,}</td></tr>"
+            f"<tr><td>虧損機率</td><td>{res['loss_prob'][0]:.1%}</td></tr></tbody></table>"
+        )
+
+    @reactive.Effect
+    @metrics.timed("admin_clear_csv")
+    @reactive.event(input.admin_clear_csv)
+    async def _():
+        req(input.admin_pwd() == ADMIN_PASSWORD)
+        # 等寫入佇列清空、清資料庫、重建排行榜都是阻塞 I/O，放到執行緒裡做
+        await asyncio.to_thread(SAVE_QUEUE.flush)
+        await asyncio.to_thread(RESULTS.clear)
+        await asyncio.to_thread(LEADERBOARD.reset)
+        ui.notification_show("🧹 歷史紀錄已清空", type="warning")
+
+    # --- Admin: 主持人公布卡片 (房間內所有玩家同時收到) ---
+    @reactive.Effect
+    @metrics.timed("admin_broadcast")
+    @reactive.event(input.admin_broadcast)
+    def _():
+        req(input.admin_pwd() == ADMIN_PASSWORD)
+        name = rooms.normalize(input.admin_room())
+        if not name:
+            ui.notification_show("請輸入房間代碼！", type="error")
+            return
+        code = input.admin_room_card()
+        ROOMS.publish(name, int(input.admin_room_year()), code)
+        ui.notification_show(f"📣 已公布 [{code}] {EVENT_CARDS[code]['name']} 給房間 {name} (第 {input.admin_room_year()} 年)", type="message")
+
+    # --- Admin: 效能數據 (MONEY_GAME_METRICS=1 時才有資料) ---
+    @render.ui
+    @metrics.timed
+    @reactive.event(input.admin_show_metrics)
+    def admin_metrics():
+        req(input.admin_pwd() == ADMIN_PASSWORD)
+        return metrics.summary_table()
+
+    # 成績寫入佇列狀態：寫入一直失敗時管理員看得到 (本 worker)
+    @render.ui
+    @metrics.timed
+    def admin_save_status():
+        req(input.admin_pwd() == ADMIN_PASSWORD)
+        reactive.invalidate_later(5)
+        st = SAVE_QUEUE.status()
+        if st["failed"] or st["last_error"]:
+            return ui.div(
+                f"⚠️ 成績寫入失敗：{st['failed']} 筆已另存待重試，等待寫入 {st['queued']} 筆",
+                ui.br(), ui.tags.small(st["last_error"] or ""),
+                style="color: #B91C1C; font-size: 12px; margin-top: 6px;")
+        return ui.div(f"💾 等待寫入 {st['queued']} 筆", style="color: #6B7280; font-size: 12px; margin-top: 6px;")
+
+    # 下載連結不綁 session (多 worker 時任何一個程序都能回應)，簽章過期前定期換新
+    @render.ui
+    @metrics.timed
+    def admin_download_link():
+        req(input.admin_pwd() == ADMIN_PASSWORD)
+        reactive.invalidate_later(downloads.TOKEN_SECS / 2)
+        return ui.a("📥 下載 CSV", href=downloads.signed_url(), download=downloads.RESULTS_CSV_NAME,
+                    class_="btn btn-default")
+
+
+def export_results_csv():
+    SAVE_QUEUE.flush()
+    return RESULTS.export_csv_bytes()
+
 
 # ⚠️ Confirm Static Directory
 app_dir = Path(__file__).parent
 app = App(app_ui, server, static_assets=app_dir / "www")
+# uvicorn 收到 SIGTERM 時不會跑 atexit，在 lifespan 結束時把佇列寫完
+app.on_shutdown(SAVE_QUEUE.close)
+# www/build 的雜湊檔案永久快取；原始圖片短期快取
+app.starlette_app.add_middleware(assets.CacheHeadersMiddleware)
+app.starlette_app.add_middleware(downloads.ResultsDownloadMiddleware, export=export_results_csv)
+if metrics.ENABLED:
+    # 本機 Prometheus 抓取點：curl http://127.0.0.1:8000/metrics
+    app.starlette_app.add_middleware(metrics.MetricsMiddleware)
 
 if __name__ == "__main__":
     app.run()
\ No newline at end of file
@@ -0,0 +1,195 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from shiny import ui
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# 🖼️ 圖片資產管線：WebP / AVIF + 多尺寸 + 內容雜湊檔名
+# ==========================================
+# 原始 PNG (www/images) 每張 600–900 KB；部署時執行 `python assets.py build` (serve.py 啟動前也會檢查)
+# 轉出縮小版，檔名含內容雜湊，瀏覽器可以永久快取 (immutable)。
+# app 啟動 (import) 時只讀 manifest，不轉檔；還沒建置時記一筆警告，picture() 退回原始 PNG。
+WWW_DIR = Path(__file__).parent / "www"
+SOURCE_DIR = WWW_DIR / "images"
+BUILD_DIR = WWW_DIR / "build"
+MANIFEST_PATH = BUILD_DIR / "manifest.json"
+BUILD_URL = "build"
+
+WIDTHS = (320, 640, 960)                               # 超過原圖寬度的尺寸會略過
+FORMATS = {                                            # 格式 -> (MIME, Pillow 參數)；順序即 <source> 優先順序
+    "avif": ("image/avif", {"quality": 50, "speed": 8}),
+    "webp": ("image/webp", {"quality": 78, "method": 4}),
+}
+DEFAULT_SIZES = "(max-width: 576px) 100vw, 50vw"
+
+# 帶雜湊的檔案內容永不改變；原始圖片只快取一小時
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+SOURCE_CACHE = "public, max-age=3600"
+
+
+def _settings_fingerprint():
+    """編碼參數改變時，所有變體都要重新產生"""
+    payload = json.dumps({"widths": WIDTHS, "formats": {k: v[1] for k, v in FORMATS.items()}}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:8]
+
+
+def _atomic_write(path, data):
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}-", dir=path.parent)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def _encode(im, fmt, opts):
+    from io import BytesIO
+    buf = BytesIO()
+    im.save(buf, format=fmt.upper(), **opts)
+    return buf.getvalue()
+
+
+def build(source_dir=SOURCE_DIR, build_dir=BUILD_DIR):
+    """產生所有變體與 manifest.json；已存在的檔案 (同雜湊) 直接沿用"""
+    from PIL import Image, features
+
+    source_dir, build_dir = Path(source_dir), Path(build_dir)
+    build_dir.mkdir(parents=True, exist_ok=True)
+    formats = {k: v for k, v in FORMATS.items() if features.check(k)}
+    settings = _settings_fingerprint()
+    manifest = {"settings": settings, "images": {}}
+
+    for src in sorted(source_dir.glob("*.png")):
+        digest = hashlib.sha256(src.read_bytes() + settings.encode()).hexdigest()[:10]
+        with Image.open(src) as im:
+            im.load()
+            widths = sorted({w for w in WIDTHS if w < im.width} | {im.width})
+            entry = {"width": im.width, "height": im.height, "fallback": f"images/{src.name}", "sources": {}}
+            for fmt, (mime, opts) in formats.items():
+                srcset = []
+                for w in widths:
+                    name = f"{src.stem}-{w}w.{digest}.{fmt}"
+                    out = build_dir / name
+                    if not out.exists():
+                        h = round(im.height * w / im.width)
+                        _atomic_write(out, _encode(im if w == im.width else im.resize((w, h), Image.LANCZOS), fmt, opts))
+                    srcset.append([f"{BUILD_URL}/{name}", w])
+                entry["sources"][mime] = srcset
+        manifest["images"][src.stem] = entry
+
+    # 清掉舊雜湊留下的檔案
+    keep = {Path(u).name for e in manifest["images"].values() for s in e["sources"].values() for u, _ in s}
+    for f in build_dir.iterdir():
+        if f.is_file() and f.name != MANIFEST_PATH.name and not f.name.startswith(".") and f.name not in keep:
+            f.unlink(missing_ok=True)
+
+    _atomic_write(build_dir / MANIFEST_PATH.name, json.dumps(manifest, indent=1).encode("utf-8"))
+    return manifest
+
+
+def _is_stale(manifest, source_dir):
+    if manifest.get("settings") != _settings_fingerprint():
+        return True
+    stems = {p.stem for p in Path(source_dir).glob("*.png")}
+    if stems != set(manifest.get("images", {})):
+        return True
+    newest = max((p.stat().st_mtime for p in Path(source_dir).glob("*.png")), default=0)
+    return newest > MANIFEST_PATH.stat().st_mtime
+
+
+def load_manifest(source_dir=SOURCE_DIR, rebuild=False):
+    """
+    讀取 manifest。rebuild=True (部署時) 過期就重建；
+    否則只讀現有的 (過期也照用，新加的圖片退回 PNG)，沒有就回傳空 dict 並提醒執行 build。
+    """
+    try:
+        manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+        images = manifest["images"]
+        stale = _is_stale(manifest, source_dir)
+    except (OSError, ValueError, KeyError):
+        images, stale = {}, True
+    if not stale:
+        return images
+    if not rebuild:
+        logger.warning("圖片變體%s，請在部署時執行 `python assets.py build`", "已過期" if images else "尚未建置 (使用原始 PNG)")
+        return images
+    return build(source_dir)["images"]
+
+
+# ==========================================
+# 🧩 產生 <picture>：瀏覽器依格式支援與螢幕寬度挑最小的檔案
+# ==========================================
+def picture(manifest, stem, sizes=DEFAULT_SIZES, **img_attrs):
+    entry = manifest.get(stem)
+    if entry is None:
+        return ui.img(src=f"images/{stem}.png", **img_attrs)
+    sources = [
+        ui.tags.source(type=mime, srcset=", ".join(f"{url} {w}w" for url, w in srcset), sizes=sizes)
+        for mime, srcset in entry["sources"].items()
+    ]
+    return ui.tags.picture(
+        *sources,
+        ui.img(src=entry["fallback"], width=entry["width"], height=entry["height"], decoding="async", **img_attrs),
+    )
+
+
+def prefetch(manifest, stems, sizes=DEFAULT_SIZES):
+    """
+    畫面外的低優先權 <picture>：瀏覽器用與正式顯示完全相同的規則挑檔案，
+    之後顯示同一張圖時直接命中快取 (immutable)，不會再發出請求。
+    """
+    return ui.div(
+        *[picture(manifest, s, sizes=sizes, alt="", fetchpriority="low", loading="eager") for s in stems],
+        aria_hidden="true",
+        style="position: absolute; width: 1px; height: 1px; overflow: hidden; opacity: 0; pointer-events: none;",
+    )
+
+
+# ==========================================
+# 📦 靜態檔快取標頭 (ASGI middleware)
+# ==========================================
+class CacheHeadersMiddleware:
+    def __init__(self, app, prefixes=None):
+        self.app = app
+        self.prefixes = prefixes or {f"/{BUILD_URL}/": IMMUTABLE_CACHE, "/images/": SOURCE_CACHE}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope.get("path", "")
+        policy = next((v for k, v in self.prefixes.items() if path.startswith(k)), None)
+        if policy is None:
+            return await self.app(scope, receive, send)
+
+        async def send_with_cache(message):
+            if message["type"] == "http.response.start" and message.get("status") in (200, 304):
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"cache-control"]
+                headers.append((b"cache-control", policy.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache)
+
+
+# ==========================================
+# 🖥️ 命令列：python assets.py build
+# ==========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="產生 WebP / AVIF 圖片變體")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build")
+    args = parser.parse_args(argv)
+    if args.cmd == "build":
+        images = build()["images"]
+        for stem, e in images.items():
+            print(stem, {mime.split("/")[1]: [w for _, w in s] for mime, s in e["sources"].items()})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import engine
+import fragments
+import game_state
+import results_store
+from engine import DECADE, INITIAL_CAPITAL
+from game_state import GameState
+
+# ==========================================
+# ⏱️ 微基準：遊戲熱點路徑逐項計時
+# ==========================================
+# 每項基準是一個「準備函式」，回傳要計時的零參數函式 (準備工作不計時)。
+# 以 timeit 自動決定每輪次數，重複 REPEAT 輪取最快的一輪 (雜訊最少)，單位微秒。
+#   python bench.py                     執行並與 bench_baseline.json 比較
+#   python bench.py -k html             只跑名稱含 html 的項目
+#   python bench.py --save              把這次結果寫成新的基準線 (請一併 commit)
+#   python bench.py --startup           另外量測 worker 冷啟動與第一個 session
+APP_DIR = Path(__file__).parent
+BASELINE_PATH = APP_DIR / "bench_baseline.json"
+REPEAT = 5
+MIN_ROUND_SECS = 0.2
+DEFAULT_THRESHOLD = 1.5          # 比基準線慢超過 1.5 倍視為退步 (不同機器間本來就有落差)
+
+BENCHMARKS = {}
+WEIGHTS = [20, 20, 20, 20, 20]
+CARDS = ["101", "105", "111"]
+
+
+def bench(name):
+    def deco(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return deco
+
+
+def _mid_game():
+    """第 10 年剛抽完卡、等待再平衡的狀態"""
+    return GameState(user_name="bench").setup(WEIGHTS).jump(DECADE).apply_event(CARDS[0])
+
+
+def _finished_game():
+    gs = GameState(user_name="bench").setup(WEIGHTS)
+    for code in CARDS:
+        gs = gs.jump(DECADE).apply_event(code)
+        if not gs.finished:
+            gs = gs.rebalance(WEIGHTS)
+    return gs
+
+
+def _tmp_dir():
+    d = Path(tempfile.mkdtemp(prefix="money-game-bench-"))
+    atexit.register(shutil.rmtree, d, ignore_errors=True)
+    return d
+
+
+# --- 狀態轉移 ---
+@bench("decade_growth")
+def _():
+    assets, rates = engine.allocate(WEIGHTS, INITIAL_CAPITAL), engine.RATE_VECTOR
+    return lambda: engine.growth_path(assets, DECADE, rates)
+
+
+@bench("state_jump")
+def _():
+    # 取代舊版的 copy.deepcopy(game_state)：狀態不可變，轉移只複製有變的欄位
+    gs = GameState(user_name="bench").setup(WEIGHTS)
+    return lambda: gs.jump(DECADE)
+
+
+@bench("state_apply_event")
+def _():
+    gs = GameState(user_name="bench").setup(WEIGHTS).jump(DECADE)
+    return lambda: gs.apply_event(CARDS[0])
+
+
+@bench("state_rebalance")
+def _():
+    gs = _mid_game()
+    return lambda: gs.rebalance(WEIGHTS)
+
+
+@bench("full_game")
+def _():
+    return _finished_game
+
+
+# --- HTML 片段 ---
+@bench("html_assets_detail")
+def _():
+    assets = _mid_game().assets
+    return lambda: fragments.assets_detail(assets.tolist(), engine.weights_pct(assets).tolist())
+
+
+@bench("html_impact_preview")
+def _():
+    holdings = _mid_game().assets.tolist()
+    return lambda: fragments.impact_preview(CARDS[1], holdings)
+
+
+@bench("html_risk_radar")
+def _():
+    assets = _mid_game().assets
+
+    def run():
+        per_asset, totals = engine.impact_matrix(assets)
+        return fragments.risk_radar(engine.CARD_CODES, per_asset, totals)
+    return run
+
+
+# --- 圖表 (結束頁) ---
+@bench("chart_history_create")
+def _():
+    import charts
+    return charts.history_area
+
+
+@bench("chart_history_update")
+def _():
+    import charts
+    w, history = charts.history_area(), _finished_game().history
+    return lambda: charts.update_history_area(w, history)
+
+
+# --- 存檔 ---
+@bench("save_record")
+def _():
+    gs = _finished_game()
+    return lambda: game_state.save_record(gs, "bench")
+
+
+@bench("save_sqlite")
+def _():
+    store = results_store.SqliteResultsStore(_tmp_dir() / "results.sqlite3", import_legacy=False)
+    gs = _finished_game()
+    # 每次都是新的一局 (新的 save_id)，量的是真正的插入而不是被去重略過
+    return lambda: store.write_batch([game_state.save_record(gs, "bench")])
+
+
+@bench("save_csv")
+def _():
+    store = results_store.CsvResultsStore(_tmp_dir() / "results.csv")
+    row = game_state.save_record(_finished_game(), "bench")
+    return lambda: store.write_batch([row])
+
+
+def measure(fn, repeat=REPEAT, min_round_secs=MIN_ROUND_SECS):
+    """回傳 (最快一輪, 中位數) 每次呼叫的微秒數"""
+    timer = timeit.Timer(fn)
+    number = 1
+    while (t := timer.timeit(number)) < min_round_secs:
+        number = max(number * 2, int(number * min_round_secs / max(t, 1e-9)))
+    rounds = [t / number * 1e6 for t in [t, *timer.repeat(repeat - 1, number)]]
+    return min(rounds), statistics.median(rounds)
+
+
+def run(pattern=None):
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+        best, median = measure(setup())
+        results[name] = {"best_us": round(best, 3), "median_us": round(median, 3)}
+    return results
+
+
+# ==========================================
+# 🚀 啟動時間：冷 import 與新 worker 的第一個 session
+# ==========================================
+STARTUP_RUNS = 5
+FIRST_SESSION_RUNS = 3
+# 第一個 session 量這幾個動作：連線到第一次 flush、進入遊戲頁 (資產圓餅圖)、進入結束頁 (歷史圖表)
+FIRST_SESSION_ACTIONS = ("init", "page_playing", "page_finished")
+
+
+def _cold_import(env):
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def startup(runs=STARTUP_RUNS, session_runs=FIRST_SESSION_RUNS):
+    """每次都是全新的 Python 程序 (沒有 import 快取以外的暖機)，取中位數"""
+    import loadtest
+
+    tmp = _tmp_dir()
+    env = {**os.environ, "MONEY_GAME_DATA_DIR": str(tmp), "MONEY_GAME_RESULTS": f"sqlite:///{tmp / 'results.sqlite3'}"}
+    imports = [_cold_import(env) for _ in range(runs)]
+    res = {"cold_import_ms": round(statistics.median(imports) * 1000, 1)}
+
+    firsts, idle_rss, session_rss = {a: [] for a in FIRST_SESSION_ACTIONS}, [], []
+    for _ in range(session_runs):
+        port = loadtest._free_port()
+        proc = loadtest.start_server(port, tmp)
+        try:
+            idle_rss.append(loadtest.rss_mb(proc.pid))
+            r = asyncio.run(loadtest.run(f"ws://127.0.0.1:{port}/websocket/", 1, pid=proc.pid))
+        finally:
+            proc.terminate()
+            proc.wait(10)
+        for a in FIRST_SESSION_ACTIONS:
+            firsts[a].append(r["actions"][a]["p50_ms"])
+        session_rss.append(r["rss_peak_mb"] - r["rss_base_mb"])
+    res.update({f"first_{a}_ms": round(statistics.median(v), 1) for a, v in firsts.items()})
+    res["idle_rss_mb"] = round(statistics.median(idle_rss), 1)
+    res["first_session_rss_mb"] = round(statistics.median(session_rss), 1)
+    return res
+
+
+def print_startup(res, baseline):
+    base = (baseline or {}).get("startup", {})
+    print(f"\n{'啟動':<24}{'這次':>12}{'基準線':>12}")
+    for k, v in res.items():
+        print(f"{k:<24}{v:>12,.1f}{base.get(k, float('nan')):>12,.1f}")
+
+
+def machine():
+    return {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+            "processor": platform.processor() or platform.machine()}
+
+
+def load_baseline(path=BASELINE_PATH):
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """每項 -> (比例, 是否退步)；基準線沒有的項目比例為 None"""
+    base = (baseline or {}).get("results", {})
+    out = {}
+    for name, r in results.items():
+        ratio = r["best_us"] / base[name]["best_us"] if name in base and base[name]["best_us"] else None
+        out[name] = (ratio, ratio is not None and ratio > threshold)
+    return out
+
+
+def print_report(results, cmp):
+    print(f"{'項目':<24}{'最快 (µs)':>14}{'中位數 (µs)':>14}{'對基準線':>10}")
+    for name, r in results.items():
+        ratio, slow = cmp.get(name, (None, False))
+        rel = "     -" if ratio is None else f"{ratio:>8.2f}x" + (" ⚠️" if slow else "")
+        print(f"{name:<24}{r['best_us']:>14,.1f}{r['median_us']:>14,.1f}  {rel}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="扭轉命運 30 年 - 熱點路徑微基準")
+    parser.add_argument("-k", dest="pattern", help="只跑名稱包含此字串的項目")
+    parser.add_argument("--baseline", default=BASELINE_PATH, type=Path)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="慢幾倍算退步")
+    parser.add_argument("--save", action="store_true", help="把結果寫成新的基準線")
+    parser.add_argument("--startup", action="store_true", help="另外量測冷 import 與第一個 session (約 1 分鐘)")
+    parser.add_argument("--json", help="結果另存 JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern)
+    baseline = load_baseline(args.baseline)
+    cmp = compare(results, baseline, args.threshold)
+    print_report(results, cmp)
+    start_res = startup() if args.startup else None
+    if start_res:
+        print_startup(start_res, baseline)
+    if baseline:
+        print(f"\n基準線: {baseline.get('recorded')} {baseline.get('machine')}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"results": results, "startup": start_res}, indent=1), encoding="utf-8")
+    if args.save:
+        merged = {**(baseline or {}).get("results", {}), **results} if args.pattern else results
+        data = {"recorded": datetime.now().strftime("%Y-%m-%d"), "machine": machine(), "results": merged}
+        if start_res or (baseline or {}).get("startup"):
+            data["startup"] = start_res or baseline["startup"]
+        args.baseline.write_text(json.dumps(data, indent=1, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"已寫入 {args.baseline}")
+        return 0
+    slow = [n for n, (_, s) in cmp.items() if s]
+    if slow:
+        print(f"退步 (> {args.threshold}x): {', '.join(slow)}", file=sys.stderr)
+    return 1 if slow else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import game_state
+from fragments import ASSET_LABELS, FINANCE_COLORS
+
+# ==========================================
+# 📊 圖表：建立 FigureWidget 與就地更新
+# ==========================================
+# 每個 session 只建立一次 widget，之後只更新 trace 資料 (前端只收到差異)。
+# plotly 在第一次畫圖時才 import (worker 啟動不用等)；圖表規格直接寫成 dict，
+# 與原本 px.pie / px.area / px.bar 產生的內容相同，但不經過 plotly.express 與 pandas。
+_COLORS = [FINANCE_COLORS[label] for label in ASSET_LABELS]
+
+
+def _figure_widget(spec):
+    import plotly.graph_objects as go
+    return go.FigureWidget(spec)
+
+
+def _axes(x_title, y_title, legend_title):
+    return dict(
+        legend=dict(title=dict(text=legend_title), tracegroupgap=0), margin=dict(t=60),
+        xaxis=dict(anchor="y", domain=[0.0, 1.0], title=dict(text=x_title)),
+        yaxis=dict(anchor="x", domain=[0.0, 1.0], title=dict(text=y_title)),
+    )
+
+
+def assets_pie(values):
+    trace = dict(
+        type="pie", labels=ASSET_LABELS, values=values, customdata=[[label] for label in ASSET_LABELS],
+        domain=dict(x=[0.0, 1.0], y=[0.0, 1.0]), hole=0.5, marker=dict(colors=_COLORS),
+        hovertemplate="label=%{label}<br>value=%{value}<br>color=%{customdata[0]}<extra></extra>",
+        legendgroup="", name="", showlegend=True,
+    )
+    layout = dict(height=250, legend=dict(tracegroupgap=0), margin=dict(t=0, b=0, l=0, r=0))
+    return _figure_widget(dict(data=[trace], layout=layout))
+
+
+def update_assets_pie(w, values):
+    with w.batch_update():
+        w.data[0].values = values
+
+
+def history_area():
+    # 每項資產一條堆疊 trace，先以第 0 年佔位，資料由 update_history_area 填入
+    traces = [
+        dict(type="scatter", x=[0], y=[0], name=label, legendgroup=label, line=dict(color=color),
+             hovertemplate=f"Asset_Name={label}<br>Year=%{{x}}<br>Value=%{{y}}<extra></extra>",
+             fillpattern=dict(shape=""), marker=dict(symbol="circle"), mode="lines", orientation="v",
+             showlegend=True, stackgroup="1", xaxis="x", yaxis="y")
+        for label, color in zip(ASSET_LABELS, _COLORS)
+    ]
+    return _figure_widget(dict(data=traces, layout=_axes("Year", "Value", "Asset_Name")))
+
+
+def update_history_area(w, history):
+    years, holdings = game_state.history_table(history)
+    if not len(years): return
+    cols = dict(zip(ASSET_LABELS, holdings.T.tolist()))
+    years = years.tolist()
+    with w.batch_update():
+        for trace in w.data:
+            trace.x, trace.y = years, cols[trace.name]
+
+
+def config_bar():
+    traces = [
+        dict(type="bar", x=["Year 0"], y=[0], name=label, legendgroup=label,
+             marker=dict(color=color, pattern=dict(shape="")),
+             hovertemplate=f"Asset={label}<br>index=%{{x}}<br>Pct=%{{y}}<extra></extra>",
+             orientation="v", showlegend=True, textposition="auto", xaxis="x", yaxis="y")
+        for label, color in zip(ASSET_LABELS, _COLORS)
+    ]
+    return _figure_widget(dict(data=traces, layout=dict(barmode="relative", **_axes("index", "Pct", "Asset"))))
+
+
+def update_config_bar(w, config):
+    cfg = config.view()
+    if not len(cfg): return
+    labels = [f"Year {int(y)}" for y in cfg[:, 0].tolist()]
+    cols = dict(zip(ASSET_LABELS, cfg[:, 1:].T.tolist()))
+    with w.batch_update():
+        for trace in w.data:
+            trace.x, trace.y = labels, cols[trace.name]
@@ -0,0 +1,92 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from functools import lru_cache
+from urllib.parse import parse_qs
+
+from results_store import DATA_DIR
+
+# ==========================================
+# 📥 與 session 無關的下載網址
+# ==========================================
+# render.download 的網址綁在某個 session 上 (/session/<id>/download/...)，
+# 多個 worker 時這個 HTTP 請求可能被分到別的程序而找不到 session。
+# 這裡改成固定路徑 + 簽章：管理員解鎖後拿到一個有效期限內的連結，任何 worker 都能驗證並回應。
+RESULTS_CSV_PATH = "/download/results.csv"
+RESULTS_CSV_NAME = "game_data_records.csv"
+TOKEN_SECS = 600
+SECRET_PATH = DATA_DIR / ".download_secret"
+
+
+@lru_cache(maxsize=1)
+def _secret():
+    """MONEY_GAME_SECRET 優先；否則在資料目錄產生一次，所有 worker 共用同一把"""
+    env = os.environ.get("MONEY_GAME_SECRET")
+    if env:
+        return env.encode("utf-8")
+    SECRET_PATH.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        fd = os.open(SECRET_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    # 別的 worker 剛建立時檔案可能還是空的，稍等一下
+    for _ in range(50):
+        key = SECRET_PATH.read_text().strip()
+        if key:
+            return key.encode("utf-8")
+        time.sleep(0.01)
+    raise RuntimeError(f"無法讀取下載簽章金鑰 {SECRET_PATH}")
+
+
+def _sign(path, expires):
+    return hmac.new(_secret(), f"{path}\n{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def signed_url(path=RESULTS_CSV_PATH, ttl=TOKEN_SECS):
+    """相對網址 (app 掛在子路徑下也能用)"""
+    expires = int(time.time()) + int(ttl)
+    return f"{path.lstrip('/')}?expires={expires}&sig={_sign(path, expires)}"
+
+
+def verify(path, query_string):
+    q = parse_qs(query_string)
+    try:
+        expires, sig = int(q["expires"][0]), q["sig"][0]
+    except (KeyError, ValueError):
+        return False
+    return expires >= time.time() and hmac.compare_digest(sig, _sign(path, expires))
+
+
+class ResultsDownloadMiddleware:
+    """GET /download/results.csv：簽章有效就回傳 export() 的內容，否則 403"""
+
+    def __init__(self, app, export, path=RESULTS_CSV_PATH, filename=RESULTS_CSV_NAME):
+        self.app = app
+        self.export = export
+        self.path = path
+        self.filename = filename
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") != self.path:
+            return await self.app(scope, receive, send)
+        if not verify(self.path, scope.get("query_string", b"").decode("latin-1")):
+            return await _respond(send, 403, b"link expired or invalid", b"text/plain; charset=utf-8")
+        # 匯出會讀整個資料庫，放到執行緒裡避免卡住其他玩家
+        body = await asyncio.to_thread(self.export)
+        await _respond(send, 200, body, b"text/csv; charset=utf-8", [
+            (b"content-disposition", f'attachment; filename="{self.filename}"'.encode("latin-1")),
+            (b"cache-control", b"no-store"),
+        ])
+
+
+async def _respond(send, status, body, content_type, headers=()):
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", content_type), (b"content-length", str(len(body)).encode("latin-1")), *headers,
+    ]})
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,204 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+import numpy as np
+
+# ==========================================
+# ⚙️ 遊戲規則常數 (與 UI 無關)
+# ==========================================
+BASE_RATES = {
+    'Dividend': 0.06, 'USBond': 0.03, 'TWStock': 0.07, 'Cash': 0.0, 'Crypto': 0.1
+}
+
+ASSET_KEYS = ['Dividend', 'USBond', 'TWStock', 'Cash', 'Crypto']
+
+# 注意：這裡的 key 是小寫，對應卡片資料結構
+KEY_MAPPING = {'Dividend': 'dividend', 'USBond': 'bond', 'TWStock': 'stock', 'Cash': 'cash', 'Crypto': 'crypto'}
+
+EVENT_CARDS = {
+    "101": {"name": "US FED降息3%",      "dividend": 7,  "bond": 2,  "stock": 20,   "cash": 0,  "crypto": 100,   "desc": "💸 資金大放水！市場流動性暴增，風險資產狂噴。"},
+    "102": {"name": "AI晶片大戰",        "dividend": 6,  "bond": 5,  "stock": -30,  "cash": -1, "crypto": -80,   "desc": "🤖 科技霸權爭奪，供應鏈大亂，科技股與幣圈重挫。"},
+    "103": {"name": "美債信心危機",      "dividend": 5,  "bond": -6, "stock": -20,  "cash": 1,  "crypto": -70,   "desc": "📉 公債遭拋售，避險資產失靈，市場信心動搖。"},
+    "104": {"name": "關稅戰全面升級",    "dividend": 6,  "bond": 7,  "stock": -45,  "cash": -3, "crypto": -70,   "desc": "🚧 全球貿易壁壘升高，企業獲利受損，股市大跌。"},
+    "105": {"name": "AI/半導體世代級突破","dividend": 6,  "bond": -2, "stock": 30,   "cash": -3, "crypto": 50,    "desc": "🚀 生產力大爆發！科技股領漲，帶動加密貨幣回升。"},
+    "106": {"name": "能源通膨衝擊",      "dividend": 7,  "bond": -6, "stock": -60,  "cash": -8, "crypto": -85,   "desc": "🛢️ 油價飆升，萬物齊漲，停滯性通膨重創所有資產。"},
+    "107": {"name": "科技股估值回歸",    "dividend": 6,  "bond": 9,  "stock": -40,  "cash": 1,  "crypto": -65,   "desc": "📉 泡沫破裂，資金回流防禦性資產與債券。"},
+    "108": {"name": "關鍵航道被封鎖",    "dividend": 6,  "bond": 6,  "stock": -35,  "cash": -2, "crypto": -65,   "desc": "🚢 供應鏈斷鏈，運輸成本暴增，全球經濟受阻。"},
+    "109": {"name": "加密貨幣監管核爆",  "dividend": 6,  "bond": 4,  "stock": -15,  "cash": 1,  "crypto": -88,   "desc": "👮‍♂️ 各國聯手監管，交易所倒閉，幣圈血流成河。"},
+    "110": {"name": "資產估值錯配",      "dividend": 6,  "bond": -8, "stock": -55,  "cash": -2, "crypto": -80,   "desc": "⚠️ 市場定價機制失靈，引發全面性拋售潮。"},
+    "111": {"name": "全球疫情快速升溫",  "dividend": 6,  "bond": 7,  "stock": -25,  "cash": 0,  "crypto": -55,   "desc": "😷 封城再現，經濟活動停擺，資金湧入債券避險。"},
+    "112": {"name": "金融去槓桿崩盤",    "dividend": 6,  "bond": 7,  "stock": -35,  "cash": -4, "crypto": -70,   "desc": "💥 流動性枯竭，機構被迫平倉，多殺多局面出現。"},
+}
+
+INITIAL_CAPITAL = 1000000
+DECADE = 10
+
+# 結算等級：(ROI 上限 %, 稱號, 評語)，依序比對 roi < 上限
+ROI_TIERS = [
+    (0, "💸 破產俱樂部", "黑天鵝來襲！波動性吃掉了你的本金..."),
+    (200, "🐢 佛系定存族", "這30年你只贏了帳面，卻輸給了真實通膨。"),
+    (600, "💼 理財老手", "表現穩健！這是大多數普通人退休目標。"),
+    (1200, "🚀 自由財富號", "眼光精準！你的資產成長速度驚人。"),
+    (float("inf"), "👑 投資界的神", "30年資產翻了10倍以上，巴菲特都要叫你老師！"),
+]
+
+
+def roi_tier(roi):
+    """ROI (%) -> ROI_TIERS 的索引"""
+    return next(i for i, (upper, *_) in enumerate(ROI_TIERS) if roi < upper)
+
+# ==========================================
+# 🧮 向量化表示 (固定順序 = ASSET_KEYS)
+# ==========================================
+CARD_CODES = list(EVENT_CARDS)
+CARD_INDEX = {code: i for i, code in enumerate(CARD_CODES)}
+
+RATE_VECTOR = np.array([BASE_RATES[k] for k in ASSET_KEYS], dtype=np.float64)
+
+# 每張卡對每項資產的衝擊比例 (12 x 5)，例如 -30% -> -0.30
+SHOCK_MATRIX = np.array(
+    [[EVENT_CARDS[c][KEY_MAPPING[k]] for k in ASSET_KEYS] for c in CARD_CODES], dtype=np.float64
+) / 100
+SHOCK_FACTORS = 1 + SHOCK_MATRIX
+
+
+def to_vector(values):
+    """dict (以 ASSET_KEYS 為 key) -> float64 陣列"""
+    return np.array([values[k] for k in ASSET_KEYS], dtype=np.float64)
+
+
+def to_dict(vec):
+    """float64 陣列 -> dict，值轉為 Python float 方便序列化"""
+    return dict(zip(ASSET_KEYS, np.asarray(vec, dtype=np.float64).tolist()))
+
+
+def allocate(weights_pct, capital=INITIAL_CAPITAL):
+    """依百分比配置資金 (weights_pct 依 ASSET_KEYS 順序)"""
+    return capital * (np.asarray(weights_pct, dtype=np.float64) / 100)
+
+
+def growth_path(holdings, years=DECADE, rates=RATE_VECTOR):
+    """
+    一次算出未來 N 年每年年底的持有金額 (years x 5)。
+    使用封閉解 holdings * (1 + r) ** t，不需逐年迴圈。
+    """
+    t = np.arange(1, years + 1, dtype=np.float64)[:, None]
+    return np.asarray(holdings, dtype=np.float64) * (1 + np.asarray(rates, dtype=np.float64)) ** t
+
+
+# ==========================================
+# 🎲 隨機報酬模式 (選用)
+# ==========================================
+# 每年每項資產的成長率乘上對數常態雜訊 exp(σz - σ²/2)，期望值仍是 BASE_RATES。
+# 預設波動度沿用舊版 Streamlit 的 uniform 區間 (±2%, ±5%, ±10%, 0, ±20%)，標準差 = 半寬 / √3。
+DEFAULT_VOLATILITY = (0.02 / 3 ** 0.5, 0.05 / 3 ** 0.5, 0.10 / 3 ** 0.5, 0.0, 0.20 / 3 ** 0.5)
+# 選用的相關係數 (依 ASSET_KEYS 順序)：股票類彼此正相關，美債與風險資產負相關
+DEFAULT_CORRELATION = (
+    (1.0, 0.1, 0.6, 0.0, 0.3),
+    (0.1, 1.0, -0.2, 0.0, -0.1),
+    (0.6, -0.2, 1.0, 0.0, 0.5),
+    (0.0, 0.0, 0.0, 1.0, 0.0),
+    (0.3, -0.1, 0.5, 0.0, 1.0),
+)
+
+
+@dataclass(frozen=True)
+class StochasticReturns:
+    volatility: tuple = DEFAULT_VOLATILITY
+    correlation: tuple = None                  # None = 各資產獨立
+    _vol: np.ndarray = field(init=False, repr=False, compare=False)
+    _chol: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        vol = np.asarray(self.volatility, dtype=np.float64)
+        if vol.shape != (len(ASSET_KEYS),) or (vol < 0).any():
+            raise ValueError(f"volatility 需要 {len(ASSET_KEYS)} 個非負數")
+        chol = None
+        if self.correlation is not None:
+            try:
+                chol = np.linalg.cholesky(np.asarray(self.correlation, dtype=np.float64))
+            except np.linalg.LinAlgError:
+                raise ValueError("correlation 必須是正定矩陣") from None
+        object.__setattr__(self, "_vol", vol)
+        object.__setattr__(self, "_chol", chol)
+
+    def factors(self, rng, shape, rates=RATE_VECTOR):
+        """一次抽出 (*shape, 5) 的年成長倍數，例如 shape=(10,) 為十年 x 五項資產"""
+        z = rng.standard_normal((*shape, len(ASSET_KEYS)))
+        if self._chol is not None:
+            z = z @ self._chol.T
+        vol = self._vol
+        return (1 + np.asarray(rates, dtype=np.float64)) * np.exp(vol * z - vol * vol / 2)
+
+    def to_record(self):
+        """存檔用 (重播時以 from_record 還原)"""
+        return {"volatility": list(self.volatility), "correlation": self.correlation and [list(r) for r in self.correlation]}
+
+    @classmethod
+    def from_record(cls, rec):
+        corr = rec.get("correlation")
+        return cls(tuple(rec["volatility"]), corr and tuple(tuple(r) for r in corr))
+
+
+def decade_rng(seed, year):
+    """每局每個十年各自一條亂數流：同一個 seed 重播結果相同，與呼叫順序無關"""
+    return np.random.default_rng(None if seed is None else [seed, year])
+
+
+def stochastic_growth_path(holdings, years, rates, returns, rng):
+    """隨機版 growth_path：十年 x 五項資產一次抽完，再用累積乘積算出每年持有"""
+    f = returns.factors(rng, (years,), rates)
+    return np.asarray(holdings, dtype=np.float64) * np.cumprod(f, axis=0)
+
+
+def advance(holdings, years=DECADE, rates=RATE_VECTOR):
+    """推進 N 年，回傳最終持有金額"""
+    return growth_path(holdings, years, rates)[-1]
+
+
+def apply_event(holdings, code):
+    """套用事件卡衝擊；holdings 可為 (5,) 或 (..., 5) 的批次陣列"""
+    return np.asarray(holdings, dtype=np.float64) * SHOCK_FACTORS[CARD_INDEX[code]]
+
+
+def rebalance(holdings, weights_pct):
+    """維持總資產不變，依新百分比重新分配"""
+    holdings = np.asarray(holdings, dtype=np.float64)
+    total = holdings.sum(axis=-1, keepdims=True)
+    return total * (np.asarray(weights_pct, dtype=np.float64) / 100)
+
+
+def weights_pct(holdings):
+    """目前各資產佔比 (%)，總資產為 0 時回傳全 0"""
+    holdings = np.asarray(holdings, dtype=np.float64)
+    total = holdings.sum(axis=-1, keepdims=True)
+    return np.divide(holdings * 100, total, out=np.zeros_like(holdings), where=total > 0)
+
+
+def impact_matrix(holdings):
+    """
+    所有卡片對目前持有的影響，一次算完：
+    回傳 (12 x 5 各資產損益, 12 張卡的總損益 = SHOCK_MATRIX @ holdings)
+    """
+    holdings = np.asarray(holdings, dtype=np.float64)
+    return SHOCK_MATRIX * holdings, SHOCK_MATRIX @ holdings
+
+
+@lru_cache(maxsize=4096)
+def _decade_multipliers(weights_key, rates_key):
+    w = np.array(weights_key, dtype=np.float64) / 100
+    grown = w * (1 + np.array(rates_key, dtype=np.float64)) ** DECADE
+    per_card = SHOCK_FACTORS @ grown
+    per_card.flags.writeable = False
+    return float(grown.sum()), per_card
+
+
+def decade_outlook(weights_pct, total, rates=RATE_VECTOR):
+    """
+    以 weights_pct 配置 total 後，推進十年再抽一張卡的結果：
+    回傳 (不抽卡的總資產, 12 張卡各自的總資產)。
+    結果與總資產成正比，所以只依「四捨五入到 0.1% 的配置」快取每 1 元的倍數。
+    """
+    key = tuple(round(float(w), 1) for w in weights_pct)
+    growth, per_card = _decade_multipliers(key, tuple(np.asarray(rates, dtype=np.float64).tolist()))
+    return total * growth, total * per_card
@@ -0,0 +1,257 @@
+from functools import lru_cache
+from html import escape
+
+from shiny import ui
+
+from engine import BASE_RATES, ASSET_KEYS, KEY_MAPPING, EVENT_CARDS, ROI_TIERS, roi_tier
+
+# ==========================================
+# 🧩 HTML 片段快取
+# ==========================================
+# 固定不變的片段在 import 時組好一次；依卡片 / ROI 等級變化的片段用 lru_cache 記住，
+# 每次 render 只把真正會變的數字填進預先切好的模板。
+ASSET_NAMES = {'Dividend': '分紅收益', 'USBond': '美債', 'TWStock': '台股', 'Cash': '現金', 'Crypto': '加密幣'}
+RISK_LEVELS = {'Dividend': '低', 'USBond': '極低', 'TWStock': '中高', 'Cash': '無', 'Crypto': '極高'}
+FINANCE_COLORS = {'分紅收益': '#F59E0B', '美債': '#3B82F6', '台股': '#EF4444', '現金': '#9CA3AF', '加密幣': '#8B5CF6'}
+ASSET_LABELS = [ASSET_NAMES[k] for k in ASSET_KEYS]
+
+# 分享卡背景，與 engine.ROI_TIERS 同順序
+TIER_BACKGROUNDS = [
+    "linear-gradient(135deg, #7f1d1d, #ef4444)",
+    "linear-gradient(135deg, #4b5563, #9ca3af)",
+    "linear-gradient(135deg, #059669, #34d399)",
+    "linear-gradient(135deg, #7c3aed, #a78bfa)",
+    "linear-gradient(135deg, #b45309, #fbbf24)",
+]
+
+
+class Template:
+    """
+    預先切好的 HTML：靜態部分存成 chunks，render 時只把 values 插進空格。
+    chunks 比 values 多一段 (頭尾都是靜態字串)。
+    """
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks):
+        self.chunks = tuple(chunks)
+
+    def render(self, *values):
+        out = [self.chunks[0]]
+        for v, chunk in zip(values, self.chunks[1:]):
+            out += (v, chunk)
+        return ui.HTML("".join(out))
+
+
+# --- 常數片段 (import 時組好) ---
+_rate_rows = "".join(
+    f"<tr><td>{ASSET_NAMES[k]}</td><td>{int(BASE_RATES[k]*100)}%</td><td>{RISK_LEVELS[k]}</td></tr>" for k in ASSET_KEYS
+)
+RATES_TABLE = ui.HTML(
+    f"<table class='table table-striped'><thead><tr><th>資產</th><th>年化</th><th>風險</th></tr></thead><tbody>{_rate_rows}</tbody></table>"
+)
+EMPTY = ui.div()
+
+
+# --- 目前資產明細表：只填入每項資產的金額與佔比 ---
+def _assets_detail_template():
+    chunks = ["""
+        <table class="asset-table">
+            <thead>
+                <tr>
+                    <th>項目</th>
+                    <th>金額 ($)</th>
+                    <th>佔比</th>
+                </tr>
+            </thead>
+            <tbody>"""]
+    for label in ASSET_LABELS:
+        chunks[-1] += f"""
+            <tr>
+                <td style="color:{FINANCE_COLORS[label]}; font-weight:bold;">{label}</td>
+                <td>$"""
+        chunks += ["</td>\n                <td>", "%</td>\n            </tr>"]
+    chunks[-1] += """
+            </tbody>
+        </table>
+        """
+    return Template(chunks)
+
+
+ASSETS_DETAIL = _assets_detail_template()
+
+
+def assets_detail(holdings, pcts):
+    """holdings / pcts 依 ASSET_KEYS 順序"""
+    return ASSETS_DETAIL.render(*[x for v, p in zip(holdings, pcts) for x in (f"{int(v):,}", f"{p:.1f}")])
+
+
+# --- 依卡片代碼 ---
+@lru_cache(maxsize=64)
+def card_display(code):
+    card = EVENT_CARDS[code]
+    return ui.div(
+        ui.h3(card['name'], style="color: #1E40AF;"),
+        ui.p(card['desc'], style="font-size: 1.1rem;"),
+        style="background: #EFF6FF; padding: 15px; border-radius: 8px; margin-top: 10px;"
+    )
+
+
+def _impact_style(pct_change):
+    # (背景色, 文字色, 正負號, 箭頭)：正為綠，負為紅
+    if pct_change < 0:
+        return "#FEF2F2", "#EF4444", "-", "▼"
+    if pct_change > 0:
+        return "#ECFDF5", "#10B981", "+", "▲"
+    return "#F3F4F6", "#6B7280", "", "-"
+
+
+@lru_cache(maxsize=64)
+def impact_template(code):
+    """衝擊預覽：每項資產一格，只有預估損益金額需要每次填入"""
+    card = EVENT_CARDS[code]
+    chunks = ["""
+                <div style="margin-top: 15px;">
+                    <h5 style="color: #4B5563; font-size: 0.9rem;">📉 資產衝擊預覽 (預估損益)</h5>
+                    <div style="display: flex; justify-content: space-between; gap: 4px;">
+                        """]
+    for k in ASSET_KEYS:
+        pct_change = card[KEY_MAPPING[k]]
+        bg_color, text_color, sign, arrow = _impact_style(pct_change)
+        chunks[-1] += f"""
+                <div style="flex: 1; background: {bg_color}; padding: 8px; border-radius: 8px; margin: 0 4px; text-align: center; border: 1px solid {text_color}33;">
+                    <div style="font-size: 11px; color: #6B7280;">{ASSET_NAMES[k]}</div>
+                    <div style="font-size: 16px; font-weight: bold; color: {text_color};">{arrow} {abs(pct_change)}%</div>
+                    <div style="font-size: 12px; font-weight: 600; color: {text_color}; margin-top: 4px;">
+                        {sign}$"""
+        chunks.append("""
+                    </div>
+                </div>
+                """)
+    chunks[-1] += """
+                    </div>
+                </div>
+            """
+    return Template(chunks)
+
+
+def impact_preview(code, holdings):
+    card = EVENT_CARDS[code]
+    amounts = [f"{int(abs(v * card[KEY_MAPPING[k]] / 100)):,}" for k, v in zip(ASSET_KEYS, holdings)]
+    return impact_template(code).render(*amounts)
+
+
+# --- 依 ROI 等級 ---
+@lru_cache(maxsize=len(ROI_TIERS))
+def share_card_template(tier):
+    _, title, desc = ROI_TIERS[tier]
+    bg = TIER_BACKGROUNDS[tier]
+    icon, name = title.split(' ')
+    return Template([f"""
+        <div style="width: 100%; max-width: 380px; margin: 0 auto; background: {bg}; border-radius: 20px; padding: 30px 20px; color: white; box-shadow: 0 10px 25px rgba(0,0,0,0.3); text-align: center; border: 4px solid rgba(255,255,255,0.2);">
+            <div style="font-size: 40px; margin-bottom: 10px;">{icon}</div>
+            <div style="font-size: 28px; font-weight: 800;">{name}</div>
+            <div style="font-style: italic; opacity: 0.9; margin: 10px 0;">“{desc}”</div>
+            <div style="background: rgba(255,255,255,0.9); color: #1F2937; border-radius: 12px; padding: 10px; margin: 15px 0;">
+                <div style="font-size: 12px;">最終資產</div>
+                <div style="font-size: 32px; font-weight: 800;">$""", """</div>
+            </div>
+            <div style="font-size: 12px; opacity: 0.8;">玩家: """, " | ROI: ", """%</div>
+        </div>
+        """])
+
+
+def share_card(final_w, roi, user_name):
+    return share_card_template(roi_tier(roi)).render(f"{int(final_w):,}", escape(user_name), f"{roi:+.1f}")
+
+
+# --- 風險雷達：12 張卡 x 5 項資產 ---
+# 持有金額恆為正，所以每格的顏色只由卡片衝擊的正負決定，可以整列預先組好
+def _signed_color(pct_change):
+    return _impact_style(pct_change)[1]
+
+
+RISK_RADAR_HEAD = (
+    "<table class='table table-sm' style='font-size: 12px; margin: 0;'><thead><tr><th>卡片</th>"
+    + "".join(f"<th style='text-align: right;'>{ASSET_NAMES[k]}</th>" for k in ASSET_KEYS)
+    + "<th style='text-align: right;'>合計</th></tr></thead><tbody>"
+)
+
+
+@lru_cache(maxsize=64)
+def risk_radar_row(code):
+    card = EVENT_CARDS[code]
+    chunks = [f"<tr><td>[{code}] {card['name']}</td>"]
+    for k in ASSET_KEYS:
+        chunks[-1] += f"<td style='text-align: right; color: {_signed_color(card[KEY_MAPPING[k]])};'>"
+        chunks.append("</td>")
+    chunks[-1] += "<td style='text-align: right; font-weight: 600;'>"
+    chunks.append("</td></tr>")
+    return Template(chunks)
+
+
+def risk_radar(codes, per_asset, totals):
+    """codes 與 engine.impact_matrix 的輸出順序一致 (engine.CARD_CODES)"""
+    rows = [
+        risk_radar_row(c).render(*[f"{v:+,.0f}" for v in row], f"{t:+,.0f}")
+        for c, row, t in zip(codes, per_asset.tolist(), totals.tolist())
+    ]
+    worst, best = int(totals.argmin()), int(totals.argmax())
+    summary = (
+        f"<div style='display: flex; gap: 8px; margin-bottom: 8px;'>"
+        f"<div style='flex: 1; background: #FEF2F2; color: #EF4444; padding: 8px; border-radius: 8px;'>最壞: [{codes[worst]}] {EVENT_CARDS[codes[worst]]['name']}<br><b>{totals[worst]:+,.0f}</b></div>"
+        f"<div style='flex: 1; background: #ECFDF5; color: #10B981; padding: 8px; border-radius: 8px;'>最好: [{codes[best]}] {EVENT_CARDS[codes[best]]['name']}<br><b>{totals[best]:+,.0f}</b></div>"
+        f"</div>"
+    )
+    return ui.HTML(
+        "<div style='margin-top: 15px;'><h5 style='color: #4B5563; font-size: 0.9rem;'>🛰️ 風險雷達 (所有卡片對目前資產的影響)</h5>"
+        + summary + "<div style='overflow-x: auto;'>" + RISK_RADAR_HEAD + "".join(str(r) for r in rows)
+        + "</tbody></table></div></div>"
+    )
+
+
+# --- 再平衡試算：下一個十年 + 下一張卡 ---
+def _outcome_box(label, value, start, bg, color, note=""):
+    roi = (value - start) / start * 100 if start else 0.0
+    return (
+        f"<div style='flex: 1; background: {bg}; color: {color}; padding: 8px; border-radius: 8px; text-align: center;'>"
+        f"<div style='font-size: 11px; color: #6B7280;'>{label}</div>"
+        f"<div style='font-size: 16px; font-weight: bold;'>${int(value):,}</div>"
+        f"<div style='font-size: 12px;'>{roi:+.1f}%{note}</div></div>"
+    )
+
+
+def rebalance_whatif(start, no_card, per_card, codes, next_year):
+    """start: 目前總資產；per_card 與 codes 同順序 (engine.CARD_CODES)"""
+    worst, best = int(per_card.argmin()), int(per_card.argmax())
+    boxes = "".join([
+        _outcome_box("平均 (12 張卡)", float(per_card.mean()), start, "#EFF6FF", "#1E40AF"),
+        _outcome_box("最壞", float(per_card[worst]), start, "#FEF2F2", "#EF4444", f"<br>[{codes[worst]}] {EVENT_CARDS[codes[worst]]['name']}"),
+        _outcome_box("最好", float(per_card[best]), start, "#ECFDF5", "#10B981", f"<br>[{codes[best]}] {EVENT_CARDS[codes[best]]['name']}"),
+    ])
+    return ui.HTML(
+        f"<div style='margin: 10px 0;'><h5 style='color: #4B5563; font-size: 0.9rem;'>🔮 試算：此配置到第 {next_year} 年 "
+        f"(無事件 ${int(no_card):,})</h5><div style='display: flex; gap: 6px;'>{boxes}</div></div>"
+    )
+
+
+# --- 結束頁排行榜：前 K 名 + 自己的名次 ---
+LEADERBOARD_HEAD = (
+    "<table class='table table-sm' style='font-size: 13px; margin: 0;'><thead><tr><th>#</th><th>玩家</th>"
+    "<th style='text-align: right;'>最終資產</th><th style='text-align: right;'>報酬率</th></tr></thead><tbody>"
+)
+
+
+def leaderboard(top, rank, n, pct):
+    """top: [(名次, 姓名, 最終資產, 報酬率)]；rank / pct 為目前玩家的名次與勝過的百分比，n 為紀錄筆數"""
+    rows = "".join(
+        f"<tr><td>{i}</td><td>{escape(name)}</td><td style='text-align: right;'>${int(w):,}</td>"
+        f"<td style='text-align: right;'>{roi:+.1f}%</td></tr>"
+        for i, name, w, roi in top
+    )
+    mine = (f"你目前排名第 {rank:,} 名 (共 {n:,} 筆紀錄)，勝過 {pct:.1f}% 的玩家" if n
+            else "還沒有其他玩家的紀錄，按下儲存成為第一名！")
+    return ui.HTML(
+        "<div style='margin-top: 10px; text-align: left;'>"
+        f"<div style='background: #EEF2FF; color: #3730A3; padding: 10px; border-radius: 8px; margin-bottom: 8px; text-align: center;'>{mine}</div>"
+        + LEADERBOARD_HEAD + rows + "</tbody></table></div>"
+    )
@@ -0,0 +1,234 @@
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+import uuid
+
+import numpy as np
+
+import engine
+from engine import ASSET_KEYS, EVENT_CARDS, INITIAL_CAPITAL, DECADE
+
+# ==========================================
+# 🧱 遊戲狀態 (不可變 + 結構共享)
+# ==========================================
+HORIZON = 30                                   # 總年數
+N_DECADES = HORIZON // DECADE
+HISTORY_COLUMNS = ['Year', *ASSET_KEYS]
+
+
+class _Buffer:
+    __slots__ = ("data", "filled")
+
+    def __init__(self, width, capacity, dtype):
+        self.data = np.zeros((capacity, width), dtype=dtype)
+        self.filled = 0
+
+
+class ArrayLog:
+    """
+    只能附加的預先配置陣列。
+    多個快照共用同一個 buffer，每個快照只看得到自己的前 n 列，已寫入的列永不修改；
+    只有「最新」的快照附加時才直接寫入，舊快照附加會先複製 (copy-on-write)。
+    """
+    __slots__ = ("_buf", "_len")
+
+    def __init__(self, width, capacity, dtype=np.float64):
+        self._buf = _Buffer(width, capacity, dtype)
+        self._len = 0
+
+    @classmethod
+    def _share(cls, buf, n):
+        log = cls.__new__(cls)
+        log._buf, log._len = buf, n
+        return log
+
+    def __len__(self):
+        return self._len
+
+    def append(self, rows):
+        rows = np.atleast_2d(rows)
+        n, k = self._len, len(rows)
+        buf = self._buf
+        if buf.filled != n or n + k > len(buf.data):
+            grown = _Buffer(buf.data.shape[1], max(len(buf.data) * 2, n + k), buf.data.dtype)
+            grown.data[:n] = buf.data[:n]
+            buf = grown
+        buf.data[n:n + k] = rows
+        buf.filled = n + k
+        return ArrayLog._share(buf, n + k)
+
+    def view(self):
+        v = self._buf.data[:self._len]
+        v.flags.writeable = False
+        return v
+
+
+def _frozen(vec):
+    vec = np.array(vec, dtype=np.float64)
+    vec.flags.writeable = False
+    return vec
+
+
+def _num(v):
+    # 整數百分比保持 int，存檔格式與舊紀錄一致
+    return int(v) if float(v).is_integer() else v
+
+
+# --- 由 log 還原成顯示 / 存檔用的格式 (細粒度 reactive 輸出直接拿 log 呼叫) ---
+def history_table(history):
+    """每年最後一列 (年份, 各資產)，回傳 (years, holdings)"""
+    h = history.view()
+    if not len(h):
+        return np.zeros(0, dtype=int), np.zeros((0, len(ASSET_KEYS)))
+    keep = np.r_[h[1:, 0] != h[:-1, 0], True]
+    return h[keep, 0].astype(int), h[keep, 1:]
+
+
+def card_codes(cards):
+    return [engine.CARD_CODES[i] for i in cards.view()[:, 1].tolist()]
+
+
+def drawn_cards(cards):
+    years = cards.view()[:, 0].tolist()
+    return [f"第 {y} 年: [{c}] {EVENT_CARDS[c]['name']}" for y, c in zip(years, card_codes(cards))]
+
+
+def config_history(config):
+    return {
+        f"Year {int(row[0])}": {k: _num(v) for k, v in zip(ASSET_KEYS, row[1:].tolist())}
+        for row in config.view()
+    }
+
+
+def initial_total(history):
+    return float(history.view()[0, 1:].sum()) if len(history) else 0.0
+
+
+def roi(total, start):
+    return (total - start) / start * 100 if start else 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class GameState:
+    year: int = 0
+    assets: np.ndarray = field(default_factory=lambda: _frozen(np.zeros(len(ASSET_KEYS))))
+    history: ArrayLog = field(default_factory=lambda: ArrayLog(len(HISTORY_COLUMNS), HORIZON + 2 * N_DECADES + 1))
+    config: ArrayLog = field(default_factory=lambda: ArrayLog(1 + len(ASSET_KEYS), N_DECADES + 1))
+    cards: ArrayLog = field(default_factory=lambda: ArrayLog(2, N_DECADES, dtype=np.int16))   # (年份, 卡片索引)
+    sub_stage: str = "wait_jump"
+    rates: np.ndarray = field(default_factory=lambda: _frozen(engine.RATE_VECTOR))
+    user_name: str = ""
+    returns: engine.StochasticReturns = None      # None = 固定報酬率
+    seed: int = None                              # 隨機報酬模式的本局亂數種子 (存檔後可重播)
+
+    # --- 狀態轉移：每次都回傳新的 GameState，未變動的欄位沿用同一個物件 ---
+    def start(self, name):
+        return replace(self, user_name=name)
+
+    def setup(self, weights_pct, capital=INITIAL_CAPITAL, seed=None):
+        assets = _frozen(engine.allocate(weights_pct, capital))
+        fresh = GameState(user_name=self.user_name, rates=self.rates, returns=self.returns,
+                          seed=self.seed if seed is None else seed)
+        return replace(
+            fresh, assets=assets,
+            history=fresh.history.append(np.r_[0, assets]),
+            config=fresh.config.append(np.r_[0, weights_pct]),
+        )
+
+    def jump(self, years=DECADE):
+        if self.returns is None:
+            path = engine.growth_path(self.assets, years, self.rates)
+        else:
+            rng = engine.decade_rng(self.seed, self.year)
+            path = engine.stochastic_growth_path(self.assets, years, self.rates, self.returns, rng)
+        yrs = np.arange(self.year + 1, self.year + years + 1)[:, None]
+        return replace(
+            self, year=self.year + years, assets=_frozen(path[-1]),
+            history=self.history.append(np.hstack([yrs, path])),
+            sub_stage="event_input",
+        )
+
+    def apply_event(self, code):
+        assets = _frozen(engine.apply_event(self.assets, code))
+        # 同一年再附加一列，圖表只取每年最後一列
+        return replace(
+            self, assets=assets,
+            history=self.history.append(np.r_[self.year, assets]),
+            cards=self.cards.append([self.year, engine.CARD_INDEX[code]]),
+            sub_stage="finished" if self.finished else "rebalance",
+        )
+
+    def rebalance(self, weights_pct):
+        assets = _frozen(engine.rebalance(self.assets, weights_pct))
+        return replace(
+            self, assets=assets,
+            history=self.history.append(np.r_[self.year, assets]),
+            config=self.config.append(np.r_[self.year, weights_pct]),
+            sub_stage="wait_jump",
+        )
+
+    # --- 讀取 ---
+    @property
+    def finished(self):
+        return self.year >= HORIZON
+
+    @property
+    def total(self):
+        return float(self.assets.sum())
+
+    @property
+    def initial_total(self):
+        return initial_total(self.history)
+
+    @property
+    def roi(self):
+        return roi(self.total, self.initial_total)
+
+    def assets_dict(self):
+        return engine.to_dict(self.assets)
+
+    def history_table(self):
+        return history_table(self.history)
+
+    @property
+    def card_codes(self):
+        return card_codes(self.cards)
+
+    @property
+    def drawn_cards(self):
+        return drawn_cards(self.cards)
+
+    @property
+    def config_history(self):
+        return config_history(self.config)
+
+
+def structured_record(gs):
+    """存檔用的結構化資料：卡片代碼 (int)、每十年配置 (float)、每年資產"""
+    years, holdings = history_table(gs.history)
+    rec = {
+        "card_codes": [int(c) for c in card_codes(gs.cards)],
+        "allocations": {int(row[0]): row[1:].tolist() for row in gs.config.view()},
+        "history": np.column_stack([years, holdings]).tolist(),
+    }
+    if gs.returns is not None:
+        # 隨機報酬模式：記下種子與波動度設定，replay.py 才能重現
+        rec.update(seed=gs.seed, **gs.returns.to_record())
+    return rec
+
+
+def save_record(gs, feedback="", now=None):
+    """save_finish 寫入成績資料庫的一列 (舊版 CSV 欄位 + 結構化欄位)"""
+    now = now or datetime.now()
+    return {
+        # 每次存檔一個唯一 ID：同一秒、同暱稱、同牌組的兩局也是兩筆；寫入重試 / 重播時靠它去重
+        "save_id": uuid.uuid4().hex,
+        '時間': now.strftime("%Y-%m-%d %H:%M:%S"),
+        '姓名': gs.user_name,
+        '最終資產': int(gs.total),
+        '報酬率(%)': round((gs.total - INITIAL_CAPITAL) / INITIAL_CAPITAL * 100, 1),
+        '抽卡歷程': " | ".join(gs.drawn_cards),
+        '配置_Year0': str(gs.config_history.get('Year 0', '')),
+        '玩家反饋': feedback,
+        # 結構化欄位 (卡片代碼、每十年配置、每年資產)，CSV 後端會忽略
+        **structured_record(gs),
+    }
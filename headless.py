@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import engine
+from engine import ASSET_KEYS, EVENT_CARDS, INITIAL_CAPITAL, ROI_TIERS, DECADE
+from game_state import GameState, N_DECADES
+
+# ==========================================
+# 🤖 無介面 API：不需要 Shiny 就能跑完整局遊戲
+# ==========================================
+# 與網頁版共用 GameState 的狀態轉移 (起始資金、十年複利、卡片衝擊、再平衡)，
+# 所以這裡算出來的分數就是玩家在網頁上會看到的分數。
+#
+# 腳本格式 (JSONL，一行一局)：
+#   {"name": "小明", "allocations": {"0": [20, 20, 20, 20, 20], "10": [...]}, "cards": ["101", "105", "111"]}
+# allocations 的 key 是年份；沒給的年份維持目前持有 (不再平衡)。
+# 隨機報酬模式另外加 "volatility" (5 個數)、"correlation" (選用) 與 "seed"。
+
+
+def _weights(w):
+    """list (依 ASSET_KEYS) 或 dict -> list，並檢查總和"""
+    if isinstance(w, dict):
+        w = [w[k] for k in ASSET_KEYS]
+    w = [float(x) for x in w]
+    if len(w) != len(ASSET_KEYS):
+        raise ValueError(f"配置需要 {len(ASSET_KEYS)} 個數值，收到 {len(w)} 個")
+    if abs(sum(w) - 100) > 0.1:
+        raise ValueError(f"比例總和必須為 100%，目前為 {sum(w):.1f}%")
+    return w
+
+
+def play(allocations, cards, name="", rates=None, returns=None, seed=None):
+    """
+    跑完一局並回傳結果 dict。
+    allocations: {年份: 配置} 或只有第 0 年時直接給一個配置；cards: 每十年一張卡的代碼
+    returns / seed: 隨機報酬模式 (engine.StochasticReturns 與本局種子)
+    """
+    if not isinstance(allocations, dict):
+        allocations = {0: allocations}
+    allocations = {int(y): _weights(w) for y, w in allocations.items()}
+    cards = [str(c) for c in cards]
+    if 0 not in allocations:
+        raise ValueError("缺少第 0 年配置")
+    if len(cards) != N_DECADES:
+        raise ValueError(f"需要 {N_DECADES} 張卡，收到 {len(cards)} 張")
+    unknown = [c for c in cards if c not in EVENT_CARDS]
+    if unknown:
+        raise ValueError(f"無效的卡片代碼: {unknown}")
+
+    gs = GameState(user_name=name, returns=returns)
+    if rates is not None:
+        gs = GameState(user_name=name, rates=np.asarray(rates, dtype=np.float64), returns=returns)
+    gs = gs.setup(allocations[0], seed=seed)
+    for code in cards:
+        gs = gs.jump(DECADE).apply_event(code)
+        if not gs.finished:
+            w = allocations.get(gs.year)
+            gs = gs.rebalance(w if w is not None else engine.weights_pct(gs.assets))
+    return result(gs)
+
+
+def result(gs):
+    """已結束的 GameState -> 結果 dict (與存檔欄位對應)"""
+    tier = engine.roi_tier(gs.roi)
+    return {
+        "name": gs.user_name,
+        "final_wealth": int(gs.total),
+        "roi": round(gs.roi, 1),
+        "tier": tier,
+        "title": ROI_TIERS[tier][1],
+        "cards": gs.card_codes,
+        "assets": gs.assets_dict(),
+        **({"seed": gs.seed} if gs.returns is not None else {}),
+    }
+
+
+def _play_script(script):
+    try:
+        returns = engine.StochasticReturns.from_record(script) if "volatility" in script else None
+        return play(script["allocations"], script["cards"], script.get("name", ""), returns=returns, seed=script.get("seed"))
+    except (KeyError, ValueError, TypeError) as e:
+        return {"name": script.get("name", ""), "error": str(e)}
+
+
+def _play_chunk(scripts):
+    return [_play_script(s) for s in scripts]
+
+
+def run_many(scripts, workers=None, chunk_size=500):
+    """
+    批次執行，結果順序與輸入相同。
+    每個工作程序一次處理 chunk_size 局，降低跨程序傳輸的成本；workers=1 時不開程序池。
+    """
+    scripts = list(scripts)
+    chunks = [scripts[i:i + chunk_size] for i in range(0, len(scripts), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return [r for c in chunks for r in _play_chunk(c)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [r for rs in pool.map(_play_chunk, chunks) for r in rs]
+
+
+def read_scripts(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+# ==========================================
+# 🖥️ 命令列
+# ==========================================
+#   python headless.py play --alloc 20,20,20,20,20 --cards 101,105,111
+#   python headless.py run games.jsonl -o results.jsonl --workers 8
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="不開網頁直接跑遊戲")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_play = sub.add_parser("play", help="跑一局")
+    p_play.add_argument("--alloc", default="20,20,20,20,20", help="第 0 年配置")
+    p_play.add_argument("--cards", required=True, help="例如 101,105,111")
+    p_play.add_argument("--name", default="")
+    p_run = sub.add_parser("run", help="批次執行 JSONL 腳本")
+    p_run.add_argument("input", help="JSONL 檔案，- 代表 stdin")
+    p_run.add_argument("-o", "--output", help="輸出 JSONL (預設 stdout)")
+    p_run.add_argument("--workers", type=int, default=os.cpu_count())
+    p_run.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "play":
+        res = play([float(x) for x in args.alloc.split(",")], args.cards.split(","), args.name)
+        print(f"{res['title']}  ${res['final_wealth']:,} (ROI {res['roi']:+.1f}%)")
+        return
+
+    f = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with f:
+        results = run_many(read_scripts(f), args.workers, args.chunk_size)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for r in results:
+            out.write(json.dumps(r, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    n_err = sum("error" in r for r in results)
+    print(f"完成 {len(results)} 局 (失敗 {n_err})，起始資金 {INITIAL_CAPITAL:,}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
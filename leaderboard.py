@@ -0,0 +1,93 @@
+import bisect
+import heapq
+import os
+import threading
+import time
+
+# ==========================================
+# 🏅 即時排行榜 (記憶體內的排序索引)
+# ==========================================
+# 啟動時從成績資料庫讀一次全部成績，之後只讀游標之後的新紀錄：
+#   _wealth  全部最終資產的升冪陣列 (bisect)，名次 / 百分位查詢 O(log n)
+#   _top     前 K 名的 min-heap，新成績只跟堆頂比一次
+# 每個 worker 各有一份；本 worker 的存檔在寫入管線寫完後立刻併入，
+# 其他 worker 的存檔由 poll() 定期 (每個 worker 最多每 POLL_SECS 秒查一次資料庫，MONEY_GAME_LEADERBOARD_POLL 可調) 補上；
+# 任何 worker 清空成績時資料庫的世代 (store.generation()) 會改變，poll() 看到就整個重建。
+TOP_K = 10
+POLL_SECS = float(os.environ.get("MONEY_GAME_LEADERBOARD_POLL", "2.0"))
+
+
+class Leaderboard:
+    def __init__(self, store, top_k=TOP_K):
+        self.store = store
+        self.top_k = top_k
+        self.version = 0             # 內容有變就 +1，session 只比對這個數字決定要不要重畫
+        self._wealth = []
+        self._top = []               # (最終資產, -游標, 姓名, 報酬率)：同分時先存檔的排前面
+        self._cursor = 0
+        self._generation = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """併入資料庫中游標之後的新成績，回傳新增筆數"""
+        with self._lock:
+            if self._generation is None:
+                self._generation = self.store.generation()
+            new = list(self.store.scores(self._cursor))
+            if not new:
+                return 0
+            wealth = [w for _, _, w, _ in new]
+            if len(new) > len(self._wealth):
+                # 啟動 (或大量匯入) 時一次排序，比逐筆 insort 快
+                self._wealth.extend(wealth)
+                self._wealth.sort()
+            else:
+                for w in wealth:
+                    bisect.insort(self._wealth, w)
+            for cursor, name, w, roi in new:
+                entry = (w, -cursor, name, roi)
+                if len(self._top) < self.top_k:
+                    heapq.heappush(self._top, entry)
+                elif entry > self._top[0]:
+                    heapq.heapreplace(self._top, entry)
+            self._cursor = new[-1][0]
+            self.version += 1
+            return len(new)
+
+    def poll(self, interval=POLL_SECS):
+        """給每個 session 的計時器呼叫：同一個 worker 內最多每 interval 秒查一次資料庫，回傳 version"""
+        now = time.monotonic()
+        if now - self._checked >= interval:
+            self._checked = now
+            if self.store.generation() != self._generation:
+                self.reset()
+            else:
+                self.refresh()
+        return self.version
+
+    def reset(self):
+        """成績清空後重建 (其他 worker 由 poll() 發現世代改變後自己重建)"""
+        with self._lock:
+            self._wealth, self._top, self._cursor = [], [], 0
+            self._generation = self.store.generation()
+            self.version += 1
+        self.refresh()
+
+    # --- 查詢 ---
+    def __len__(self):
+        return len(self._wealth)
+
+    def top(self):
+        """[(名次, 姓名, 最終資產, 報酬率)]，由高到低"""
+        ranked = sorted(self._top, reverse=True)
+        return [(i + 1, name, w, roi) for i, (w, _, name, roi) in enumerate(ranked)]
+
+    def rank(self, wealth):
+        """比 wealth 高的人數 + 1 (同分同名次)"""
+        return len(self._wealth) - bisect.bisect_right(self._wealth, wealth) + 1
+
+    def percentile(self, wealth):
+        """勝過多少百分比的玩家 (嚴格低於 wealth 的比例)"""
+        n = len(self._wealth)
+        return bisect.bisect_left(self._wealth, wealth) / n * 100 if n else 0.0
@@ -0,0 +1,290 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import websockets
+
+from engine import ASSET_KEYS
+
+# ==========================================
+# 🏋️ 壓力測試：一個 worker 能撐多少同時在線的玩家
+# ==========================================
+# 啟動 uvicorn (成績寫到暫存資料庫)，開 N 個 websocket session，
+# 每個 session 依序完成整局：開始 -> 設定 -> 3 x (推進 / 輸入卡片 / 套用 / 再平衡) -> 存檔。
+# 量測每個動作從送出到伺服器 flush 完成的延遲、整體吞吐量、伺服器記憶體與錯誤數。
+#   python loadtest.py --sessions 200
+#   python loadtest.py --url ws://127.0.0.1:8000/websocket/ --sessions 50   (測已經在跑的伺服器)
+APP_DIR = Path(__file__).parent
+STEP_TIMEOUT = 30.0
+# 每個動作完成後再等這麼久沒有新訊息才進行下一步 (不計入延遲)：
+# 卡片代碼的防抖 (預設 0.3 秒) 會晚一點再 flush 一次，不等完會被算到下一個動作頭上
+SETTLE_SECS = 0.4
+CARDS = ["101", "105", "111"]
+
+# 各頁面上的輸出；瀏覽器只會對看得到的輸出回報 hidden=false，伺服器才會計算
+PAGES = {
+    "login": [],
+    "setup": ["setup_rates_table", "setup_status"],
+    "playing": ["ui_year", "ui_wealth", "ui_roi", "ui_progress_bar", "game_interaction_area", "chart_assets_now",
+                "ui_current_assets_detail", "event_card_display", "event_impact_preview", "event_apply_btn_area",
+                "event_card_image", "rebalance_status", "risk_radar", "rebalance_whatif", "card_prefetch"],
+    "finished": ["ig_share_card", "final_wealth_text", "final_roi_text", "chart_history_area", "chart_config_history",
+                 "history_cards_list", "benchmark_compare", "leaderboard_table"],
+}
+
+
+def page_flags(page):
+    return {f".clientdata_output_{o}_hidden": p != page for p, outs in PAGES.items() for o in outs}
+
+
+def game_script(cards=CARDS):
+    """
+    一局的動作序列：(動作名稱, 送出的 input, 完成條件)。
+    完成條件為 None 時等下一次 flush；字串則等到該輸出出現在 values 裡 (卡片代碼有防抖)。
+    """
+    clicks = {}
+
+    def click(name):
+        clicks[name] = clicks.get(name, 0) + 1
+        return {f"{name}:shiny.action": clicks[name]}
+
+    steps = [
+        ("start_game", click("start_game"), None),
+        ("page_setup", {"wizard": "setup", **page_flags("setup")}, None),
+        ("confirm_setup", click("confirm_setup"), None),
+        ("page_playing", {"wizard": "playing", **page_flags("playing")}, None),
+    ]
+    for i, code in enumerate(cards):
+        steps += [
+            ("btn_jump_time", click("btn_jump_time"), None),
+            ("event_code_input", {"event_code_input": code}, "event_apply_btn_area"),
+            ("btn_apply_event", click("btn_apply_event"), None),
+        ]
+        if i < len(cards) - 1:
+            steps += [
+                ("rb_inputs", {f"rb_{k}": 20 for k in ASSET_KEYS}, None),
+                ("btn_confirm_rebalance", click("btn_confirm_rebalance"), None),
+            ]
+    steps += [
+        ("page_finished", {"wizard": "finished", **page_flags("finished")}, None),
+        ("save_finish", {**click("save_finish"), "feedback": "loadtest"}, None),
+    ]
+    return steps
+
+
+class Stats:
+    def __init__(self):
+        self.latency = {}          # 動作 -> [秒]
+        self.errors = {}           # 種類 -> 次數
+        self.games = 0
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+def _values(raw):
+    # 只解析 flush 結尾的 values 訊息；圖表的 comm 訊息可能有好幾 MB，解析它只會拖慢壓測端
+    return json.loads(raw) if raw.startswith('{"values"') else None
+
+
+async def _wait_flush(ws, want):
+    """讀到下一個 values 訊息 (一次 flush 結束)；want 不為 None 時要等到該輸出被更新"""
+    errors = {}
+    while True:
+        msg = _values(await ws.recv())
+        if msg is not None:
+            errors.update(msg.get("errors") or {})
+            if want is None or want in msg["values"]:
+                return errors
+
+
+async def _settle(ws, quiet_secs):
+    """讀掉這個動作延後產生的訊息，直到安靜 quiet_secs 秒；回傳其中的輸出錯誤"""
+    errors = {}
+    while True:
+        try:
+            msg = _values(await asyncio.wait_for(ws.recv(), quiet_secs))
+        except asyncio.TimeoutError:
+            return errors
+        if msg is not None:
+            errors.update(msg.get("errors") or {})
+
+
+def init_inputs(user_name):
+    """瀏覽器連線時送出的初始 input (停在登入頁)"""
+    return {
+        "user_name": user_name, "room_code": "", "p_div": 20, "p_bond": 20, "p_stock": 20, "p_cash": 20, "p_crypto": 20,
+        "admin_pwd": "", "feedback": "", "wizard": "login", ".clientdata_url_search": "", **page_flags("login"),
+    }
+
+
+async def play_session(url, idx, stats, think_secs, settle_secs=SETTLE_SECS):
+    init = init_inputs(f"bot{idx}")
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=STEP_TIMEOUT) as ws:
+            t0 = time.perf_counter()
+            await ws.send(json.dumps({"method": "init", "data": init}))
+            await asyncio.wait_for(_wait_flush(ws, None), STEP_TIMEOUT)
+            stats.latency.setdefault("init", []).append(time.perf_counter() - t0)
+            await _settle(ws, settle_secs)
+            for name, data, want in game_script():
+                if think_secs:
+                    await asyncio.sleep(think_secs)
+                t0 = time.perf_counter()
+                await ws.send(json.dumps({"method": "update", "data": data}))
+                errors = await asyncio.wait_for(_wait_flush(ws, want), STEP_TIMEOUT)
+                stats.latency.setdefault(name, []).append(time.perf_counter() - t0)
+                errors.update(await _settle(ws, settle_secs))
+                for _ in errors:
+                    stats.error(f"output:{name}")
+            stats.games += 1
+    except asyncio.TimeoutError:
+        stats.error("timeout")
+    except (OSError, websockets.WebSocketException) as e:
+        stats.error(type(e).__name__)
+
+
+# --- 伺服器 ---
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, data_dir, extra_env=None):
+    # 整個資料目錄 (成績、spool、房間、下載金鑰) 都放在 data_dir，不碰正式的 data/
+    env = {**os.environ, "MONEY_GAME_DATA_DIR": str(data_dir),
+           "MONEY_GAME_RESULTS": f"sqlite:///{data_dir / 'results.sqlite3'}", **(extra_env or {})}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=open(data_dir / "server.log", "wb"),
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"伺服器啟動失敗，請看 {data_dir / 'server.log'}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("伺服器啟動逾時")
+
+
+def rss_mb(pid):
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def _sample_rss(pid, samples, stop):
+    while not stop.is_set():
+        v = rss_mb(pid)
+        if v is not None:
+            samples.append(v)
+        await asyncio.sleep(0.2)
+
+
+async def run(url, sessions, ramp_secs=0.0, think_secs=0.0, pid=None, settle_secs=SETTLE_SECS):
+    stats = Stats()
+    samples, stop = [], asyncio.Event()
+    base_rss = rss_mb(pid) if pid else None
+    sampler = asyncio.create_task(_sample_rss(pid, samples, stop)) if pid else None
+
+    async def launch(i):
+        if ramp_secs:
+            await asyncio.sleep(ramp_secs * i / sessions)
+        await play_session(url, i, stats, think_secs, settle_secs)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[launch(i) for i in range(sessions)])
+    wall = time.perf_counter() - t0
+    stop.set()
+    if sampler:
+        await sampler
+    return report(stats, sessions, wall, base_rss, samples)
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def report(stats, sessions, wall, base_rss, samples):
+    actions = {
+        name: {
+            "n": len(v), "p50_ms": _pct(v, 50) * 1000, "p90_ms": _pct(v, 90) * 1000,
+            "p99_ms": _pct(v, 99) * 1000, "max_ms": max(v) * 1000, "mean_ms": statistics.fmean(v) * 1000,
+        }
+        for name, v in stats.latency.items()
+    }
+    n_actions = sum(a["n"] for a in actions.values())
+    res = {
+        "sessions": sessions, "games_completed": stats.games, "wall_secs": wall,
+        "actions_per_sec": n_actions / wall if wall else 0.0, "games_per_sec": stats.games / wall if wall else 0.0,
+        "errors": stats.errors, "actions": actions,
+    }
+    if base_rss is not None and samples:
+        peak = max(samples)
+        res.update(rss_base_mb=base_rss, rss_peak_mb=peak, rss_per_session_kb=(peak - base_rss) * 1024 / sessions)
+    return res
+
+
+def print_report(res):
+    print(f"{'動作':<24}{'n':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)")
+    for name, a in res["actions"].items():
+        print(f"{name:<24}{a['n']:>6}{a['p50_ms']:>9.1f}{a['p90_ms']:>9.1f}{a['p99_ms']:>9.1f}{a['max_ms']:>9.1f}")
+    print(f"\nsessions {res['sessions']} / 完成 {res['games_completed']} 局 / {res['wall_secs']:.1f} 秒")
+    print(f"吞吐量 {res['actions_per_sec']:.1f} 動作/秒, {res['games_per_sec']:.2f} 局/秒")
+    if "rss_peak_mb" in res:
+        print(f"伺服器 RSS {res['rss_base_mb']:.0f} MB -> 高峰 {res['rss_peak_mb']:.0f} MB "
+              f"(每 session 約 {res['rss_per_session_kb']:.0f} KB)")
+    print(f"錯誤: {res['errors'] or '無'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="扭轉命運 30 年 - websocket 壓力測試")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--ramp", type=float, default=0.0, help="幾秒內陸續連線 (預設同時)")
+    parser.add_argument("--think", type=float, default=0.0, help="每個動作之間的思考時間 (秒)")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECS, help="動作完成後等待安靜的秒數 (需大於防抖時間)")
+    parser.add_argument("--url", help="測試已在執行的伺服器 (不自動啟動)")
+    parser.add_argument("--pid", type=int, help="搭配 --url：量測此程序的 RSS")
+    parser.add_argument("--json", help="結果另存 JSON")
+    args = parser.parse_args(argv)
+
+    proc = None
+    with tempfile.TemporaryDirectory(prefix="money-game-load-") as tmp:
+        url, pid = args.url, args.pid
+        if url is None:
+            port = _free_port()
+            proc = start_server(port, Path(tmp))
+            url, pid = f"ws://127.0.0.1:{port}/websocket/", proc.pid
+        try:
+            res = asyncio.run(run(url, args.sessions, args.ramp, args.think, pid, args.settle))
+        finally:
+            if proc:
+                proc.terminate()
+                proc.wait(10)
+    print_report(res)
+    if args.json:
+        Path(args.json).write_text(json.dumps(res, ensure_ascii=False, indent=1), encoding="utf-8")
+    return 1 if res["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+import functools
+import inspect
+import logging
+import os
+import sys
+import time
+import types
+
+from shiny import ui
+from shiny.types import SilentException
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# 📊 效能量測 (預設關閉)
+# ==========================================
+# MONEY_GAME_METRICS=1 啟用。server() 裡每個 render / effect 都加上 @metrics.timed，
+# 依輸出 ID 累計：執行時間、次數、錯誤、送出的內容大小，以及「為什麼重跑」(哪個 input / 狀態欄位變了)。
+# 關閉時 timed 直接回傳原函式，不包任何東西，沒有額外成本。
+# 資料在每個 worker 程序內累計 (標籤 worker=pid)，可從本機的 /metrics (Prometheus 文字格式) 或管理員後台查看。
+# 只記錄真正跑完 (或丟出錯誤) 的執行；req() / reactive.event 第一次初始化等 SilentException 不算。
+#
+# 「為什麼重跑」靠 Shiny 的內部函式名稱 (見 _cause)：reactive.Value._set 與 invalidate_later 裡的 _task。
+# requirements.txt 因此把 shiny 釘在已驗證過的版本範圍；升級 Shiny 時匯入本模組會先檢查這兩個名稱，
+# 不見了就記一筆 warning，原因一律記為 unknown (次數與時間照常統計)，不會默默記錯。
+ENABLED = os.environ.get("MONEY_GAME_METRICS", "0") not in ("", "0", "false")
+METRICS_PATH = "/metrics"
+PREFIX = "money_game"
+MAX_CAUSE_DEPTH = 24
+LOCAL_CLIENTS = ("127.0.0.1", "::1", "localhost")
+
+
+class _Stat:
+    __slots__ = ("kind", "calls", "errors", "seconds", "max_seconds", "payload_bytes", "causes")
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.calls = self.errors = self.payload_bytes = 0
+        self.seconds = self.max_seconds = 0.0
+        self.causes = {}
+
+
+STATS = {}                       # 輸出 ID -> _Stat (整個 worker 共用)
+
+
+# --- 重跑原因 ---
+def _shiny_frames_ok():
+    """確認 _cause 依賴的 Shiny 內部函式名稱還在 (已驗證：shiny 1.8)"""
+    from shiny.reactive import Value, _core
+    value_set = getattr(getattr(Value, "_set", None), "__code__", None)
+    timer = getattr(getattr(_core, "invalidate_later", None), "__code__", None)
+    nested = [c.co_name for c in timer.co_consts if isinstance(c, types.CodeType)] if timer else []
+    return value_set is not None and value_set.co_name == "_set" and "_task" in nested
+
+
+CAUSES_SUPPORTED = _shiny_frames_ok() if ENABLED else False
+if ENABLED and not CAUSES_SUPPORTED:
+    logger.warning("這個 Shiny 版本找不到 Value._set / invalidate_later._task，重跑原因一律記為 unknown")
+
+
+def label(value, name):
+    """替 reactive.Value 取名，讓重跑原因顯示成這個名字 (input.* 由 Shiny 自己命名)"""
+    value._metrics_label = name
+    return value
+
+
+def _cause():
+    """
+    在 reactive context 被 invalidate 的當下往上找呼叫堆疊：
+    第一個正在 _set 的 reactive.Value 就是原因；invalidate_later 的計時器則記為 timer。
+    依賴 Shiny 私有的 frame 名稱，匯入時檢查不通過 (CAUSES_SUPPORTED) 就不猜，回傳 unknown。
+    """
+    if not CAUSES_SUPPORTED:
+        return "unknown"
+    f = sys._getframe(2)
+    for _ in range(MAX_CAUSE_DEPTH):
+        if f is None:
+            break
+        name = f.f_code.co_name
+        if name == "_set":
+            owner = f.f_locals.get("self")
+            found = getattr(owner, "_metrics_label", None) or getattr(owner, "_name", None)
+            if found:
+                return str(found)
+        elif name == "_task":
+            return "timer"
+        f = f.f_back
+    return "other"
+
+
+class _Cause:
+    """每個 session 的每個輸出各一個：記下本次 context 被 invalidate 的原因，給下一次執行用"""
+    __slots__ = ("pending",)
+
+    def __init__(self):
+        self.pending = "init"
+
+    def take(self):
+        cause, self.pending = self.pending, "other"
+        return cause
+
+    def watch(self):
+        from shiny.reactive import get_current_context
+        try:
+            ctx = get_current_context()
+        except RuntimeError:
+            return
+        ctx.on_invalidate(self._on_invalidate)
+
+    def _on_invalidate(self):
+        self.pending = _cause()
+
+
+def _payload_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (str, ui.HTML, ui.Tag, ui.TagList)):
+        return len(str(value).encode("utf-8"))
+    return 0                     # widget 等非文字輸出由 comm 另外傳送，這裡不計
+
+
+def _record(stat, cause, started, result, error):
+    elapsed = time.perf_counter() - started
+    stat.calls += 1
+    stat.seconds += elapsed
+    stat.max_seconds = max(stat.max_seconds, elapsed)
+    stat.errors += error
+    stat.payload_bytes += _payload_size(result)
+    stat.causes[cause] = stat.causes.get(cause, 0) + 1
+
+
+def timed(name=None, kind=None):
+    """
+    放在 @render.xxx / @reactive.Effect 的正下方：
+        @render.ui
+        @metrics.timed
+        def game_interaction_area(): ...
+
+        @reactive.Effect
+        @metrics.timed("apply_event")
+        @reactive.event(input.btn_apply_event)
+        def _(): ...
+    render 輸出直接用函式名稱；effect 的函式都叫 _，要給名字。
+    """
+    if callable(name):
+        return timed()(name)
+
+    def deco(fn):
+        if not ENABLED:
+            return fn
+        key = name or fn.__name__
+        stat = STATS.setdefault(key, _Stat(kind or ("effect" if name else "render")))
+        cause = _Cause()
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper():
+                why = cause.take()
+                cause.watch()
+                started = time.perf_counter()
+                try:
+                    result = await fn()
+                except SilentException:
+                    raise                # req() 擋下 / reactive.event 初始化：沒有真的執行，不計
+                except Exception:
+                    _record(stat, why, started, None, True)
+                    raise
+                _record(stat, why, started, result, False)
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper():
+            why = cause.take()
+            cause.watch()
+            started = time.perf_counter()
+            try:
+                result = fn()
+            except SilentException:
+                raise                # req() 擋下 / reactive.event 初始化：沒有真的執行，不計
+            except Exception:
+                _record(stat, why, started, None, True)
+                raise
+            _record(stat, why, started, result, False)
+            return result
+        return wrapper
+    return deco
+
+
+# ==========================================
+# 📤 輸出：Prometheus 文字格式 / 管理員後台表格
+# ==========================================
+def _escape(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    lines = []
+
+    def family(metric, mtype, help_text, samples):
+        lines.extend([f"# HELP {PREFIX}_{metric} {help_text}", f"# TYPE {PREFIX}_{metric} {mtype}"])
+        for labels, v in samples:
+            lbl = ",".join(f'{k}="{_escape(x)}"' for k, x in labels.items())
+            lines.append(f"{PREFIX}_{metric}{{{lbl}}} {v}")
+
+    items = sorted(STATS.items())
+    # 每個 worker 程序各自累計；多 worker 時用 worker 標籤分辨
+    worker = os.getpid()
+    ids = lambda k, s: {"output": k, "kind": s.kind, "worker": worker}
+    family("reactive_calls_total", "counter", "Number of executions per output / effect.",
+           [(ids(k, s), s.calls) for k, s in items])
+    family("reactive_errors_total", "counter", "Executions that raised (excluding req() / silent).",
+           [(ids(k, s), s.errors) for k, s in items])
+    family("reactive_seconds_total", "counter", "Wall time spent in the function body.",
+           [(ids(k, s), f"{s.seconds:.6f}") for k, s in items])
+    family("reactive_seconds_max", "gauge", "Slowest single execution.",
+           [(ids(k, s), f"{s.max_seconds:.6f}") for k, s in items])
+    family("reactive_payload_bytes_total", "counter", "Bytes of rendered HTML / text sent to the browser.",
+           [(ids(k, s), s.payload_bytes) for k, s in items])
+    family("reactive_invalidations_total", "counter", "Executions by invalidation cause.",
+           [({**ids(k, s), "cause": c}, n) for k, s in items for c, n in sorted(s.causes.items())])
+    return "\n".join(lines) + "\n"
+
+
+def summary_table(top=15):
+    """管理員後台：依總時間排序"""
+    if not ENABLED:
+        return ui.p("未啟用 (設定環境變數 MONEY_GAME_METRICS=1 後重新啟動)", style="color: #6B7280;")
+    items = sorted(STATS.items(), key=lambda kv: kv[1].seconds, reverse=True)[:top]
+    rows = "".join(
+        f"<tr><td>{k}</td><td style='text-align: right;'>{s.calls}</td>"
+        f"<td style='text-align: right;'>{s.seconds * 1000:,.0f}</td>"
+        f"<td style='text-align: right;'>{s.seconds / s.calls * 1000 if s.calls else 0:,.1f}</td>"
+        f"<td style='text-align: right;'>{s.payload_bytes / 1024:,.0f}</td>"
+        f"<td>{max(s.causes, key=s.causes.get) if s.causes else ''}</td></tr>"
+        for k, s in items
+    )
+    return ui.HTML(
+        "<table class='table table-sm' style='font-size: 11px;'><thead><tr><th>輸出</th><th>次數</th>"
+        "<th>總 ms</th><th>平均 ms</th><th>KB</th><th>主要原因</th></tr></thead>"
+        f"<tbody>{rows}</tbody></table>"
+    )
+
+
+class MetricsMiddleware:
+    """只回應本機的 GET /metrics；其他請求原樣交給 app"""
+
+    def __init__(self, app, path=METRICS_PATH):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") != self.path:
+            return await self.app(scope, receive, send)
+        client = (scope.get("client") or ("",))[0]
+        if client not in LOCAL_CLIENTS:
+            return await self.app(scope, receive, send)
+        body = prometheus_text().encode("utf-8")
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/plain; version=0.0.4; charset=utf-8"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,128 @@
+import argparse
+import numpy as np
+
+import engine
+from engine import INITIAL_CAPITAL, DECADE, SHOCK_FACTORS, RATE_VECTOR
+
+# ==========================================
+# 🎲 蒙地卡羅批次模擬 (配置 x 抽卡序列)
+# ==========================================
+N_DECADES = 3                      # 對應 game_interaction_area 的三輪：跳 10 年 -> 抽卡 -> 再平衡
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+STOCHASTIC_CHUNK = 50000           # 隨機報酬模式每批路徑數 (每批抽 chunk x 3 x 10 x 5 個亂數)
+
+
+def draw_card_sequences(n_paths, decades=N_DECADES, replace=True, rng=None):
+    """
+    抽出 n_paths 條卡片序列，回傳卡片索引 (n_paths x decades)，索引對應 engine.CARD_CODES。
+    replace=False 時同一局不會抽到重複的卡 (實體牌堆)。
+    """
+    rng = np.random.default_rng(rng)
+    n_cards = len(engine.CARD_CODES)
+    if replace:
+        return rng.integers(0, n_cards, size=(n_paths, decades))
+    if decades > n_cards:
+        raise ValueError(f"不放回抽卡最多 {n_cards} 輪")
+    # 每列各自洗牌後取前幾張
+    return np.argsort(rng.random((n_paths, n_cards)), axis=1)[:, :decades]
+
+
+def simulate(allocations, card_idx, rebalance="hold", capital=INITIAL_CAPITAL, rates=RATE_VECTOR,
+             returns=None, rng=None):
+    """
+    一次算完所有 (配置, 序列) 組合的最終資產，回傳 (n_alloc x n_paths)。
+
+    allocations: (n_alloc x 5) 的百分比配置 (依 ASSET_KEYS 順序)，或單一 (5,) 配置
+    card_idx:    draw_card_sequences 的輸出
+    rebalance:   "hold"    -> 只在第 0 年配置，之後不調整
+                 "initial" -> 每輪事件後都調回第 0 年的比例
+    returns:     engine.StochasticReturns 時每條路徑各自抽年報酬 (與單局遊戲同一套模型)
+    """
+    w = np.atleast_2d(np.asarray(allocations, dtype=np.float64)) / 100
+    card_idx = np.asarray(card_idx)
+    if returns is not None:
+        rng = np.random.default_rng(rng)
+        return np.concatenate([
+            _simulate_stochastic(w, card_idx[i:i + STOCHASTIC_CHUNK], rebalance, capital, rates, returns, rng)
+            for i in range(0, len(card_idx), STOCHASTIC_CHUNK)
+        ], axis=1)
+    decade_growth = (1 + np.asarray(rates, dtype=np.float64)) ** DECADE
+
+    if rebalance == "hold":
+        # 不調整時各資產獨立複利：w * g^(10d) * Π 衝擊，最後一次矩陣乘法加總
+        growth = decade_growth ** card_idx.shape[1]
+        path_factors = SHOCK_FACTORS[card_idx].prod(axis=1)          # (n_paths x 5)
+        return capital * ((w * growth) @ path_factors.T)
+    if rebalance == "initial":
+        # 每輪結束調回原比例，總資產每輪乘上 w · (g^10 * 衝擊)
+        final = np.full((w.shape[0], card_idx.shape[0]), float(capital))
+        for d in range(card_idx.shape[1]):
+            final *= (w * decade_growth) @ SHOCK_FACTORS[card_idx[:, d]].T
+        return final
+    raise ValueError(f"未知的再平衡策略: {rebalance}")
+
+
+def _simulate_stochastic(w, card_idx, rebalance, capital, rates, returns, rng):
+    # 每條路徑每個十年的成長倍數 (n_paths x decades x 5)：十年份的年報酬一次抽完再相乘
+    n_paths, decades = card_idx.shape
+    growth = returns.factors(rng, (n_paths, decades, DECADE), rates).prod(axis=2)
+    factors = growth * SHOCK_FACTORS[card_idx]
+    if rebalance == "hold":
+        return capital * (w @ factors.prod(axis=1).T)
+    if rebalance == "initial":
+        final = np.full((w.shape[0], n_paths), float(capital))
+        for d in range(decades):
+            final *= w @ factors[:, d].T
+        return final
+    raise ValueError(f"未知的再平衡策略: {rebalance}")
+
+
+def summarize(final_wealth, percentiles=DEFAULT_PERCENTILES, capital=INITIAL_CAPITAL):
+    """整理最終資產分佈：各配置的百分位數、平均與虧損機率"""
+    final_wealth = np.atleast_2d(final_wealth)
+    return {
+        "percentiles": tuple(percentiles),
+        "wealth": np.percentile(final_wealth, percentiles, axis=1).T,   # (n_alloc x len(percentiles))
+        "mean": final_wealth.mean(axis=1),
+        "loss_prob": (final_wealth < capital).mean(axis=1),
+    }
+
+
+def run(allocations, n_paths=100000, replace=True, rebalance="hold", seed=None, percentiles=DEFAULT_PERCENTILES,
+        returns=None):
+    """抽卡 + 模擬 + 統計一次完成 (同一個 seed 同時決定卡片與隨機報酬)"""
+    rng = np.random.default_rng(seed)
+    card_idx = draw_card_sequences(n_paths, replace=replace, rng=rng)
+    return summarize(simulate(allocations, card_idx, rebalance=rebalance, returns=returns, rng=rng), percentiles)
+
+
+# ==========================================
+# 🖥️ 命令列：python montecarlo.py --alloc 20,20,20,20,20
+# ==========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="扭轉命運 30 年 - 蒙地卡羅結果分佈")
+    parser.add_argument("--alloc", action="append", required=True, help="第 0 年配置，例如 20,20,20,20,20 (可重複指定)")
+    parser.add_argument("--paths", type=int, default=1000000)
+    parser.add_argument("--no-replace", action="store_true", help="不放回抽卡 (同一局不重複)")
+    parser.add_argument("--rebalance", choices=["hold", "initial"], default="hold")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--stochastic", action="store_true", help="隨機報酬 (預設波動度)")
+    parser.add_argument("--correlated", action="store_true", help="隨機報酬使用預設相關矩陣")
+    args = parser.parse_args(argv)
+
+    returns = None
+    if args.stochastic or args.correlated:
+        returns = engine.StochasticReturns(correlation=engine.DEFAULT_CORRELATION if args.correlated else None)
+    allocations = [[float(x) for x in a.split(",")] for a in args.alloc]
+    res = run(allocations, args.paths, replace=not args.no_replace, rebalance=args.rebalance, seed=args.seed,
+              returns=returns)
+
+    header = "  ".join(f"P{p}".rjust(12) for p in res["percentiles"])
+    print(f"{'配置':<24}{header}{'平均'.rjust(12)}{'虧損機率'.rjust(10)}")
+    for a, row, mean, loss in zip(args.alloc, res["wealth"], res["mean"], res["loss_prob"]):
+        cells = "  ".join(f"{int(v):>12,}" for v in row)
+        print(f"{a:<24}{cells}{int(mean):>12,}{loss:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+import engine
+import montecarlo
+from engine import INITIAL_CAPITAL
+from results_store import DATA_DIR
+
+# ==========================================
+# 📚 預先計算的結果表：(配置格點, 3 張卡序列) -> 最終資產
+# ==========================================
+# 12 張卡 x 3 輪 = 1,728 條序列；配置以 GRID_STEP% 為一格 (10% -> 1,001 種配置)
+# 存成 .npy，工作程序以 mmap 載入，多個 worker 共用同一份分頁快取。
+TABLE_DIR = DATA_DIR / "outcome_table"
+GRID_STEP = 10
+STRATEGIES = ("hold", "initial")   # 同 montecarlo.simulate 的 rebalance 參數
+N_DECADES = montecarlo.N_DECADES
+
+
+def allocation_grid(step=GRID_STEP):
+    """列舉所有總和 100% 的配置 (以 step% 為單位)，回傳 (n_alloc x 5) uint8"""
+    units = 100 // step
+    n = len(engine.ASSET_KEYS)
+    rows = []
+    # stars and bars：在 units + n - 1 個位置中選 n - 1 個隔板
+    for bars in itertools.combinations(range(units + n - 1), n - 1):
+        edges = (-1,) + bars + (units + n - 1,)
+        rows.append([(edges[i + 1] - edges[i] - 1) * step for i in range(n)])
+    return np.array(rows, dtype=np.uint8)
+
+
+def all_sequences(decades=N_DECADES):
+    """所有可放回的卡片序列 (卡片索引)，第 i 列即序列編號 i"""
+    n_cards = len(engine.CARD_CODES)
+    return np.array(list(itertools.product(range(n_cards), repeat=decades)), dtype=np.int64)
+
+
+def _fingerprint(step):
+    """規則 (利率、卡片、本金) 改變時，舊表會自動失效"""
+    payload = json.dumps({
+        "step": step,
+        "asset_keys": engine.ASSET_KEYS,
+        "card_codes": engine.CARD_CODES,
+        "rates": engine.RATE_VECTOR.tolist(),
+        "shocks": engine.SHOCK_MATRIX.tolist(),
+        "capital": INITIAL_CAPITAL,
+        "strategies": STRATEGIES,
+        "decades": N_DECADES,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def build(path=TABLE_DIR, step=GRID_STEP):
+    """計算整張表並原子地寫入 path (先寫暫存目錄再 rename)"""
+    path = Path(path)
+    grid = allocation_grid(step)
+    seqs = all_sequences()
+    wealth = np.stack([montecarlo.simulate(grid, seqs, rebalance=s) for s in STRATEGIES]).astype(np.float32)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=".outcome_table-", dir=path.parent))
+    np.save(tmp / "allocations.npy", grid)
+    np.save(tmp / "wealth.npy", wealth)                                         # (策略 x 配置 x 序列)
+    np.save(tmp / "best_alloc.npy", wealth.argmax(axis=1).astype(np.int16))     # 每條序列的最佳配置
+    (tmp / "meta.json").write_text(json.dumps({"step": step, "fingerprint": _fingerprint(step)}), encoding="utf-8")
+
+    if path.exists():
+        shutil.rmtree(path, ignore_errors=True)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        # 其他 worker 同時建好了，用它的就好
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+class OutcomeTable:
+    """唯讀查詢介面，所有查詢皆為 O(1) 索引"""
+
+    def __init__(self, path=TABLE_DIR):
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.step = meta["step"]
+        self.allocations = np.load(path / "allocations.npy")
+        self.wealth = np.load(path / "wealth.npy", mmap_mode="r")
+        self.best_alloc = np.load(path / "best_alloc.npy", mmap_mode="r")
+        self._alloc_index = {tuple(row): i for i, row in enumerate(self.allocations.tolist())}
+        self._units = 100 // self.step
+
+    # --- 索引 ---
+    def alloc_bucket(self, weights_pct):
+        """把任意配置四捨五入到最近的格點 (保持總和 100%)"""
+        w = np.asarray(weights_pct, dtype=np.float64)
+        total = w.sum()
+        if w.shape != (len(engine.ASSET_KEYS),) or (w < 0).any() or not total > 0:
+            raise ValueError(f"配置需要 {len(engine.ASSET_KEYS)} 個非負數，且總和大於 0")
+        raw = w / total * self._units
+        units = np.floor(raw).astype(int)
+        # 最大餘數法補足差額
+        short = self._units - units.sum()
+        if short > 0:
+            units[np.argsort(units - raw)[:short]] += 1
+        return self._alloc_index[tuple((units * self.step).tolist())]
+
+    @staticmethod
+    def seq_index(codes):
+        n_cards = len(engine.CARD_CODES)
+        idx = 0
+        for code in codes:
+            idx = idx * n_cards + engine.CARD_INDEX[code]
+        return idx
+
+    # --- 查詢 ---
+    def final_wealth(self, weights_pct, codes, strategy="hold"):
+        s = STRATEGIES.index(strategy)
+        return float(self.wealth[s, self.alloc_bucket(weights_pct), self.seq_index(codes)])
+
+    def roi(self, weights_pct, codes, strategy="hold"):
+        return (self.final_wealth(weights_pct, codes, strategy) - INITIAL_CAPITAL) / INITIAL_CAPITAL * 100
+
+    def best_for_deck(self, codes, strategy="hold"):
+        """這組卡片下的最佳第 0 年配置，回傳 (配置 dict, 最終資產)"""
+        s = STRATEGIES.index(strategy)
+        seq = self.seq_index(codes)
+        a = int(self.best_alloc[s, seq])
+        return dict(zip(engine.ASSET_KEYS, self.allocations[a].tolist())), float(self.wealth[s, a, seq])
+
+
+def load(path=TABLE_DIR, step=GRID_STEP):
+    """載入結果表；不存在或規則已變更時重新建立"""
+    path = Path(path)
+    try:
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("fingerprint") != _fingerprint(meta.get("step", step)):
+            raise ValueError("stale outcome table")
+    except (OSError, ValueError):
+        build(path, step)
+    return OutcomeTable(path)
+
+
+# ==========================================
+# 🖥️ 命令列：python outcome_table.py build
+# ==========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="建立 / 查詢預先計算的結果表")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build")
+    p_build.add_argument("--step", type=int, default=GRID_STEP)
+    p_build.add_argument("--path", default=str(TABLE_DIR))
+    p_query = sub.add_parser("query")
+    p_query.add_argument("cards", help="例如 101,105,111")
+    p_query.add_argument("--alloc", default="20,20,20,20,20")
+    p_query.add_argument("--strategy", choices=STRATEGIES, default="hold")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        print(f"已建立: {build(args.path, args.step)}")
+        return
+
+    table = load()
+    codes = args.cards.split(",")
+    alloc = [float(x) for x in args.alloc.split(",")]
+    best, best_w = table.best_for_deck(codes, args.strategy)
+    print(f"配置 {args.alloc}: ${int(table.final_wealth(alloc, codes, args.strategy)):,} "
+          f"(ROI {table.roi(alloc, codes, args.strategy):+.1f}%)")
+    print(f"最佳配置 {best}: ${int(best_w):,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import time
+
+from shiny import reactive
+
+import metrics
+from game_state import GameState
+
+# ==========================================
+# 🔀 細粒度 reactive 狀態
+# ==========================================
+# 每個欄位各自是一個 reactive.Value，輸出只依賴自己讀到的欄位。
+# GameState 轉移時沒變的欄位會沿用同一個物件，所以用 `is` 就能判斷要不要通知。
+FIELDS = {
+    "year": lambda gs: gs.year,
+    "assets": lambda gs: gs.assets,
+    "history": lambda gs: gs.history,
+    "config": lambda gs: gs.config,
+    "cards": lambda gs: gs.cards,
+    "sub_stage": lambda gs: gs.sub_stage,
+    "user_name": lambda gs: gs.user_name,
+    # 衍生值：只在設定第 0 年配置時改變，避免每次附加歷史都讓 ROI 重算
+    "initial_total": lambda gs: gs.initial_total,
+}
+
+
+class ReactiveGameState:
+    def __init__(self, gs=None):
+        self._gs = gs if gs is not None else GameState()
+        self._values = {
+            name: metrics.label(reactive.Value(getter(self._gs)), f"state.{name}") for name, getter in FIELDS.items()
+        }
+
+    def get(self):
+        """整個快照 (不建立 reactive 依賴)，給 effect 做狀態轉移用"""
+        return self._gs
+
+    def set(self, gs):
+        old, self._gs = self._gs, gs
+        for name, getter in FIELDS.items():
+            new_v, old_v = getter(gs), getter(old)
+            if new_v is old_v:
+                continue
+            if isinstance(new_v, (int, float, str)) and new_v == old_v:
+                continue
+            self._values[name].set(new_v)
+
+    def __getattr__(self, name):
+        # state.year()、state.assets() ... 讀取單一欄位並建立依賴
+        try:
+            return self.__dict__["_values"][name].get
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+# ==========================================
+# ⏱️ Debounce：輸入停止 delay_secs 秒後才更新，且值沒變就不通知下游
+# ==========================================
+def debounce(delay_secs):
+    def wrapper(fn):
+        result = metrics.label(reactive.Value(None), fn.__name__)
+        deadline = reactive.Value(None)
+
+        @reactive.calc
+        def latest():
+            return fn()
+
+        @reactive.effect(priority=102)
+        def _arm():
+            try:
+                latest()
+            finally:
+                deadline.set(time.monotonic() + delay_secs)
+
+        @reactive.effect(priority=101)
+        def _fire():
+            due = deadline.get()
+            if due is None:
+                return
+            left = due - time.monotonic()
+            if left > 0:
+                reactive.invalidate_later(left)
+                return
+            with reactive.isolate():
+                deadline.set(None)
+                value = latest()
+                if value != result.get():
+                    result.set(value)
+
+        return result.get
+    return wrapper
@@ -0,0 +1,154 @@
+import argparse
+import csv
+import itertools
+import json
+import sys
+
+import numpy as np
+
+import engine
+import headless
+import results_store
+from engine import ASSET_KEYS, INITIAL_CAPITAL, DECADE
+from results_store import ALLOC_YEARS, parse_allocation, parse_card_codes
+
+# ==========================================
+# 🔁 重播驗證：用存檔的卡片與配置重算最終資產
+# ==========================================
+# 逐列串流讀取 (csv.DictReader / 資料庫游標)，每 CHUNK 列向量化重算一次，
+# 檔案再大記憶體用量也固定。每列的結果：
+#   ok            重算結果與存檔一致 (相對誤差 <= rel_tol)
+#   mismatch      重算結果不同
+#   unverifiable  缺少卡片代碼 / 第 0 年配置 (例如舊版 Streamlit 有隨機雜訊的紀錄)
+# 缺少第 10 / 20 年配置時假設玩家維持持有 (assumed_hold=True)。
+# 隨機報酬模式的紀錄 (帶 seed 與 volatility) 以同一個種子逐局重播。
+CHUNK = 5000
+DEFAULT_REL_TOL = 1e-4
+N_DECADES = len(ALLOC_YEARS)
+
+
+def parse_row(row):
+    """
+    存檔列 -> (卡片索引 list, 配置 (N_DECADES x 5，缺少的年份為 NaN))，無法重播時回傳 None。
+    資料庫的結構化欄位 (card_codes / allocations) 優先，否則解析舊版字串。
+    """
+    codes = row.get("card_codes") or parse_card_codes(row.get('抽卡歷程'))
+    structured = row.get("allocations") or {}
+    allocs = np.full((N_DECADES, len(ASSET_KEYS)), np.nan)
+    for i, y in enumerate(ALLOC_YEARS):
+        a = structured.get(y) or parse_allocation(row.get(f'配置_Year{y}'))
+        if a is not None:
+            allocs[i] = a
+    if len(codes) != N_DECADES or np.isnan(allocs[0]).any() or any(str(c) not in engine.CARD_INDEX for c in codes):
+        return None
+    return [engine.CARD_INDEX[str(c)] for c in codes], allocs
+
+
+def replay_batch(card_idx, allocs, capital=INITIAL_CAPITAL, rates=engine.RATE_VECTOR):
+    """
+    向量化重播 N 局，運算順序與 GameState 相同 (結果逐位元一致)。
+    card_idx: (N, N_DECADES)；allocs: (N, N_DECADES, 5)，NaN 列代表不再平衡
+    """
+    holdings = engine.allocate(allocs[:, 0], capital)
+    growth = (1 + np.asarray(rates, dtype=np.float64)) ** DECADE
+    for d in range(N_DECADES):
+        holdings = holdings * growth * engine.SHOCK_FACTORS[card_idx[:, d]]
+        if d + 1 < N_DECADES:
+            w = allocs[:, d + 1]
+            has = ~np.isnan(w).any(axis=1)
+            holdings[has] = engine.rebalance(holdings[has], w[has])
+    return holdings.sum(axis=1)
+
+
+def _stochastic(row):
+    """紀錄中的隨機報酬設定 -> (StochasticReturns, seed)，固定報酬的紀錄回傳 None"""
+    if row.get("seed") in (None, "") or not row.get("volatility"):
+        return None
+    # 資料庫讀出來是 list；匯出成 CSV 後是 JSON 字串
+    rec = {k: json.loads(v) if isinstance(v, str) else v for k in ("volatility", "correlation") if (v := row.get(k))}
+    return engine.StochasticReturns.from_record(rec), int(row["seed"])
+
+
+def _replay_stochastic(cards, allocs, returns, seed):
+    alloc_map = {y: a.tolist() for y, a in zip(ALLOC_YEARS, allocs) if not np.isnan(a).any()}
+    res = headless.play(alloc_map, [engine.CARD_CODES[i] for i in cards], returns=returns, seed=seed)
+    return float(sum(res["assets"].values()))
+
+
+def verify(rows, rel_tol=DEFAULT_REL_TOL, chunk=CHUNK):
+    """逐列產生驗證結果 dict (串流，不會一次載入全部)"""
+    rows = iter(rows)
+    line = 0
+    while batch := list(itertools.islice(rows, chunk)):
+        parsed = [parse_row(r) for r in batch]
+        stoch = {i: _stochastic(r) for i, r in enumerate(batch) if parsed[i] is not None}
+        stoch = {i: s for i, s in stoch.items() if s is not None}
+        ok_idx = [i for i, p in enumerate(parsed) if p is not None and i not in stoch]
+        replayed = {
+            i: (_replay_stochastic(*parsed[i], *stoch[i]), bool(np.isnan(parsed[i][1][1:]).any()))
+            for i in stoch
+        }
+        if ok_idx:
+            cards = np.array([parsed[i][0] for i in ok_idx])
+            allocs = np.stack([parsed[i][1] for i in ok_idx])
+            finals = replay_batch(cards, allocs)
+            held = np.isnan(allocs[:, 1:]).any(axis=(1, 2))
+            replayed.update({i: (float(v), bool(h)) for i, v, h in zip(ok_idx, finals.tolist(), held.tolist())})
+
+        for i, row in enumerate(batch):
+            line += 1
+            out = {"line": line, "時間": row.get('時間'), "姓名": row.get('姓名'), "stored": row.get('最終資產')}
+            if i not in replayed:
+                yield {**out, "status": "unverifiable"}
+                continue
+            value, held = replayed[i]
+            try:
+                stored = float(row.get('最終資產'))
+            except (TypeError, ValueError):
+                yield {**out, "status": "unverifiable", "replayed": int(value)}
+                continue
+            diff = value - stored
+            status = "ok" if abs(diff) <= rel_tol * max(abs(stored), 1.0) else "mismatch"
+            yield {**out, "status": status, "replayed": int(value), "diff": round(diff, 2), "assumed_hold": held}
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.DictReader(f)
+
+
+# ==========================================
+# 🖥️ 命令列
+# ==========================================
+#   python replay.py game_data_records.csv           (CSV 檔)
+#   python replay.py --store                         (目前設定的成績資料庫)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="重播存檔並驗證最終資產")
+    parser.add_argument("csv", nargs="*", help="要驗證的 CSV；不指定時讀取成績資料庫")
+    parser.add_argument("--store", nargs="?", const="", default=None, help="成績資料庫 URL (預設同 app)")
+    parser.add_argument("--rel-tol", type=float, default=DEFAULT_REL_TOL)
+    parser.add_argument("--all", action="store_true", help="輸出每一列 (預設只輸出有問題的列)")
+    parser.add_argument("-o", "--output", help="輸出 JSONL (預設 stdout)")
+    args = parser.parse_args(argv)
+
+    if args.csv and args.store is None:
+        rows = itertools.chain.from_iterable(read_csv(p) for p in args.csv)
+    else:
+        rows = results_store.open_store(args.store or None).rows(structured=True)
+
+    counts = {"ok": 0, "mismatch": 0, "unverifiable": 0}
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for res in verify(rows, args.rel_tol):
+            counts[res["status"]] += 1
+            if args.all or res["status"] != "ok":
+                out.write(json.dumps(res, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(" / ".join(f"{k}: {v}" for k, v in counts.items()), file=sys.stderr)
+    return 1 if counts["mismatch"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
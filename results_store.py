@@ -0,0 +1,468 @@
+import abc
+import argparse
+import ast
+import csv
+import fcntl
+import io
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from engine import ASSET_KEYS, DECADE
+from game_state import HORIZON
+
+# ==========================================
+# 💾 成績儲存層 (CSV / SQLite 可替換)
+# ==========================================
+APP_DIR = Path(__file__).parent
+# 資料目錄 (成績資料庫、預先計算表)；多個 worker / 多台機器部署時用 MONEY_GAME_DATA_DIR 固定位置
+DATA_DIR = Path(os.environ.get("MONEY_GAME_DATA_DIR") or APP_DIR / "data")
+LEGACY_CSV_FILES = [APP_DIR / "game_data_records.csv", APP_DIR / "www" / "images" / "game_results.csv"]
+
+# CSV 標頭 (與舊版存檔相同) <-> SQLite 欄位
+RESULT_COLUMNS = {
+    '時間': 'created_at',
+    '姓名': 'name',
+    '最終資產': 'final_wealth',
+    '報酬率(%)': 'roi',
+    '抽卡歷程': 'cards',
+    '配置_Year0': 'alloc_year0',
+    '玩家反饋': 'feedback',
+}
+RESULT_FIELDS = list(RESULT_COLUMNS)
+
+# 結構化欄位：卡片代碼為整數、每十年 (第 0/10/20 年) 的配置各自一個 float 欄位
+ALLOC_YEARS = tuple(range(0, HORIZON, DECADE))
+CARD_COLUMNS = [f"card_{i + 1}" for i in range(len(ALLOC_YEARS))]
+ALLOC_COLUMNS = [f"alloc_y{y}_{k.lower()}" for y in ALLOC_YEARS for k in ASSET_KEYS]
+HISTORY_COLUMNS = ["result_id", "year"] + [k.lower() for k in ASSET_KEYS]
+# save_finish 額外附上的結構化資料 (不寫入 CSV)
+STRUCTURED_KEYS = ("save_id", "card_codes", "allocations", "history")
+
+_CARD_CODE_RE = re.compile(r"\[(\d{3})\]")
+
+
+def parse_card_codes(text):
+    """舊版顯示字串 '第 10 年: [101] ...' -> [101, ...]"""
+    return [int(c) for c in _CARD_CODE_RE.findall(text or "")]
+
+
+_ALLOC_ITEM_RE = re.compile(r"'(\w+)':\s*([-+0-9.eE]+)")
+
+
+def parse_allocation(text):
+    """舊版 str(dict) 配置 -> 依 ASSET_KEYS 順序的 float list，無法解析時回傳 None"""
+    if not text:
+        return None
+    # 快速路徑：{'Dividend': 20, ...} 用 regex 取值，比 ast.literal_eval 快約 10 倍
+    items = dict(_ALLOC_ITEM_RE.findall(text))
+    if len(items) == len(ASSET_KEYS):
+        try:
+            return [float(items[k]) for k in ASSET_KEYS]
+        except (KeyError, ValueError):
+            pass
+    try:
+        d = ast.literal_eval(text)
+        return [float(d[k]) for k in ASSET_KEYS]
+    except (ValueError, SyntaxError, KeyError, TypeError):
+        return None
+
+
+def _legacy_number(v):
+    try:
+        f = float(v)
+        return str(int(f)) if f.is_integer() else str(f)
+    except (TypeError, ValueError):
+        return str(v or "")
+
+
+def legacy_save_id(row):
+    """
+    舊 CSV 紀錄沒有 save_id，以 (時間, 姓名, 最終資產) 組成，重複匯入同一份 CSV 時才會去重。
+    格式要與 _create_schema 回填舊資料的 SQL 相同。
+    """
+    return f"legacy:{row.get('時間') or ''}|{row.get('姓名') or ''}|{_legacy_number(row.get('最終資產'))}"
+
+
+def _legacy_allocations(row):
+    allocs = row.pop("allocations", None) or {}
+    row.pop("card_codes", None)
+    for y, a in allocs.items():
+        key = f"配置_Year{y}"
+        if not row.get(key):
+            row[key] = str({k: int(v) if float(v).is_integer() else v for k, v in zip(ASSET_KEYS, a)})
+    return row
+
+
+class ResultsStore(abc.ABC):
+    """
+    所有後端共用的介面：write_batch 同步寫入多筆、依序讀出全部、匯出 CSV。
+    Shiny 端不直接呼叫寫入，而是經由 write_pipeline.WritePipeline 在背景批次寫。
+    Parquet 匯出 (export_arrow) 只有部分後端提供，呼叫前用 supports_arrow() 檢查。
+    """
+    IMPORT_CHUNK = 500
+
+    @abc.abstractmethod
+    def write_batch(self, rows):
+        ...
+
+    def append(self, row):
+        self.write_batch([row])
+
+    @abc.abstractmethod
+    def rows(self, structured=False):
+        """逐筆產生 CSV 格式的 dict；structured=True 時 (若後端有) 另附 card_codes / allocations"""
+
+    def scores(self, after=0):
+        """
+        排行榜用：逐筆產生 (游標, 姓名, 最終資產, 報酬率)，只包含游標 after 之後的紀錄。
+        游標只會遞增，下次傳入最後一筆的游標即可只讀新資料。
+        """
+        for i, row in enumerate(itertools.islice(self.rows(), after, None), after + 1):
+            try:
+                yield i, row.get('姓名') or "", float(row['最終資產']), float(row.get('報酬率(%)') or 0)
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    @abc.abstractmethod
+    def clear(self):
+        ...
+
+    def generation(self):
+        """每次 clear() 就 +1 (跨程序可見)；排行榜等記憶體索引用它發現別的 worker 清空了資料"""
+        return 0
+
+    def supports_arrow(self):
+        return callable(getattr(self, "export_arrow", None))
+
+    def close(self):
+        pass
+
+    def export_csv(self, f):
+        # 匯出時保留舊版多出來的欄位 (例如 配置_Year10)；結構化配置轉回舊版字串，CSV 也能重播
+        rows = [_legacy_allocations(r) for r in self.rows(structured=True)]
+        fields = RESULT_FIELDS + sorted({k for r in rows for k in r} - set(RESULT_FIELDS))
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    def export_csv_bytes(self):
+        buf = io.StringIO()
+        self.export_csv(buf)
+        return buf.getvalue().encode("utf-8-sig")
+
+    def import_csv(self, path):
+        """匯入舊版 CSV，回傳匯入筆數"""
+        n = 0
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            while chunk := list(itertools.islice(reader, self.IMPORT_CHUNK)):
+                self.write_batch(chunk)
+                n += len(chunk)
+        return n
+
+
+class CsvResultsStore(ResultsStore):
+    """舊版格式：直接附加到 CSV；以檔案鎖避免多個 worker 同時寫入造成斷行或重複標頭"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def write_batch(self, rows):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, mode="a", newline="", encoding="utf-8-sig") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+                if f.tell() == 0:
+                    writer.writeheader()
+                writer.writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def rows(self, structured=False):
+        if not self.path.exists():
+            return
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+
+    def clear(self):
+        gen = self.generation() + 1
+        self.path.unlink(missing_ok=True)
+        self._generation_path().write_text(str(gen))
+
+    def _generation_path(self):
+        return self.path.with_name(self.path.name + ".generation")
+
+    def generation(self):
+        try:
+            return int(self._generation_path().read_text())
+        except (OSError, ValueError):
+            return 0
+
+
+class SqliteResultsStore(ResultsStore):
+    """
+    SQLite (WAL) 後端。每個 write_batch 是一個交易；
+    多個程序同時寫入時靠 WAL + busy_timeout 排隊，不會寫壞檔案。
+    """
+
+    def __init__(self, path, import_legacy=True):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            created = self._create_schema(conn)
+        conn.close()
+        self._local = threading.local()
+
+        if created and import_legacy:
+            for legacy in LEGACY_CSV_FILES:
+                if legacy.exists():
+                    self.import_csv(legacy)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _create_schema(self, conn):
+        """建立 / 升級資料表，回傳 results 是否為新建"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='results'").fetchone()
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    created_at TEXT, name TEXT, final_wealth INTEGER, roi REAL,
+                    cards TEXT, alloc_year0 TEXT, feedback TEXT,
+                    extra TEXT, save_id TEXT
+                )""")
+            # 舊資料庫補上結構化欄位
+            have = {r[1] for r in conn.execute("PRAGMA table_info(results)")}
+            for col in CARD_COLUMNS:
+                if col not in have:
+                    conn.execute(f"ALTER TABLE results ADD COLUMN {col} INTEGER")
+            for col in ALLOC_COLUMNS:
+                if col not in have:
+                    conn.execute(f"ALTER TABLE results ADD COLUMN {col} REAL")
+            # 以 save_id 去重：新存檔是 uuid；舊 CSV 匯入的紀錄由 (時間, 姓名, 最終資產) 組成 (legacy_save_id)。
+            # 舊資料庫原本的 (時間, 姓名, 最終資產) 唯一索引會吃掉同一秒同分的真實存檔，改掉
+            if "save_id" not in have:
+                conn.execute("ALTER TABLE results ADD COLUMN save_id TEXT")
+            conn.execute("DROP INDEX IF EXISTS results_dedupe")
+            conn.execute("""
+                UPDATE results SET save_id = 'legacy:' || COALESCE(created_at, '') || '|' || COALESCE(name, '')
+                    || '|' || COALESCE(final_wealth, '')
+                WHERE save_id IS NULL""")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS results_save_id ON results (save_id)")
+            asset_cols = ", ".join(f"{c} REAL" for c in HISTORY_COLUMNS[2:])
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS result_history (
+                    result_id INTEGER NOT NULL, year INTEGER NOT NULL, {asset_cols},
+                    PRIMARY KEY (result_id, year)
+                ) WITHOUT ROWID""")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return not exists
+
+    # --- 寫入 ---
+    def write_batch(self, rows):
+        # 寫入連線每個執行緒一條 (通常只有寫入管線的背景執行緒)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        cols = list(RESULT_COLUMNS.values()) + ["extra"] + CARD_COLUMNS + ALLOC_COLUMNS + ["save_id"]
+        sql = f"INSERT OR IGNORE INTO results ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+        hist_sql = f"INSERT INTO result_history VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})"
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for row in rows:
+                cur = conn.execute(sql, self._to_params(row))
+                if cur.rowcount and row.get("history"):
+                    conn.executemany(hist_sql, [(cur.lastrowid, *h) for h in row["history"]])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _to_params(row):
+        extra = {k: v for k, v in row.items()
+                 if k not in RESULT_COLUMNS and k not in STRUCTURED_KEYS and v not in (None, "")}
+        # 新紀錄直接帶結構化資料；舊 CSV 只在匯入時解析一次
+        codes = row.get("card_codes") or parse_card_codes(row.get('抽卡歷程'))
+        allocs = row.get("allocations") or {y: parse_allocation(row.get(f"配置_Year{y}")) for y in ALLOC_YEARS}
+        cards = [codes[i] if i < len(codes) else None for i in range(len(CARD_COLUMNS))]
+        alloc_vals = [v for y in ALLOC_YEARS for v in (allocs.get(y) or [None] * len(ASSET_KEYS))]
+        return ([row.get(k) for k in RESULT_COLUMNS]
+                + [json.dumps(extra, ensure_ascii=False) if extra else None]
+                + cards + alloc_vals + [row.get("save_id") or legacy_save_id(row)])
+
+    # --- 讀取 ---
+    def rows(self, structured=False):
+        cols = list(RESULT_COLUMNS.values()) + ["extra"] + (CARD_COLUMNS + ALLOC_COLUMNS if structured else [])
+        n, n_cards, n_assets = len(RESULT_FIELDS), len(CARD_COLUMNS), len(ASSET_KEYS)
+        conn = self._connect()
+        try:
+            cur = conn.execute(f"SELECT {', '.join(cols)} FROM results ORDER BY id")
+            for rec in cur:
+                row = dict(zip(RESULT_FIELDS, rec[:n]))
+                if rec[n]:
+                    row.update(json.loads(rec[n]))
+                if structured:
+                    cards = rec[n + 1:n + 1 + n_cards]
+                    allocs = rec[n + 1 + n_cards:]
+                    if None not in cards:
+                        row["card_codes"] = list(cards)
+                    row["allocations"] = {
+                        y: list(a) for i, y in enumerate(ALLOC_YEARS)
+                        if None not in (a := allocs[i * n_assets:(i + 1) * n_assets])
+                    }
+                yield row
+        finally:
+            conn.close()
+
+    def scores(self, after=0):
+        # 游標就是 id (AUTOINCREMENT，清空後也不會重複使用)，走主鍵索引只讀新資料
+        conn = self._connect()
+        try:
+            yield from conn.execute(
+                "SELECT id, COALESCE(name, ''), final_wealth, COALESCE(roi, 0) FROM results"
+                " WHERE id > ? AND final_wealth IS NOT NULL ORDER BY id", (after,))
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM results")
+            conn.execute("DELETE FROM result_history")
+            # 世代記在資料庫標頭 (user_version)，與刪除同一個交易
+            gen = conn.execute("PRAGMA user_version").fetchone()[0] + 1
+            conn.execute(f"PRAGMA user_version = {int(gen)}")
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def generation(self):
+        conn = self._connect()
+        try:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+
+    # --- 分析用匯出：Parquet (需要 pyarrow) ---
+    def export_arrow(self, out_dir, batch_rows=10000):
+        """
+        匯出 results.parquet 與 history.parquet，欄位皆為型別化資料，
+        分析端用 pyarrow / pandas 直接讀取，不需要任何字串解析。
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet 匯出需要 pyarrow：pip install pyarrow") from None
+
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        results_schema = pa.schema(
+            [("id", pa.int64()), ("created_at", pa.timestamp("s")), ("name", pa.string()),
+             ("final_wealth", pa.int64()), ("roi", pa.float64()), ("feedback", pa.string())]
+            + [(c, pa.int16()) for c in CARD_COLUMNS]
+            + [(c, pa.float64()) for c in ALLOC_COLUMNS]
+        )
+        history_schema = pa.schema(
+            [("result_id", pa.int64()), ("year", pa.int16())] + [(c, pa.float64()) for c in HISTORY_COLUMNS[2:]]
+        )
+
+        def dump(sql, schema, path, convert=None):
+            conn = self._connect()
+            try:
+                cur = conn.execute(sql)
+                with pq.ParquetWriter(path, schema) as writer:
+                    while chunk := cur.fetchmany(batch_rows):
+                        cols = [list(c) for c in zip(*chunk)]
+                        if convert:
+                            cols = convert(cols)
+                        writer.write_batch(pa.record_batch(
+                            [pa.array(c, type=f.type) for c, f in zip(cols, schema)], schema=schema))
+            finally:
+                conn.close()
+
+        def convert_results(cols):
+            cols[1] = pc.strptime(pa.array(cols[1], pa.string()), format="%Y-%m-%d %H:%M:%S", unit="s", error_is_null=True)
+            return cols
+
+        result_cols = ["id", "created_at", "name", "final_wealth", "roi", "feedback"] + CARD_COLUMNS + ALLOC_COLUMNS
+        dump(f"SELECT {', '.join(result_cols)} FROM results ORDER BY id", results_schema,
+             out_dir / "results.parquet", convert_results)
+        dump(f"SELECT {', '.join(HISTORY_COLUMNS)} FROM result_history ORDER BY result_id, year", history_schema,
+             out_dir / "history.parquet")
+        return out_dir
+
+
+def load_arrow(out_dir):
+    """讀回 export_arrow 的輸出，回傳 (results, history) 兩個 pyarrow.Table"""
+    import pyarrow.parquet as pq
+    out_dir = Path(out_dir)
+    return pq.read_table(out_dir / "results.parquet"), pq.read_table(out_dir / "history.parquet")
+
+
+def open_store(url=None):
+    """
+    依網址開啟後端：sqlite:///路徑、csv:///路徑。
+    未指定時讀環境變數 MONEY_GAME_RESULTS，預設 data/results.sqlite3。
+    """
+    url = url or os.environ.get("MONEY_GAME_RESULTS") or f"sqlite:///{DATA_DIR / 'results.sqlite3'}"
+    scheme, _, path = url.partition(":///")
+    if scheme == "sqlite":
+        return SqliteResultsStore(path)
+    if scheme == "csv":
+        return CsvResultsStore(path)
+    raise ValueError(f"不支援的成績儲存位置: {url}")
+
+
+# ==========================================
+# 🖥️ 命令列：python results_store.py import a.csv b.csv
+# ==========================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="成績資料庫工具")
+    parser.add_argument("--store", default=None, help="例如 sqlite:///data/results.sqlite3")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_import = sub.add_parser("import")
+    p_import.add_argument("files", nargs="+")
+    p_export = sub.add_parser("export")
+    p_export.add_argument("output")
+    p_parquet = sub.add_parser("export-parquet")
+    p_parquet.add_argument("out_dir")
+    args = parser.parse_args(argv)
+
+    store = open_store(args.store)
+    if args.cmd == "import":
+        for path in args.files:
+            print(f"{path}: {store.import_csv(path)} 筆")
+    elif args.cmd == "export-parquet":
+        if not store.supports_arrow():
+            parser.error(f"{type(store).__name__} 不支援 Parquet 匯出，請使用 SQLite 後端 (--store sqlite:///...)")
+        print(f"已匯出: {store.export_arrow(args.out_dir)}")
+    else:
+        with open(args.output, "w", newline="", encoding="utf-8-sig") as f:
+            store.export_csv(f)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
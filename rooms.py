@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+
+from shiny import reactive
+
+from results_store import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# 📣 主持人廣播：同一個房間的玩家共用一張卡
+# ==========================================
+# 主持人在管理員後台選好「房間 + 年份 + 卡片」公布一次，房間內所有 session 直接拿到同一個卡片代碼，
+# 不必每位玩家各自輸入 (也不會打錯)。
+# 事件寫進資料目錄下的 SQLite (所有 worker 共用)；每個 worker 只有一個輪詢工作，
+# 讀到新事件後一次通知本 worker 內訂閱該房間的 session，再做一次 reactive flush。
+ROOMS_PATH = DATA_DIR / "rooms.sqlite3"
+POLL_SECS = 1.0
+ROOM_TTL_SECS = 12 * 3600        # 啟動時只載入最近半天的事件 (一場工作坊)
+
+
+def normalize(name):
+    """房間代碼不分大小寫、忽略前後空白"""
+    return (name or "").strip().upper()
+
+
+class RoomHub:
+    def __init__(self, path=ROOMS_PATH, poll_secs=POLL_SECS):
+        self.path = path
+        self.poll_secs = poll_secs
+        self._cards = {}             # 房間 -> {年份: 卡片代碼}
+        self._subs = {}              # 房間 -> set(callback)
+        self._cursor = None          # 第一次使用時才連資料庫
+        self._lock = threading.Lock()
+        self._task = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _fetch(self):
+        """讀入游標之後的事件並更新 _cards，回傳有變動的房間"""
+        with self._lock:
+            if self._cursor is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = self._connect()
+            try:
+                if self._cursor is None:
+                    conn.execute("""
+                        CREATE TABLE IF NOT EXISTS room_events (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            room TEXT NOT NULL, year INTEGER NOT NULL, code TEXT NOT NULL, created_at REAL NOT NULL
+                        )""")
+                    self._cursor = conn.execute(
+                        "SELECT COALESCE((SELECT MIN(id) - 1 FROM room_events WHERE created_at >= ?),"
+                        " (SELECT MAX(id) FROM room_events), 0)", (time.time() - ROOM_TTL_SECS,)).fetchone()[0]
+                rows = conn.execute("SELECT id, room, year, code FROM room_events WHERE id > ? ORDER BY id",
+                                    (self._cursor,)).fetchall()
+            finally:
+                conn.close()
+            changed = set()
+            for event_id, room, year, code in rows:
+                self._cards.setdefault(room, {})[year] = code
+                changed.add(room)
+                self._cursor = event_id
+            return changed
+
+    def _notify(self, rooms):
+        for room in rooms:
+            cards = dict(self._cards.get(room, {}))
+            for fn in list(self._subs.get(room, ())):
+                fn(cards)
+
+    # --- 主持人 ---
+    def publish(self, room, year, code):
+        """
+        寫入事件並立刻通知本 worker 的訂閱者 (在 reactive effect 內呼叫，同一次 flush 就會更新畫面)；
+        其他 worker 在下一次輪詢時收到。
+        """
+        self.cards(room)                 # 確保資料表已建立
+        conn = self._connect()
+        try:
+            conn.execute("INSERT INTO room_events (room, year, code, created_at) VALUES (?, ?, ?, ?)",
+                         (room, int(year), code, time.time()))
+        finally:
+            conn.close()
+        self._notify(self._fetch())
+
+    # --- 玩家 ---
+    def cards(self, room):
+        if self._cursor is None:
+            self._fetch()
+        return dict(self._cards.get(room, {}))
+
+    def subscribe(self, room, callback):
+        """callback(cards) 會先以目前內容呼叫一次，之後每次房間有新卡片時呼叫；回傳取消訂閱的函式"""
+        self._subs.setdefault(room, set()).add(callback)
+        callback(self.cards(room))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        def unsubscribe():
+            subs = self._subs.get(room)
+            if subs:
+                subs.discard(callback)
+                if not subs:
+                    del self._subs[room]
+        return unsubscribe
+
+    async def _run(self):
+        # 沒有任何訂閱者時就停止，下一個 subscribe 再啟動
+        while self._subs:
+            await asyncio.sleep(self.poll_secs)
+            try:
+                changed = await asyncio.to_thread(self._fetch)
+            except sqlite3.Error:
+                logger.exception("讀取房間事件失敗")
+                continue
+            changed &= self._subs.keys()
+            if changed:
+                async with reactive.lock():
+                    self._notify(changed)
+                    await reactive.flush()
@@ -0,0 +1,128 @@
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+# ==========================================
+# 🚀 多 worker 部署：一個埠、多個 uvicorn 程序
+# ==========================================
+# 每個 worker 是獨立的 Python 程序 (各自的 GIL)，各自以 SO_REUSEPORT 綁同一個埠，
+# 由 kernel 依連線雜湊平均分配。(uvicorn --workers 是共用一個 listen socket，
+# 同時湧入的連線常常全被同一個 worker 接走，壓測時 6 個 session 有 6 個落在同一個程序。)
+# Shiny 的 session 整個活在一條 websocket 上，連上哪個 worker 就一直在那個 worker (天然 sticky)；
+# 唯一會跨程序的 HTTP 請求是下載，已改成不綁 session 的簽章網址 (downloads.py)。
+# 跨 worker 共用的只有資料目錄：成績資料庫 (SQLite WAL)、預先計算表 (mmap)、下載簽章金鑰、主持人廣播的房間事件。
+#   python serve.py --workers 8 --host 0.0.0.0 --port 8000 --data-dir /srv/money-game
+# 前面若還有反向代理 (nginx 等)，只要轉送 websocket 即可，不需要 sticky 設定。
+APP_DIR = Path(__file__).parent
+DEFAULT_PORT = 8000
+RESTART_DELAY_SECS = 1.0
+CRASH_WINDOW_SECS = 60          # 這段時間內重啟太多次 (設定錯誤、import 失敗) 就整個停下來
+
+
+def prepare():
+    """
+    在父程序先做完所有 worker 第一次啟動都會做的事，避免 N 個 worker 同時搶著建：
+    圖片變體、預先計算表、成績資料庫結構 (含第一次匯入舊 CSV)、房間事件資料表與下載簽章金鑰。
+    """
+    import assets
+    import downloads
+    import outcome_table
+    import results_store
+    import rooms
+
+    assets.load_manifest(rebuild=True)
+    outcome_table.load()
+    results_store.open_store().close()
+    rooms.RoomHub().cards("")
+    downloads._secret()
+
+
+def _bind(host, port):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def _worker(host, port, log_level):
+    sys.path.insert(0, str(APP_DIR))
+    import uvicorn
+    uvicorn.Server(uvicorn.Config("app:app", log_level=log_level)).run(sockets=[_bind(host, port)])
+
+
+def supervise(n_workers, host, port, log_level):
+    """啟動 n 個 worker；有 worker 意外結束就補一個，收到 SIGINT / SIGTERM 時全部關閉"""
+    ctx = multiprocessing.get_context("spawn")
+    spawn = lambda: ctx.Process(target=_worker, args=(host, port, log_level), daemon=False)
+    workers = [spawn() for _ in range(n_workers)]
+    for w in workers:
+        w.start()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"扭轉命運 30 年：{n_workers} 個 worker 在 http://{host}:{port}", file=sys.stderr)
+    crashes = []
+    while not stopping:
+        time.sleep(RESTART_DELAY_SECS)
+        for i, w in enumerate(workers):
+            if w.is_alive() or stopping:
+                continue
+            now = time.monotonic()
+            crashes = [t for t in crashes if now - t < CRASH_WINDOW_SECS] + [now]
+            if len(crashes) > 2 * n_workers:
+                print("worker 一直異常結束，停止伺服器", file=sys.stderr)
+                stopping = True
+                break
+            print(f"worker {w.pid} 結束 (exit {w.exitcode})，重新啟動", file=sys.stderr)
+            workers[i] = spawn()
+            workers[i].start()
+    for w in workers:
+        w.terminate()          # uvicorn 收到 SIGTERM 會等進行中的請求結束
+    for w in workers:
+        w.join(30)
+    return 1 if crashes and len(crashes) > 2 * n_workers else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="扭轉命運 30 年 - 多 worker 伺服器")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--data-dir", help="資料目錄 (預設 ./data，或環境變數 MONEY_GAME_DATA_DIR)")
+    parser.add_argument("--results", help="成績儲存位置，例如 sqlite:///... (預設資料目錄下的 results.sqlite3)")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args(argv)
+
+    # 環境變數要在 import 任何遊戲模組之前設定，worker 程序也會繼承
+    if args.data_dir:
+        os.environ["MONEY_GAME_DATA_DIR"] = str(Path(args.data_dir).resolve())
+    if args.results:
+        os.environ["MONEY_GAME_RESULTS"] = args.results
+    sys.path.insert(0, str(APP_DIR))
+    prepare()
+
+    if not hasattr(socket, "SO_REUSEPORT"):
+        # 沒有 SO_REUSEPORT 的平台 (Windows) 退回 uvicorn 內建的多 worker
+        import uvicorn
+        uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers,
+                    app_dir=str(APP_DIR), log_level=args.log_level)
+        return
+    _bind(args.host, args.port).close()      # 埠被占用時在這裡就報錯，而不是每個 worker 各報一次
+    return supervise(args.workers, args.host, args.port, args.log_level)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import engine  # noqa: E402
+from engine import ASSET_KEYS, BASE_RATES, EVENT_CARDS, KEY_MAPPING  # noqa: E402
+
+# ==========================================
+# ⚙️ 遊戲規則：封閉解、卡片衝擊、再平衡 (對照舊版逐年 / 逐項的寫法)
+# ==========================================
+
+
+def _loop_growth(assets, years, rates):
+    """舊版 btn_jump_time：每年每項資產各乘一次 (1 + 利率)，記下每年年底"""
+    assets = dict(assets)
+    rows = []
+    for _ in range(years):
+        for k in ASSET_KEYS:
+            assets[k] *= (1 + rates[k])
+        rows.append([assets[k] for k in ASSET_KEYS])
+    return np.array(rows)
+
+
+@pytest.mark.parametrize("years", [1, 10, 30])
+@pytest.mark.parametrize("rates", [BASE_RATES, {'Dividend': 0.051, 'USBond': -0.02, 'TWStock': 0.123, 'Cash': 0.0, 'Crypto': 0.4}])
+def test_growth_path_matches_year_by_year_loop(years, rates):
+    holdings = {'Dividend': 123456.7, 'USBond': 200000, 'TWStock': 0, 'Cash': 50000, 'Crypto': 626543.3}
+    path = engine.growth_path(engine.to_vector(holdings), years, engine.to_vector(rates))
+    np.testing.assert_allclose(path, _loop_growth(holdings, years, rates), rtol=1e-12)
+    assert engine.advance(engine.to_vector(holdings), years, engine.to_vector(rates)).tolist() == path[-1].tolist()
+
+
+@pytest.mark.parametrize("code", list(EVENT_CARDS))
+def test_apply_event_matches_per_asset_percentages(code):
+    holdings = engine.allocate([10, 15, 25, 20, 30])
+    expected = [holdings[i] * (1 + EVENT_CARDS[code][KEY_MAPPING[k]] / 100) for i, k in enumerate(ASSET_KEYS)]
+    np.testing.assert_allclose(engine.apply_event(holdings, code), expected, rtol=1e-15)
+
+
+def test_apply_event_on_a_batch():
+    batch = np.stack([engine.allocate([20] * 5), engine.allocate([0, 0, 100, 0, 0])])
+    out = engine.apply_event(batch, "106")
+    np.testing.assert_array_equal(out[1], engine.apply_event(batch[1], "106"))
+
+
+def test_rebalance_keeps_total_and_weights_roundtrip():
+    holdings = engine.apply_event(engine.advance(engine.allocate([20] * 5)), "101")
+    moved = engine.rebalance(holdings, [50, 0, 25, 25, 0])
+    assert moved.sum() == pytest.approx(holdings.sum(), rel=1e-12)
+    np.testing.assert_allclose(engine.weights_pct(moved), [50, 0, 25, 25, 0], atol=1e-9)
+
+
+def test_weights_pct_of_empty_portfolio_is_zero():
+    assert engine.weights_pct(np.zeros(len(ASSET_KEYS))).tolist() == [0.0] * len(ASSET_KEYS)
+
+
+def test_impact_matrix_matches_apply_event():
+    holdings = engine.allocate([20] * 5)
+    per_asset, totals = engine.impact_matrix(holdings)
+    for i, code in enumerate(engine.CARD_CODES):
+        np.testing.assert_allclose(holdings + per_asset[i], engine.apply_event(holdings, code), rtol=1e-15)
+        assert totals[i] == pytest.approx(per_asset[i].sum())
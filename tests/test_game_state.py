@@ -0,0 +1,151 @@
+import copy
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import engine  # noqa: E402
+import game_state  # noqa: E402
+from engine import ASSET_KEYS, BASE_RATES, EVENT_CARDS, KEY_MAPPING  # noqa: E402
+from game_state import ArrayLog, GameState  # noqa: E402
+
+# ==========================================
+# 🧱 遊戲狀態：ArrayLog 結構共享，GameState 與舊版 dict 狀態逐步對照
+# ==========================================
+
+
+# --- ArrayLog ---
+def test_append_to_latest_snapshot_shares_buffer():
+    a = ArrayLog(2, 4).append([1, 1])
+    b = a.append([2, 2])
+    assert b._buf is a._buf
+    assert a.view().tolist() == [[1, 1]]
+    assert b.view().tolist() == [[1, 1], [2, 2]]
+
+
+def test_append_to_stale_snapshot_copies():
+    a = ArrayLog(2, 4).append([1, 1])
+    b = a.append([2, 2])
+    c = a.append([3, 3])                            # a 已經不是最新的：不能蓋掉 b 的第二列
+    assert c._buf is not b._buf
+    assert b.view().tolist() == [[1, 1], [2, 2]]
+    assert c.view().tolist() == [[1, 1], [3, 3]]
+    d = c.append([4, 4])                            # c 是新 buffer 的最新快照：直接寫入
+    assert d._buf is c._buf
+    assert b.view().tolist() == [[1, 1], [2, 2]]
+
+
+def test_append_past_capacity_grows():
+    log = ArrayLog(1, 2)
+    for i in range(5):
+        log = log.append([i])
+    assert log.view()[:, 0].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_view_is_read_only():
+    v = ArrayLog(2, 2).append([[1, 2], [3, 4]]).view()
+    with pytest.raises(ValueError):
+        v[0, 0] = 9
+
+
+# --- 舊版 (dict + deepcopy) 的狀態轉移，照原本的 effect 逐行搬過來 ---
+def _baseline_setup(props, initial=1000000):
+    assets = {k: initial * (props[i] / 100) for i, k in enumerate(ASSET_KEYS)}
+    return {"year": 0, "assets": assets, "history": [{'Year': 0, 'Total': initial, **assets}],
+            "config_history": {'Year 0': dict(zip(ASSET_KEYS, props))}, "drawn_cards": [], "sub_stage": "wait_jump"}
+
+
+def _baseline_jump(gs):
+    gs = copy.deepcopy(gs)
+    year = gs["year"]
+    for _ in range(10):
+        for k in ASSET_KEYS:
+            gs["assets"][k] *= (1 + BASE_RATES[k])
+        year += 1
+        gs["history"].append({'Year': year, 'Total': sum(gs["assets"].values()), **gs["assets"]})
+    gs["year"], gs["sub_stage"] = year, "event_input"
+    return gs
+
+
+def _baseline_apply(gs, code):
+    gs = copy.deepcopy(gs)
+    card = EVENT_CARDS[code]
+    for k in ASSET_KEYS:
+        gs["assets"][k] = gs["assets"][k] * (1 + card[KEY_MAPPING[k]] / 100)
+    gs["drawn_cards"].append(f"第 {gs['year']} 年: [{code}] {card['name']}")
+    gs["history"][-1].update(gs["assets"])
+    if gs["year"] < 30:
+        gs["sub_stage"] = "rebalance"
+    return gs
+
+
+def _baseline_rebalance(gs, values):
+    gs = copy.deepcopy(gs)
+    total = sum(gs["assets"].values())
+    for i, k in enumerate(ASSET_KEYS):
+        gs["assets"][k] = total * (values[i] / 100)
+    gs["config_history"][f"Year {gs['year']}"] = dict(zip(ASSET_KEYS, values))
+    gs["history"][-1].update(gs["assets"])
+    gs["sub_stage"] = "wait_jump"
+    return gs
+
+
+def _assert_same(new, old):
+    assert new.year == old["year"]
+    np.testing.assert_allclose(new.assets, [old["assets"][k] for k in ASSET_KEYS], rtol=1e-12)
+    years, holdings = new.history_table()
+    assert years.tolist() == [r['Year'] for r in old["history"]]
+    np.testing.assert_allclose(holdings, [[r[k] for k in ASSET_KEYS] for r in old["history"]], rtol=1e-12)
+    assert new.config_history == old["config_history"]
+    assert new.drawn_cards == old["drawn_cards"]
+    if old["year"] < 30:
+        assert new.sub_stage == old["sub_stage"]
+
+
+@pytest.mark.parametrize("props, cards, rebalances", [
+    ([20, 20, 20, 20, 20], ["101", "105", "111"], [None, None]),
+    ([10, 30, 40, 0, 20], ["106", "102", "112"], [[0, 50, 50, 0, 0], [25, 25, 25, 25, 0]]),
+    ([0, 0, 0, 100, 0], ["109", "109", "101"], [[0, 0, 0, 0, 100], None]),
+])
+def test_transitions_match_baseline(props, cards, rebalances):
+    new, old = GameState().start("p").setup(props), _baseline_setup(props)
+    _assert_same(new, old)
+    for i, code in enumerate(cards):
+        new, old = new.jump(), _baseline_jump(old)
+        _assert_same(new, old)
+        new, old = new.apply_event(code), _baseline_apply(old, code)
+        _assert_same(new, old)
+        if i < len(rebalances):
+            # 不調整時舊版等於按下確認、比例不變
+            w = rebalances[i] if rebalances[i] is not None else engine.weights_pct(new.assets).tolist()
+            new, old = new.rebalance(w), _baseline_rebalance(old, w)
+            _assert_same(new, old)
+    assert new.finished and new.sub_stage == "finished"
+    assert new.roi == pytest.approx((sum(old["assets"].values()) - 1000000) / 1000000 * 100)
+
+
+def test_transitions_do_not_touch_earlier_states():
+    s0 = GameState().setup([20] * 5)
+    s1 = s0.jump()
+    s2 = s1.apply_event("101")
+    alt = s1.apply_event("106")                     # 從同一個狀態分岔
+    assert len(s0.history) == 1 and len(s1.history) == 11
+    assert s2.drawn_cards != alt.drawn_cards
+    np.testing.assert_array_equal(s1.assets, s1.history.view()[-1, 1:])
+    np.testing.assert_array_equal(s0.history.view()[0, 1:], s0.assets)
+
+
+def test_baseline_csv_row_is_reproduced():
+    # game_data_records.csv 裡舊版玩的一局 (全程不調整)；
+    # 舊版再平衡欄位預填的比例四捨五入到 0.1%，按確認時會微調持有，所以只比到萬分之一
+    gs = GameState().start("111").setup([20] * 5)
+    for code in ["101", "105", "111"]:
+        gs = gs.jump().apply_event(code)
+        if not gs.finished:
+            gs = gs.rebalance(engine.weights_pct(gs.assets))
+    rec = game_state.save_record(gs)
+    assert rec['抽卡歷程'] == "第 10 年: [101] US FED降息3% | 第 20 年: [105] AI/半導體世代級突破 | 第 30 年: [111] 全球疫情快速升溫"
+    assert rec['配置_Year0'] == "{'Dividend': 20, 'USBond': 20, 'TWStock': 20, 'Cash': 20, 'Crypto': 20}"
+    assert rec['最終資產'] == pytest.approx(8586744, rel=1e-4)
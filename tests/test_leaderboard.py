@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import results_store  # noqa: E402
+from leaderboard import Leaderboard  # noqa: E402
+
+# ==========================================
+# 🏅 排行榜索引：名次 / 百分位，以及別的 worker 清空成績後重建
+# ==========================================
+
+
+@pytest.fixture(params=["sqlite", "csv"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return results_store.SqliteResultsStore(tmp_path / "results.sqlite3", import_legacy=False)
+    return results_store.CsvResultsStore(tmp_path / "results.csv")
+
+
+def _row(name, wealth):
+    return {"save_id": name, '時間': "2026-01-01 00:00:00", '姓名': name, '最終資產': wealth, '報酬率(%)': 0.0}
+
+
+def test_rank_and_top(store):
+    store.write_batch([_row(f"p{i}", w) for i, w in enumerate([300, 100, 500, 200, 400])])
+    lb = Leaderboard(store, top_k=3)
+    lb.refresh()
+    assert [name for _, name, _, _ in lb.top()] == ["p2", "p4", "p0"]
+    assert lb.rank(350) == 3 and lb.percentile(350) == 60.0
+    store.write_batch([_row("p5", 600)])
+    assert lb.refresh() == 1
+    assert lb.top()[0][1] == "p5"
+
+
+def test_clear_from_another_worker_is_noticed(store):
+    store.write_batch([_row("gone", 999)])
+    mine, other = Leaderboard(store), Leaderboard(store)
+    mine.refresh(), other.refresh()
+    store.clear()
+    mine.reset()                                    # 處理清空的 worker
+    store.write_batch([_row("new", 1)])
+    other.poll(interval=0)                          # 其他 worker 下一次輪詢
+    assert [name for _, name, _, _ in other.top()] == ["new"]
+    assert len(other) == 1 and other.rank(999) == 1
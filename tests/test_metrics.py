@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+
+import pytest
+from shiny import req
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import metrics  # noqa: E402
+
+# ==========================================
+# 📊 效能量測：req() 擋下的執行不計；Shiny 內部名稱檢查
+# ==========================================
+
+
+def test_silent_runs_are_not_counted(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "STATS", {})
+    allow = []
+
+    @metrics.timed("t")
+    def effect():
+        req(allow)
+        if allow == ["boom"]:
+            raise ValueError()
+        return "<p>ok</p>"
+
+    with pytest.raises(Exception):
+        effect()                                    # reactive.event 初始化 / req() 失敗
+    allow.append("go")
+    assert effect() == "<p>ok</p>"
+    allow[:] = ["boom"]
+    with pytest.raises(ValueError):
+        effect()
+    stat = metrics.STATS["t"]
+    assert (stat.calls, stat.errors, stat.payload_bytes) == (2, 1, len("<p>ok</p>"))
+
+
+def test_shiny_internals_used_for_causes_exist():
+    # 升級 Shiny 後這裡失敗：更新 metrics._cause 再調整 requirements.txt 的版本上限
+    assert metrics._shiny_frames_ok()
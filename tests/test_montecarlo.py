@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import engine  # noqa: E402
+import headless  # noqa: E402
+import montecarlo  # noqa: E402
+
+# ==========================================
+# 🎲 蒙地卡羅：批次模擬與單局遊戲一致、抽卡與種子
+# ==========================================
+ALLOCS = np.array([[20, 20, 20, 20, 20], [0, 10, 60, 0, 30], [0, 0, 0, 100, 0]])
+
+
+def _total(res):
+    return sum(res["assets"].values())
+
+
+@pytest.mark.parametrize("rebalance", ["hold", "initial"])
+def test_simulate_matches_headless_games(rebalance):
+    card_idx = montecarlo.draw_card_sequences(20, rng=1)
+    wealth = montecarlo.simulate(ALLOCS, card_idx, rebalance=rebalance)
+    assert wealth.shape == (len(ALLOCS), len(card_idx))
+    for a, alloc in enumerate(ALLOCS.tolist()):
+        plan = alloc if rebalance == "hold" else {0: alloc, 10: alloc, 20: alloc}
+        for p, seq in enumerate(card_idx.tolist()):
+            res = headless.play(plan, [engine.CARD_CODES[i] for i in seq])
+            assert wealth[a, p] == pytest.approx(_total(res), rel=1e-12)
+
+
+def test_stochastic_paths_are_reproducible_and_centered():
+    returns = engine.StochasticReturns()
+    card_idx = np.zeros((20000, montecarlo.N_DECADES), dtype=int) + engine.CARD_INDEX["105"]
+    a = montecarlo.simulate(ALLOCS[0], card_idx, returns=returns, rng=7)
+    b = montecarlo.simulate(ALLOCS[0], card_idx, returns=returns, rng=7)
+    assert a.tolist() == b.tolist()
+    fixed = montecarlo.simulate(ALLOCS[0], card_idx[:1])[0, 0]
+    # 雜訊的期望值是 1：平均值落在固定報酬的結果附近
+    assert a.mean() == pytest.approx(fixed, rel=0.02)
+
+
+def test_draw_without_replacement_has_no_repeats():
+    seqs = montecarlo.draw_card_sequences(1000, replace=False, rng=3)
+    assert all(len(set(s)) == montecarlo.N_DECADES for s in seqs.tolist())
+    with pytest.raises(ValueError):
+        montecarlo.draw_card_sequences(1, decades=len(engine.CARD_CODES) + 1, replace=False)
+
+
+def test_run_is_seeded():
+    a = montecarlo.run(ALLOCS, n_paths=5000, seed=11)
+    b = montecarlo.run(ALLOCS, n_paths=5000, seed=11)
+    assert a["wealth"].tolist() == b["wealth"].tolist()
+    assert a["wealth"].shape == (len(ALLOCS), len(montecarlo.DEFAULT_PERCENTILES))
+    assert (np.diff(a["wealth"], axis=1) >= 0).all()  # 百分位數遞增
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import headless  # noqa: E402
+import outcome_table  # noqa: E402
+
+# ==========================================
+# 🗂️ 預先計算的結果表
+# ==========================================
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    return outcome_table.load(tmp_path_factory.mktemp("outcome-table"))
+
+
+@pytest.mark.parametrize("weights", [[0] * 5, [-10, 50, 30, 20, 10], [50, 50]])
+def test_invalid_allocation_is_rejected(table, weights):
+    with pytest.raises(ValueError):
+        table.alloc_bucket(weights)
+
+
+def test_allocation_is_snapped_to_grid(table):
+    assert (table.allocations[table.alloc_bucket([1, 1, 1, 1, 1])] == 20).all()
+
+
+def _total(res):
+    return sum(res["assets"].values())
+
+
+@pytest.mark.parametrize("alloc", [[20, 20, 20, 20, 20], [0, 10, 60, 0, 30], [100, 0, 0, 0, 0]])
+@pytest.mark.parametrize("cards", [["101", "105", "111"], ["106", "106", "112"], ["109", "102", "101"]])
+def test_lookup_matches_headless_game(table, alloc, cards):
+    # hold：只在第 0 年配置；initial：每輪事件後調回第 0 年的比例
+    hold = headless.play(alloc, cards)
+    initial = headless.play({0: alloc, 10: alloc, 20: alloc}, cards)
+    # 表是 float32：比到百萬分之一
+    assert table.final_wealth(alloc, cards) == pytest.approx(_total(hold), rel=1e-6)
+    assert table.final_wealth(alloc, cards, "initial") == pytest.approx(_total(initial), rel=1e-6)
+    assert table.roi(alloc, cards) == pytest.approx(hold["roi"], abs=0.05)
+
+
+def test_best_for_deck_beats_every_grid_allocation(table):
+    cards = ["101", "105", "111"]
+    best, best_w = table.best_for_deck(cards)
+    assert _total(headless.play(list(best.values()), cards)) == pytest.approx(best_w, rel=1e-6)
+    assert best_w >= max(table.final_wealth(a, cards) for a in table.allocations[::37].tolist())
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+import websockets
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import loadtest  # noqa: E402
+
+# ==========================================
+# 🔁 每個動作重新計算 (送出) 了哪些輸出
+# ==========================================
+# 啟動一個真的 uvicorn，用 websocket 玩完一局 (與 loadtest 同一套動作)，
+# 記下每個動作之後 values 裡出現的輸出 ID：Shiny 只送出重新 render 過的輸出，
+# 所以這就是「這次點擊讓哪些輸出重算」。
+# 每個動作之後送一個 barrier 訊息 (Shiny 不認得的 method，會回一個帶同樣 tag 的 response)：
+# Shiny 依序處理訊息，所以 response 之前的 values 一定屬於這個動作，不靠「安靜多久」猜
+# (第一次進遊戲頁要載入 plotly，可能超過一秒)。
+# 會在之後才自己 flush 的計時器都關掉：卡片代碼防抖設為 0、排行榜輪詢調成很久。
+FLUSH_TIMEOUT_SECS = 30
+SERVER_ENV = {"MONEY_GAME_CODE_DEBOUNCE": "0", "MONEY_GAME_LEADERBOARD_POLL": "3600"}
+BARRIER = "render_count_barrier"
+
+
+async def _collect(ws, tag):
+    """讀到 barrier 的 response 為止，回傳這個動作的 {輸出 ID: 次數} 與錯誤"""
+    await ws.send(json.dumps({"method": BARRIER, "tag": tag, "args": []}))
+    renders, errors = {}, {}
+    barrier_done = False
+    while True:
+        raw = await asyncio.wait_for(ws.recv(), FLUSH_TIMEOUT_SECS)
+        if raw.startswith('{"response"'):
+            barrier_done = json.loads(raw)["response"]["tag"] == tag
+            continue
+        msg = loadtest._values(raw)
+        if msg is None:
+            continue
+        if barrier_done:
+            return renders, errors            # barrier 自己那次 (空的) flush
+        errors.update(msg.get("errors") or {})
+        for k in msg["values"]:
+            renders[k] = renders.get(k, 0) + 1
+
+
+async def _play(url):
+    steps = loadtest.game_script()
+    steps = steps[:-1]           # 不存檔 (不寫入成績)
+    steps.append(("rename", {"user_name": "renamed", "start_game:shiny.action": 99}, None))
+    log = []
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps({"method": "init", "data": loadtest.init_inputs("tester")}))
+        log.append(("init", *await _collect(ws, 0)))
+        for tag, (name, data, _) in enumerate(steps, 1):
+            await ws.send(json.dumps({"method": "update", "data": data}))
+            log.append((name, *await _collect(ws, tag)))
+    return log
+
+
+@pytest.fixture(scope="module")
+def renders(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("render-counts")
+    port = loadtest._free_port()
+    proc = loadtest.start_server(port, tmp, SERVER_ENV)
+    try:
+        log = asyncio.run(_play(f"ws://127.0.0.1:{port}/websocket/"))
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    # 同名動作 (三次推進 / 套用) 依序編號：btn_jump_time#1 ...
+    seen, out = {}, {}
+    for name, counts, errors in log:
+        seen[name] = seen.get(name, 0) + 1
+        out[f"{name}#{seen[name]}"] = (counts, errors)
+    return out
+
+
+def test_no_output_errors(renders):
+    assert {k: e for k, (_, e) in renders.items() if e} == {}
+
+
+def test_each_render_happens_once_per_action(renders):
+    assert {k: c for k, (counts, _) in renders.items() for c in counts.values() if c > 1} == {}
+
+
+def test_rename_only_touches_share_card(renders):
+    counts, _ = renders["rename#1"]
+    assert set(counts) == {"ig_share_card"}
+
+
+@pytest.mark.parametrize("n", [1, 2, 3])
+def test_apply_event_keeps_year_outputs(renders, n):
+    counts, _ = renders[f"btn_apply_event#{n}"]
+    assert "ui_year" not in counts
+    assert "ui_progress_bar" not in counts
+    assert "ui_current_assets_detail" in counts      # 資產變了
+
+
+def test_jump_updates_year_not_setup(renders):
+    counts, _ = renders["btn_jump_time#1"]
+    assert {"ui_year", "ui_progress_bar", "ui_wealth", "game_interaction_area"} <= set(counts)
+    assert not set(counts) & {"setup_rates_table", "setup_status"}
+
+
+def test_typing_card_code_only_touches_event_outputs(renders):
+    counts, _ = renders["event_code_input#1"]
+    assert set(counts) == {"event_card_display", "event_impact_preview", "event_apply_btn_area", "event_card_image"}
+
+
+def test_rebalance_inputs_only_touch_rebalance_outputs(renders):
+    counts, _ = renders["rb_inputs#1"]
+    assert set(counts) <= {"rebalance_status", "rebalance_whatif"}
+
+
+def test_finished_page_renders_once(renders):
+    counts, _ = renders["page_finished#1"]
+    assert {"ig_share_card", "final_wealth_text", "history_cards_list", "leaderboard_table"} <= set(counts)
+    assert "ui_year" not in counts
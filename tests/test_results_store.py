@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import results_store  # noqa: E402
+
+# ==========================================
+# 🗄️ 成績資料庫：介面、save_id 去重、Parquet 匯出能力
+# ==========================================
+
+
+def _row(save_id, name="p", wealth=100):
+    return {"save_id": save_id, '時間': "2026-01-01 00:00:00", '姓名': name, '最終資產': wealth, '報酬率(%)': 0.0}
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        results_store.ResultsStore()
+
+
+def test_only_sqlite_offers_parquet_export(tmp_path):
+    assert results_store.SqliteResultsStore(tmp_path / "r.sqlite3", import_legacy=False).supports_arrow()
+    assert not results_store.CsvResultsStore(tmp_path / "r.csv").supports_arrow()
+
+
+def test_sqlite_dedupes_on_save_id_only(tmp_path):
+    store = results_store.SqliteResultsStore(tmp_path / "r.sqlite3", import_legacy=False)
+    store.write_batch([_row("a"), _row("b")])       # 同一秒、同名、同資產的兩次存檔都要留下
+    store.write_batch([_row("a")])                  # spool 重寫同一筆：忽略
+    assert len(list(store.rows())) == 2
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import pickle
+import socket
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from write_pipeline import WritePipeline, _load_records  # noqa: E402
+
+# ==========================================
+# 📮 寫入管線：失敗重試、dead-letter、接手當掉程序的 spool
+# ==========================================
+
+
+class FlakyStore:
+    def __init__(self, fail_times):
+        self.fail_times = fail_times
+        self.rows = []
+
+    def write_batch(self, rows):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise OSError("database is locked")
+        self.rows.extend(rows)
+
+
+def _pipeline(store, spool_dir, **kw):
+    return WritePipeline(store.write_batch, name="t", spool_dir=spool_dir, retry_secs=0.01, **kw)
+
+
+def test_transient_failure_is_retried(tmp_path):
+    store = FlakyStore(fail_times=2)
+    p = _pipeline(store, tmp_path)
+    p.submit({"save_id": "a"})
+    p.flush(5)
+    p.close()
+    assert store.rows == [{"save_id": "a"}]
+    assert p.status()["failed"] == 0
+    assert list(tmp_path.iterdir()) == []          # 寫完 spool 就清掉
+
+
+def test_persistent_failure_goes_to_dead_letter_and_is_retried_on_restart(tmp_path):
+    broken = FlakyStore(fail_times=100)
+    p = _pipeline(broken, tmp_path, retries=2)
+    p.submit({"save_id": "a"})
+    p.flush(5)
+    p.close()
+    assert broken.rows == []
+    assert p.status()["failed"] == 1 and "locked" in p.status()["last_error"]
+    assert len(list(tmp_path.glob("*.dead"))) == 1
+
+    fixed = FlakyStore(fail_times=0)
+    p2 = _pipeline(fixed, tmp_path)
+    p2.flush(5)
+    p2.close()
+    assert fixed.rows == [{"save_id": "a"}]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spool_of_dead_worker_is_replayed(tmp_path):
+    # 已結束的程序 (pid 不存在) 留下的 spool，最後一筆寫到一半
+    dead_pid = 2 ** 22 + 1
+    with open(tmp_path / f"t-{socket.gethostname()}-{dead_pid}-1.spool", "wb") as f:
+        for i in range(3):
+            pickle.dump({"save_id": str(i)}, f)
+        f.write(pickle.dumps({"save_id": "partial"})[:5])
+    store = FlakyStore(fail_times=0)
+    p = _pipeline(store, tmp_path)
+    p.flush(5)
+    p.close()
+    assert [r["save_id"] for r in store.rows] == ["0", "1", "2"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spool_of_live_worker_is_left_alone(tmp_path):
+    # 還活著的 worker (這裡用父程序的 pid) 的 spool 不能被搶
+    live = tmp_path / f"t-{socket.gethostname()}-{os.getppid()}-1.spool"
+    live.write_bytes(pickle.dumps({"save_id": "x"}))
+    store = FlakyStore(fail_times=0)
+    p = _pipeline(store, tmp_path)
+    p.flush(5)
+    p.close()
+    assert store.rows == []
+    assert live.exists()
+
+
+def test_spool_of_previous_start_with_same_pid_is_replayed(tmp_path):
+    # 容器重啟：主機名稱、pid 都跟當掉的那一次一樣
+    old = tmp_path / f"t-{socket.gethostname()}-{os.getpid()}-1.spool"
+    with open(old, "wb") as f:
+        for i in range(3):
+            pickle.dump({"save_id": str(i)}, f)
+    store = FlakyStore(fail_times=0)
+    p = _pipeline(store, tmp_path)
+    p.submit({"save_id": "new"})
+    p.flush(5)
+    p.close()
+    assert sorted(r["save_id"] for r in store.rows) == ["0", "1", "2", "new"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_submit_async_spools_off_the_event_loop(tmp_path):
+    store = FlakyStore(fail_times=0)
+    p = _pipeline(store, tmp_path)
+    spooled_on = []
+    append = p._append
+    p._append = lambda item: (spooled_on.append(threading.current_thread()), append(item))
+    asyncio.run(p.submit_async({"save_id": "a"}))
+    p.flush(5)
+    p.close()
+    assert store.rows == [{"save_id": "a"}]
+    assert spooled_on and threading.main_thread() not in spooled_on
+
+
+def test_spool_is_trimmed_after_dead_letter_also_fails(tmp_path):
+    store = FlakyStore(fail_times=0)
+    p = _pipeline(store, tmp_path)
+    write = p._write
+    failures = [OSError("disk full")]
+
+    def write_once_broken(items):
+        if failures:
+            raise failures.pop()
+        write(items)
+
+    p._write = write_once_broken
+    p.submit({"save_id": "lost"})
+    p.flush(5)
+    for i in range(3):
+        p.submit({"save_id": str(i)})
+        p.flush(5)
+    p.close()
+    # spool 只剩寫不進去的那一筆，成功的不會累積下來重寫
+    (spool,) = tmp_path.iterdir()
+    assert [r["save_id"] for r in _load_records(spool)] == ["lost"]
+
+    p2 = _pipeline(store, tmp_path)
+    p2.flush(5)
+    p2.close()
+    assert [r["save_id"] for r in store.rows] == ["0", "1", "2", "lost"]
+    assert list(tmp_path.iterdir()) == []
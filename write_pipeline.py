@@ -0,0 +1,270 @@
+import asyncio
+import atexit
+import logging
+import os
+import pickle
+import queue
+import socket
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# 📮 非同步寫入管線 (有上限的佇列 + 背景寫入執行緒)
+# ==========================================
+# Shiny 的 effect 只負責把資料放進佇列就回應使用者；真正的檔案 / 資料庫 I/O
+# 在背景執行緒批次完成，慢速磁碟不會卡住同一個 worker 上的其他 session。
+#
+# 不遺失資料：
+#   - spool_dir 有設定時，放進佇列的每一筆同時附加到本程序的 spool 檔 (pickle)；
+#     全部寫完才清空。worker 當掉 / 被重啟時 spool 還在，下一個啟動的 worker 會接手重寫。
+#     (只 flush 到作業系統，不 fsync：程序當掉不會遺失，整台機器斷電則可能遺失最後幾筆)
+#   - 寫入失敗會以指數退避重試；重試用完就把這批存成 dead-letter 檔 (同一個資料夾，
+#     下次啟動時再重試)，並記在 failed / last_error，管理員後台看得到。
+#   - 重寫可能讓同一筆寫兩次，寫入端要能去重 (成績資料庫以 save_id 去重)。
+RETRIES = 5
+RETRY_SECS = 1.0                 # 第一次重試前等待秒數，之後每次加倍
+MAX_RETRY_SECS = 30.0
+SPOOL_SUFFIX = ".spool"
+DEAD_SUFFIX = ".dead"
+
+
+class PipelineFull(Exception):
+    """佇列已滿且等待逾時 (背壓)"""
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _load_records(path):
+    """讀出 spool / dead-letter 檔裡的每一筆；最後一筆寫到一半 (程序當掉) 就略過"""
+    items = []
+    with open(path, "rb") as f:
+        while True:
+            try:
+                items.append(pickle.load(f))
+            except EOFError:
+                return items
+            except (pickle.UnpicklingError, ValueError, AttributeError, IndexError):
+                logger.warning("%s 最後一筆不完整，略過", path)
+                return items
+
+
+class WritePipeline:
+    def __init__(self, write_batch, maxsize=10000, batch_size=200, batch_wait_secs=0.05, name="write-pipeline",
+                 spool_dir=None, retries=RETRIES, retry_secs=RETRY_SECS):
+        self._write_batch = write_batch
+        self._queue = queue.Queue(maxsize)
+        self._batch_size = batch_size
+        self._batch_wait_secs = batch_wait_secs
+        self._retries = retries
+        self._retry_secs = retry_secs
+        self._closed = False
+        self.name = name
+        self.failed = 0              # 重試用完、改存 dead-letter 的筆數
+        self.last_error = None       # 最近一次寫入失敗的原因 (成功後清掉)
+
+        self._spool_dir = Path(spool_dir) if spool_dir else None
+        self._spool_lock = threading.Lock()
+        self._spooled = self._done = 0
+        self._stranded = []          # 重試與 dead-letter 都失敗、只剩 spool 裡有的資料
+        self._spool = None
+        if self._spool_dir:
+            self._spool_dir.mkdir(parents=True, exist_ok=True)
+            self._prefix = f"{name}-{socket.gethostname()}"
+            # 檔名加上啟動時間：容器重啟後主機名稱與 pid (常是 1) 都可能跟上一次一樣，不能把上一次的 spool 當成自己的
+            self._spool = open(self._spool_dir / f"{self._prefix}-{os.getpid()}-{time.time_ns()}{SPOOL_SUFFIX}", "ab")
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        if self._spool_dir:
+            self._recover()
+
+    # --- spool ---
+    def _append(self, item):
+        # 呼叫端持有 _spool_lock
+        if self._spool:
+            pickle.dump(item, self._spool, protocol=pickle.HIGHEST_PROTOCOL)
+            self._spool.flush()
+        self._spooled += 1
+
+    def _mark_done(self, n, stranded=()):
+        with self._spool_lock:
+            self._done += n
+            self._stranded.extend(stranded)
+            if self._spool and not self._spool.closed and self._done + len(self._stranded) == self._spooled:
+                # 佇列都處理完了：清空 spool，只留下寫不進去的那些，下次啟動時重寫
+                self._spool.truncate(0)
+                self._spooled = self._done = 0
+                for item in self._stranded:
+                    self._append(item)
+
+    def _claimable(self, path):
+        name = path.name
+        if name == Path(self._spool.name).name:
+            return False
+        if ".claimed-" in name:
+            # 接手到一半就結束的 worker 留下的檔 (pid 跟自己一樣就是上一次啟動留下的)
+            return self._gone(name.rpartition(".claimed-")[2])
+        if path.suffix == DEAD_SUFFIX:
+            return True
+        if path.suffix == SPOOL_SUFFIX:
+            # {name}-{主機}-{pid}-{啟動時間}：只接手同一台機器上已結束的程序
+            parts = path.stem[len(self.name) + 1:].rsplit("-", 2)
+            return len(parts) == 3 and parts[0] == socket.gethostname() and self._gone(parts[1])
+        return False
+
+    @staticmethod
+    def _gone(pid):
+        """pid 對應的程序已不在；跟自己同 pid 的檔不是這次啟動開的 (自己的 spool 已先排除)，也算"""
+        return pid.isdigit() and (int(pid) == os.getpid() or not _pid_alive(int(pid)))
+
+    def _recover(self):
+        """接手已結束程序留下的 spool，以及之前的 dead-letter 檔"""
+        for path in sorted(self._spool_dir.glob(f"{self.name}-*")):
+            if not self._claimable(path):
+                continue
+            # 先改名搶下這個檔，多個 worker 同時啟動時只有一個會成功
+            claimed = path.with_name(f"{path.name.partition('.claimed-')[0]}.claimed-{os.getpid()}")
+            try:
+                path.rename(claimed)
+            except FileNotFoundError:
+                continue
+            items = _load_records(claimed)
+            with self._spool_lock:
+                for item in items:
+                    self._append(item)
+            claimed.unlink()
+            for item in items:
+                self._queue.put(item)
+            if items:
+                logger.warning("接手 %s 未寫入的 %d 筆", path.name, len(items))
+
+    # --- 生產端 ---
+    # 先寫進 spool 再放進佇列 (寫完的筆數永遠不會超過 spool 的筆數)；
+    # 佇列滿時先等空位，避免已經寫進 spool 的資料又被回報為失敗
+    def _spool_item(self, item):
+        with self._spool_lock:
+            self._append(item)
+
+    def submit(self, item, timeout=None, poll_secs=0.01):
+        """同步放入佇列；滿了最多等 timeout 秒，逾時丟出 PipelineFull"""
+        if self._closed:
+            raise RuntimeError("write pipeline is closed")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.full():
+            if deadline is not None and time.monotonic() >= deadline:
+                raise PipelineFull()
+            time.sleep(poll_secs)
+        if self._spool:
+            self._spool_item(item)
+        self._queue.put(item)
+
+    async def submit_async(self, item, timeout=5.0, poll_secs=0.01):
+        """在 event loop 中使用：不阻塞，佇列滿時讓出控制權等待空位；spool 的磁碟 I/O 在執行緒裡做"""
+        if self._closed:
+            raise RuntimeError("write pipeline is closed")
+        deadline = time.monotonic() + timeout
+        while self._queue.full():
+            if time.monotonic() >= deadline:
+                raise PipelineFull()
+            await asyncio.sleep(poll_secs)
+        if self._spool:
+            await asyncio.to_thread(self._spool_item, item)
+        while True:
+            try:
+                return self._queue.put_nowait(item)
+            except queue.Full:
+                # 等 spool 的期間被別的 session 搶走空位：已經寫進 spool 了，一定要放進去
+                await asyncio.sleep(poll_secs)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def status(self):
+        return {"queued": self.qsize(), "failed": self.failed, "last_error": self.last_error}
+
+    # --- 消費端 ---
+    def _write(self, items):
+        delay = self._retry_secs
+        for attempt in range(self._retries + 1):
+            try:
+                self._write_batch(items)
+                self.last_error = None
+                return
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                if attempt == self._retries:
+                    break
+                logger.warning("批次寫入失敗 (%d 筆)，%.0f 秒後重試 (%d/%d)：%s",
+                               len(items), delay, attempt + 1, self._retries, self.last_error)
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_SECS)
+        self.failed += len(items)
+        if self._spool_dir:
+            path = self._spool_dir / f"{self._prefix}-{os.getpid()}-{time.time_ns()}{DEAD_SUFFIX}"
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                for item in items:
+                    pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)        # 寫完才改名，別的 worker 不會讀到寫一半的檔
+            logger.error("批次寫入重試 %d 次仍失敗，%d 筆存到 %s (下次啟動時重試)", self._retries, len(items), path)
+        else:
+            logger.error("批次寫入重試 %d 次仍失敗，遺失 %d 筆：%s", self._retries, len(items), self.last_error)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self._batch_size:
+                    batch.append(self._queue.get(timeout=self._batch_wait_secs))
+            except queue.Empty:
+                pass
+            items = [x for x in batch if x is not None]
+            try:
+                if items:
+                    self._write(items)
+            except Exception:
+                # dead-letter 也寫不進去：資料留在 spool 裡，下次啟動時重寫
+                logger.exception("批次寫入失敗 (%d 筆)", len(items))
+                self._mark_done(0, stranded=items)
+            else:
+                self._mark_done(len(items))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(items) != len(batch):
+                return
+
+    def flush(self, timeout=None):
+        """等待目前佇列中的資料全部寫完"""
+        if not self._thread.is_alive():
+            return
+        waiter = threading.Thread(target=self._queue.join, daemon=True)
+        waiter.start()
+        waiter.join(timeout)
+
+    def close(self, timeout=30):
+        """關機時呼叫：停止收件並把剩下的資料寫完 (沒寫完的留在 spool，下次啟動時重寫)"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+        if self._spool:
+            with self._spool_lock:
+                done = not self._stranded and self._done == self._spooled
+                self._spool.close()
+            if done:
+                Path(self._spool.name).unlink(missing_ok=True)